@@ -0,0 +1,41 @@
+"""Interpreter startup and import time of the proxy modules.
+
+Each measurement runs a fresh interpreter, as Odoo does for every print.
+
+Usage: python benchmarks/bench_import.py [--repeat 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from common import bench, print_results, result
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+STATEMENTS = {
+    "startup_python": "pass",
+    "import_cli": "import wkhtmltopdf_proxy.cli",
+    "import_main": "import wkhtmltopdf_proxy.main",
+}
+
+
+def run(repeat: int) -> list:
+    env = dict(os.environ, PYTHONPATH=SRC)
+    results = []
+    for name, statement in STATEMENTS.items():
+        command = [sys.executable, "-c", statement]
+        seconds = bench(lambda: subprocess.run(command, env=env, check=True), repeat)
+        results.append(result(name, seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    options = parser.parse_args()
+    print_results(run(options.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""End-to-end main() against a local stub render server with fixed latency.
+
+The stub discards uploads and answers after `--latency` seconds, so
+`overhead_seconds` is the time the proxy itself adds to a print.
+
+Usage: python benchmarks/bench_main.py [--sizes 10K,1M,20M,200M] [--repeat 3]
+"""
+
+import argparse
+import os
+import tempfile
+from unittest.mock import patch
+
+from common import DEFAULT_SIZES, bench, parse_sizes, print_results, result, write_html
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+
+def run(sizes, repeat: int, latency: float, clean_html: bool = False) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir, StubRenderServer(
+        latency=latency, discard_uploads=True
+    ) as server:
+        header = os.path.join(tmpdir, "header.html")
+        write_html(header, 2 * 1024)
+        output = os.path.join(tmpdir, "output.pdf")
+        env = {
+            "WKHTMLTOPDF_PROXY_URL": server.url,
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_STATE_DIR": tmpdir,
+            "WKHTMLTOPDF_PROXY_CLEAN_HTML": str(int(clean_html)),
+        }
+
+        for size in sizes:
+            body = os.path.join(tmpdir, "body.html")
+            write_html(body, size)
+
+            def render():
+                try:
+                    wk.main(["--header-html", header, body, output])
+                except SystemExit as error:
+                    if error.code:
+                        raise
+
+            with patch.dict(os.environ, env):
+                seconds = bench(render, repeat)
+
+            name = "main_remote_clean" if clean_html else "main_remote"
+            results.append(
+                result(name, seconds, size, overhead_seconds=seconds - latency)
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    options = parser.parse_args()
+    print_results(run(parse_sizes(options.sizes), options.repeat, options.latency))
+
+
+if __name__ == "__main__":
+    main()
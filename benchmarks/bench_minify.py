@@ -0,0 +1,49 @@
+"""Throughput of the streaming minifier against the former minify_html.
+
+Usage: python benchmarks/bench_minify.py [--sizes 10K,1M,20M,200M] [--repeat 3]
+"""
+
+import argparse
+
+from common import DEFAULT_SIZES, bench, make_html, parse_sizes, print_results, result
+
+from wkhtmltopdf_proxy.minify import iter_minify
+
+CHUNK_SIZE = 256 * 1024
+
+
+def legacy_minify_html(html: str) -> str:
+    """minify_html as shipped before the streaming minifier."""
+    lines = html.splitlines()
+    compact = [line.strip() for line in lines if line.strip()]
+    return "".join(compact)
+
+
+def run(sizes, repeat: int) -> list:
+    results = []
+    for size in sizes:
+        html = make_html(size)
+        chunks = [html[i : i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE)]
+
+        def legacy():
+            legacy_minify_html(html.decode("utf-8")).encode("utf-8")
+
+        def streaming():
+            for _chunk in iter_minify(chunks):
+                pass
+
+        for name, function in (("legacy", legacy), ("streaming", streaming)):
+            results.append(result(f"minify_{name}", bench(function, repeat), size))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    options = parser.parse_args()
+    print_results(run(parse_sizes(options.sizes), options.repeat))
+
+
+if __name__ == "__main__":
+    main()
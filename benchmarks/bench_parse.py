@@ -0,0 +1,71 @@
+"""parse_args on the command line Odoo builds for a report.
+
+Usage: python benchmarks/bench_parse.py [--bodies 1,100] [--number 1000]
+"""
+
+import argparse
+import time
+
+from common import print_results, result
+
+from wkhtmltopdf_proxy.main import parse_args
+
+# As built by ir.actions.report._build_wkhtmltopdf_args
+ODOO_ARGS = [
+    "--disable-local-file-access",
+    "--viewport-size",
+    "1024x1280",
+    "--quiet",
+    "--page-size",
+    "A4",
+    "--margin-top",
+    "40",
+    "--dpi",
+    "90",
+    "--zoom",
+    "1.0666666666666667",
+    "--header-spacing",
+    "35",
+    "--margin-left",
+    "7",
+    "--margin-bottom",
+    "32",
+    "--margin-right",
+    "7",
+    "--orientation",
+    "Portrait",
+    "--header-html",
+    "/tmp/report.header.tmp.abcd1234.html",
+    "--footer-html",
+    "/tmp/report.footer.tmp.abcd1234.html",
+]
+
+
+def odoo_argv(bodies: int) -> list:
+    paths = [f"/tmp/report.body.tmp.{index}.abcd1234.html" for index in range(bodies)]
+    return ODOO_ARGS + paths + ["/tmp/report.tmp.abcd1234.pdf"]
+
+
+def run(bodies_counts, number: int) -> list:
+    results = []
+    for bodies in bodies_counts:
+        argv = odoo_argv(bodies)
+        start = time.perf_counter()
+        for _ in range(number):
+            parse_args(argv)
+        seconds = (time.perf_counter() - start) / number
+        results.append(result(f"parse_args_{bodies}_bodies", seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bodies", default="1,100")
+    parser.add_argument("--number", type=int, default=1000)
+    options = parser.parse_args()
+    counts = [int(value) for value in options.bodies.split(",")]
+    print_results(run(counts, options.number))
+
+
+if __name__ == "__main__":
+    main()
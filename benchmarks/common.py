@@ -0,0 +1,69 @@
+"""Helpers shared by the benchmarks."""
+
+import time
+
+ROW = (
+    b"            <tr>\n"
+    b'                <td class="text-start"><span>Product reference</span></td>\n'
+    b'                <td class="text-end">  1.00  </td>\n'
+    b"                <!-- price -->\n"
+    b'                <td class="text-end"><span>12.50 \xe2\x82\xac</span></td>\n'
+    b"            </tr>\n"
+)
+DEFAULT_SIZES = "10K,1M,20M,200M"
+
+
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    if value[-1].upper() in units:
+        return int(float(value[:-1]) * units[value[-1].upper()])
+    return int(value)
+
+
+def parse_sizes(value: str) -> list:
+    return [parse_size(item) for item in value.split(",")]
+
+
+def make_html(size: int) -> bytes:
+    """An Odoo-like report table of about `size` bytes."""
+    head = b"<html><head><style> td { padding: 2px } </style></head><body><table>\n"
+    tail = b"</table><pre>  keep  </pre></body></html>\n"
+    rows = ROW * (max(size - len(head) - len(tail), 0) // len(ROW) + 1)
+    return head + rows[: max(size - len(head) - len(tail), 0)] + tail
+
+
+def write_html(path: str, size: int) -> None:
+    """Write `make_html(size)` to `path` without holding it all in memory."""
+    chunk = 16 * 1024 * 1024
+    with open(path, "wb") as file:
+        remaining = size
+        while remaining > 0:
+            file.write(make_html(min(chunk, remaining)))
+            remaining -= chunk
+
+
+def bench(function, repeat: int) -> float:
+    """Best wall-clock time of `repeat` calls of `function`."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(name: str, seconds: float, size: int = 0, **extra) -> dict:
+    values = {"name": name, "size": size, "seconds": seconds}
+    if size:
+        values["mb_per_s"] = size / seconds / 1024 / 1024
+    values.update(extra)
+    return values
+
+
+def print_results(results: list) -> None:
+    for item in results:
+        throughput = f"{item['mb_per_s']:>10.1f} MB/s" if "mb_per_s" in item else ""
+        print(
+            f"{item['name']:<28} {item['size']:>12} bytes "
+            f"{item['seconds']:>10.4f} s {throughput}"
+        )
@@ -0,0 +1,103 @@
+"""Run every benchmark, save the results as JSON and compare to a baseline.
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --sizes 10K,1M --baseline results.json
+
+With `--baseline`, results slower than the baseline by more than
+`--tolerance` are reported and the exit status is 1.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import bench_import
+import bench_main
+import bench_minify
+import bench_parse
+from common import DEFAULT_SIZES, parse_sizes, print_results
+
+
+def git_revision() -> str:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return output.stdout.strip()
+
+
+def run(sizes, repeat: int, latency: float) -> list:
+    results = bench_import.run(max(repeat, 5))
+    results += bench_parse.run([1, 100], 1000)
+    results += bench_minify.run(sizes, repeat)
+    results += bench_main.run(sizes, repeat, latency)
+    results += bench_main.run(sizes, repeat, latency, clean_html=True)
+    return results
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Return the results slower than their baseline beyond `tolerance`."""
+    reference = {(item["name"], item["size"]): item["seconds"] for item in baseline}
+    regressions = []
+    for item in results:
+        before = reference.get((item["name"], item["size"]))
+        if not before:
+            continue
+        ratio = item["seconds"] / before
+        print(f"{item['name']:<28} {item['size']:>12} bytes {ratio:>8.2f}x baseline")
+        if ratio > 1 + tolerance:
+            regressions.append(item)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    options = parser.parse_args()
+
+    results = run(parse_sizes(options.sizes), options.repeat, options.latency)
+    print_results(results)
+
+    report = {
+        "metadata": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": options.sizes,
+            "repeat": options.repeat,
+            "latency": options.latency,
+        },
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, options.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {options.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import IO, Iterator, Optional
+
+from .endpoints import pid_alive
+from .metrics import metrics
+from .state import FileSemaphore, locked_json, read_json
+
+INTERACTIVE, BATCH = "interactive", "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+# RFC 9218 urgency, from 0 (highest) to 7, 3 being the default
+URGENCY = {INTERACTIVE: 1, BATCH: 6}
+POLL_INTERVAL = 0.05
+
+
+def classify(
+    hint: str, bodies: int, total: int, batch_bodies: int = 0, batch_size: int = 0
+) -> str:
+    """Priority class of a render, from the hint or the size of the report."""
+    if hint in PRIORITIES:
+        return hint
+    if hint:
+        logging.warning("Invalid priority '%s', derived from the report", hint)
+    if batch_bodies and bodies >= batch_bodies or batch_size and total >= batch_size:
+        return BATCH
+    return INTERACTIVE
+
+
+class TokenBucket:
+    """Token bucket rate limit shared by every proxy process.
+
+    The bucket holds up to `burst` tokens and is refilled with `rate` tokens
+    per second; its level is kept in a state file, updated under lock.
+    """
+
+    def __init__(self, state_path: str, rate: float, burst: float):
+        self.state_path = state_path
+        self.rate = rate
+        self.burst = max(burst, 1)
+
+    def try_take(self) -> float:
+        """Take a token, or return the seconds until one is available."""
+        with locked_json(self.state_path) as state:
+            now = time.time()
+            elapsed = max(now - state.get("updated", now), 0)
+            tokens = min(
+                state.get("tokens", self.burst) + elapsed * self.rate, self.burst
+            )
+            state["updated"] = now
+            if tokens >= 1:
+                state["tokens"] = tokens - 1
+                return 0.0
+            state["tokens"] = tokens
+            return (1 - tokens) / self.rate
+
+    def take(self, deadline: Optional[float] = None) -> None:
+        """Wait for a token, raising TimeoutError past `deadline`."""
+        while wait := self.try_take():
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise TimeoutError("Rate limit exceeded")
+            time.sleep(wait)
+
+
+class Admission:
+    """Host-wide admission control of the remote requests.
+
+    Requests wait for one of `concurrency` slots of a FileSemaphore and for
+    a token of the rate limit, for at most `queue_timeout` seconds in total.
+    Waiting processes are listed in a state file so that the queue depth
+    can be logged; entries of dead processes are ignored.
+
+    `reserved` of the slots are kept for interactive requests, and batch
+    requests let the queued interactive ones go first.
+    """
+
+    def __init__(
+        self,
+        state_dir: str,
+        concurrency: int,
+        rate: float,
+        burst: float,
+        queue_timeout: float,
+        reserved: int = 0,
+    ):
+        reserved = min(reserved, concurrency - 1) if concurrency else 0
+        self.semaphore = (
+            FileSemaphore(os.path.join(state_dir, "admission"), concurrency - reserved)
+            if concurrency
+            else None
+        )
+        self.reserved = (
+            FileSemaphore(os.path.join(state_dir, "admission-interactive"), reserved)
+            if reserved
+            else None
+        )
+        self.bucket = (
+            TokenBucket(os.path.join(state_dir, "rate.json"), rate, burst)
+            if rate
+            else None
+        )
+        self.queue_path = os.path.join(state_dir, "queue.json")
+        self.queue_timeout = queue_timeout
+
+    @classmethod
+    def from_config(cls, config) -> Optional["Admission"]:
+        if not config.max_concurrency and not config.rate_limit:
+            return None
+        return cls(
+            config.state_dir,
+            config.max_concurrency,
+            config.rate_limit,
+            config.rate_burst or config.rate_limit,
+            config.queue_timeout,
+            config.interactive_slots,
+        )
+
+    def enqueue(self, key: str, priority: str = INTERACTIVE) -> int:
+        """Add this request to the queue, returning the requests ahead."""
+        with locked_json(self.queue_path) as queue:
+            for waiter in list(queue):
+                if not pid_alive(int(waiter.split(":")[0])):
+                    del queue[waiter]
+            queue[key] = [time.time(), priority]
+            return len(queue) - 1
+
+    def interactive_waiting(self) -> bool:
+        """Whether interactive requests are queued."""
+        return any(
+            isinstance(value, list)
+            and value[1] == INTERACTIVE
+            and pid_alive(int(waiter.split(":")[0]))
+            for waiter, value in read_json(self.queue_path).items()
+        )
+
+    def wait_turn(self, priority: str, deadline: float) -> None:
+        """Let the queued interactive requests go before a batch one."""
+        while priority == BATCH and self.interactive_waiting():
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Interactive requests are still queued")
+            time.sleep(POLL_INTERVAL)
+
+    def acquire(self, priority: str, deadline: float) -> IO:
+        """Wait for a shared slot, or a reserved one for interactive requests."""
+        semaphores = [self.semaphore]
+        if self.reserved and priority == INTERACTIVE:
+            semaphores.append(self.reserved)
+
+        while True:
+            self.wait_turn(priority, deadline)
+            for semaphore in semaphores:
+                if (file := semaphore.try_acquire()) is not None:
+                    return file
+            if time.monotonic() >= deadline:
+                raise TimeoutError("No free admission slot")
+            time.sleep(POLL_INTERVAL)
+
+    def dequeue(self, key: str) -> None:
+        with locked_json(self.queue_path) as queue:
+            queue.pop(key, None)
+
+    @contextmanager
+    def admit(self, priority: str = INTERACTIVE) -> Iterator[None]:
+        """Hold a slot and a token, raising TimeoutError when the wait is over."""
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        key = f"{os.getpid()}:{threading.get_ident()}:{start}"
+        ahead = self.enqueue(key, priority)
+
+        with ExitStack() as stack:
+            try:
+                if self.semaphore:
+                    file = self.acquire(priority, deadline)
+                    stack.callback(FileSemaphore.release, file)
+                if self.bucket:
+                    self.wait_turn(priority, deadline)
+                    self.bucket.take(deadline)
+            except TimeoutError:
+                logging.error(
+                    "Admission: %s request rejected after %.3fs, "
+                    "%d request(s) were queued ahead",
+                    priority,
+                    time.monotonic() - start,
+                    ahead,
+                )
+                raise
+            finally:
+                self.dequeue(key)
+
+            waited = time.monotonic() - start
+            logging.info(
+                "Admission: %s request waited %.3fs, queue depth %d",
+                priority,
+                waited,
+                ahead,
+            )
+            metrics.observe("phase_duration_seconds", waited, phase="admission")
+            yield
@@ -0,0 +1,244 @@
+import base64
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from .state import atomic_write
+
+FETCH_TIMEOUT = 30
+MAX_WORKERS = 8
+# Larger assets are left for the renderer to fetch
+MAX_INLINE_SIZE = 5 * 1024 * 1024
+# Larger documents are uploaded as they are, without being read in memory
+MAX_DOCUMENT_SIZE = 20 * 1024 * 1024
+
+BASE_PATTERN = re.compile(r"""<base\b[^>]*?\bhref\s*=\s*(["'])(.*?)\1""", re.I | re.S)
+STYLESHEET_PATTERN = re.compile(r"<link\b[^>]*>", re.I)
+IMAGE_PATTERN = re.compile(r"<img\b[^>]*>", re.I)
+STYLE_PATTERN = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.I | re.S)
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(["']?)([^"')]+?)\1\s*\)""", re.I)
+
+
+def attribute_pattern(name: str) -> "re.Pattern":
+    return re.compile(rf"""(\s{name}\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+
+
+HREF_PATTERN = attribute_pattern("href")
+SRC_PATTERN = attribute_pattern("src")
+REL_PATTERN = attribute_pattern("rel")
+
+
+class AssetCache:
+    """HTTP cache of the assets, shared by every proxy process.
+
+    Each asset is stored with its ETag and Last-Modified validators, and
+    revalidated with a conditional request on the next render: a 304 answer
+    costs a round trip but no transfer.
+    """
+
+    def __init__(self, directory: str, session, timeout: float = FETCH_TIMEOUT):
+        self.directory = directory
+        self.session = session
+        self.timeout = timeout
+
+    def entry_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+
+    def read(self, url: str) -> Tuple[dict, bytes]:
+        """Validators and content of a cached asset, the header line first."""
+        try:
+            with open(self.entry_path(url), "rb") as file:
+                meta, _, content = file.read().partition(b"\n")
+        except FileNotFoundError:
+            return {}, b""
+        return json.loads(meta), content
+
+    def fetch(
+        self, url: str, cookies: Optional[dict] = None
+    ) -> Optional[Tuple[str, bytes]]:
+        """Content type and content of `url`, None when it cannot be fetched."""
+        meta, content = self.read(url)
+        headers = {}
+        if etag := meta.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := meta.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            response = self.session.get(
+                url, headers=headers, cookies=cookies, timeout=self.timeout
+            )
+        except OSError as error:
+            # requests errors derive from OSError
+            logging.warning("Asset %s: %s", url, error)
+            return (meta["content_type"], content) if meta else None
+
+        if response.status_code == 304 and meta:
+            logging.debug("Asset %s: not modified", url)
+            return meta["content_type"], content
+
+        if response.status_code != 200:
+            logging.warning("Asset %s: HTTP %d", url, response.status_code)
+            return None
+
+        content_type = response.headers.get("Content-Type") or (
+            mimetypes.guess_type(urlparse(url).path)[0] or "application/octet-stream"
+        )
+        meta = {
+            "content_type": content_type,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if meta["etag"] or meta["last_modified"]:
+            entry = json.dumps(meta).encode() + b"\n" + response.content
+            atomic_write(self.entry_path(url), entry)
+        return content_type, response.content
+
+
+class AssetInliner:
+    """Replace the URLs of stylesheets, images and fonts by data: URIs.
+
+    `<link rel="stylesheet">` and `<img>` URLs, and `url()` references in
+    `<style>` blocks and in the fetched stylesheets, e.g. `@font-face`
+    sources, are resolved against the `<base href>` of the document and
+    fetched in parallel through the AssetCache, so that the remote renderer
+    does not call back the Odoo server. Cookies are only sent to the host
+    of the base URL. Assets that cannot be fetched keep their URL.
+
+    Inlining works on the whole document in memory: documents larger than
+    MAX_DOCUMENT_SIZE are not inlined, the renderer fetches their assets.
+    """
+
+    def __init__(self, cache: AssetCache, cookies: Iterable = ()):
+        self.cache = cache
+        self.cookies = dict(cookies)
+        self.uris: Dict[str, Optional[str]] = {}
+        self.lock = threading.Lock()
+        self.base_url = ""
+
+    @classmethod
+    def from_config(cls, config, session, dict_args: dict) -> Optional["AssetInliner"]:
+        if not config.inline_assets:
+            return None
+        cache = AssetCache(os.path.join(config.state_dir, "assets"), session)
+        return cls(cache, dict_args.get("cookie") or ())
+
+    def data_uri(self, url: str) -> Optional[str]:
+        with self.lock:
+            if url in self.uris:
+                return self.uris[url]
+
+        same_host = urlparse(url).netloc == urlparse(self.base_url).netloc
+        result = self.cache.fetch(url, self.cookies if same_host else None)
+        uri = None
+        if result and len(result[1]) <= MAX_INLINE_SIZE:
+            content_type, content = result
+            if content_type.split(";")[0].strip() == "text/css":
+                css = content.decode("utf-8", "surrogateescape")
+                content = self.inline_css(css, url).encode("utf-8", "surrogateescape")
+            uri = f"data:{content_type};base64,{base64.b64encode(content).decode()}"
+
+        with self.lock:
+            self.uris[url] = uri
+        return uri
+
+    def resolve(self, url: str, base: str) -> Optional[str]:
+        url = url.strip()
+        if url.startswith(("data:", "#")):
+            return None
+        absolute = urljoin(base, url) if base else url
+        return absolute if urlparse(absolute).scheme in ("http", "https") else None
+
+    def prefetch(self, urls: List[str]) -> None:
+        urls = [url for url in dict.fromkeys(urls) if url not in self.uris]
+        if len(urls) > 1:
+            workers = min(len(urls), MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self.data_uri, urls))
+
+    def inline(self, url: str, base: str) -> Optional[str]:
+        absolute = self.resolve(url, base)
+        return self.data_uri(absolute) if absolute else None
+
+    def inline_css(self, css: str, base: str) -> str:
+        self.prefetch(
+            [
+                url
+                for match in CSS_URL_PATTERN.finditer(css)
+                if (url := self.resolve(match.group(2), base))
+            ]
+        )
+
+        def replace(match: "re.Match") -> str:
+            uri = self.inline(match.group(2), base)
+            return f'url("{uri}")' if uri else match.group(0)
+
+        return CSS_URL_PATTERN.sub(replace, css)
+
+    def inline_html(self, html: str) -> str:
+        if match := BASE_PATTERN.search(html):
+            self.base_url = match.group(2)
+        base = self.base_url
+
+        def is_stylesheet(tag: str) -> bool:
+            rel = REL_PATTERN.search(tag)
+            return bool(rel) and "stylesheet" in rel.group(3).lower().split()
+
+        tags = [
+            (tag, HREF_PATTERN)
+            for tag in STYLESHEET_PATTERN.findall(html)
+            if is_stylesheet(tag)
+        ]
+        tags += [(tag, SRC_PATTERN) for tag in IMAGE_PATTERN.findall(html)]
+        self.prefetch(
+            [
+                url
+                for tag, pattern in tags
+                if (attribute := pattern.search(tag))
+                and (url := self.resolve(unescape(attribute.group(3)), base))
+            ]
+        )
+
+        def replace_attribute(pattern: "re.Pattern"):
+            def replace_tag(match: "re.Match") -> str:
+                tag = match.group(0)
+                if pattern is HREF_PATTERN and not is_stylesheet(tag):
+                    return tag
+                return pattern.sub(replace_value, tag, count=1)
+
+            return replace_tag
+
+        def replace_value(attribute: "re.Match") -> str:
+            uri = self.inline(unescape(attribute.group(3)), base)
+            if not uri:
+                return attribute.group(0)
+            quote = attribute.group(2)
+            return attribute.group(1) + quote + uri + quote
+
+        html = STYLESHEET_PATTERN.sub(replace_attribute(HREF_PATTERN), html)
+        html = IMAGE_PATTERN.sub(replace_attribute(SRC_PATTERN), html)
+        return STYLE_PATTERN.sub(
+            lambda match: match.group(1)
+            + self.inline_css(match.group(2), base)
+            + match.group(3),
+            html,
+        )
+
+    def inline_file(self, path: str) -> Optional[bytes]:
+        """Inlined content of `path`, None when too large to be inlined."""
+        if os.path.getsize(path) > MAX_DOCUMENT_SIZE:
+            logging.debug(
+                "%s not inlined: larger than %d bytes", path, MAX_DOCUMENT_SIZE
+            )
+            return None
+        with open(path, "rb") as file:
+            html = file.read().decode("utf-8", "surrogateescape")
+        return self.inline_html(html).encode("utf-8", "surrogateescape")
@@ -0,0 +1,124 @@
+import logging
+import os
+import time
+from typing import Optional
+
+from .endpoints import pid_alive
+from .state import locked_json, read_json
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+MAX_RESULTS = 200
+
+
+class CircuitBreaker:
+    """Circuit breaker of the remote renderer, shared by every proxy process.
+
+    The outcome and latency of the remote requests of the last `window`
+    seconds are kept in a state file. Requests slower than `slow_time`
+    seconds count as failures. Once `failures` of them have failed, the
+    circuit opens and requests are rendered locally for `open_time`
+    seconds. The circuit is then half-open: a single probe request at a
+    time goes to the remote renderer, and closes the circuit on success or
+    opens it again on failure.
+    """
+
+    def __init__(
+        self,
+        state_path: str,
+        failures: int,
+        window: float,
+        open_time: float,
+        slow_time: float = 0,
+    ):
+        self.state_path = state_path
+        self.failures = failures
+        self.window = window
+        self.open_time = open_time
+        self.slow_time = slow_time
+
+    @classmethod
+    def from_config(cls, config) -> Optional["CircuitBreaker"]:
+        if not config.breaker_failures:
+            return None
+        return cls(
+            os.path.join(config.state_dir, "breaker.json"),
+            config.breaker_failures,
+            config.breaker_window,
+            config.breaker_open_time,
+            config.breaker_slow_time,
+        )
+
+    def allow(self) -> bool:
+        """Whether this request may go to the remote renderer."""
+        with locked_json(self.state_path) as state:
+            status = state.get("state", CLOSED)
+            if status == CLOSED:
+                return True
+
+            if status == OPEN:
+                if time.time() < state["opened_at"] + self.open_time:
+                    return False
+                logging.info("Circuit breaker: half-open, probing the remote renderer")
+                state["state"] = HALF_OPEN
+
+            # Half-open: one probe at a time, unless its process died
+            probe = state.get("probe")
+            if probe and pid_alive(probe) and probe != os.getpid():
+                return False
+            state["probe"] = os.getpid()
+            return True
+
+    def record(self, success: bool, latency: float) -> None:
+        slow = bool(self.slow_time) and latency > self.slow_time
+        failed = not success or slow
+        now = time.time()
+
+        with locked_json(self.state_path) as state:
+            results = [
+                result
+                for result in state.get("results", [])
+                if result[0] > now - self.window
+            ]
+            results.append([now, not failed, latency])
+            state["results"] = results[-MAX_RESULTS:]
+
+            status = state.get("state", CLOSED)
+            if status == HALF_OPEN and state.get("probe") == os.getpid():
+                state["probe"] = None
+                if failed:
+                    self.trip(state, now, "probe failed")
+                else:
+                    logging.info("Circuit breaker: closed, the probe succeeded")
+                    state["state"] = CLOSED
+                    state["results"] = []
+            elif status == CLOSED and failed:
+                count = sum(1 for result in results if not result[1])
+                if count >= self.failures:
+                    self.trip(state, now, f"{count} failures in {self.window}s")
+
+    def trip(self, state: dict, now: float, reason: str) -> None:
+        logging.warning(
+            "Circuit breaker: open for %ss (%s), rendering locally",
+            self.open_time,
+            reason,
+        )
+        state["state"] = OPEN
+        state["opened_at"] = now
+
+    def describe(self) -> str:
+        state = read_json(self.state_path)
+        results = [
+            result
+            for result in state.get("results", [])
+            if result[0] > time.time() - self.window
+        ]
+        summary = f"circuit breaker: {state.get('state', CLOSED)}"
+        if not results:
+            return summary + ", no recent request"
+
+        errors = sum(1 for result in results if not result[1])
+        latency = sum(result[2] for result in results) / len(results)
+        return (
+            f"{summary}, {errors}/{len(results)} failed in the last {self.window}s, "
+            f"mean latency {latency:.3f}s"
+        )
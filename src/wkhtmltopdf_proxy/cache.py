@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from .state import locked, locked_json
+
+# Arguments that change on every call without changing the rendered PDF
+VOLATILE_ARGS = {"header-html", "footer-html", "cookie", "cookie-jar"}
+CHUNK_SIZE = 1024 * 1024
+
+
+class ResultCache:
+    """Content-addressed cache of rendered PDFs.
+
+    Entries are keyed by the HTML bytes and the normalized arguments, stored
+    as `<directory>/<key[:2]>/<key>.pdf` and written with an atomic rename
+    so concurrent proxy processes never read partial files. The modification
+    time of an entry is its last use: entries unused for `max_age` seconds
+    are dropped, then the least recently used ones until the cache fits in
+    `max_size` bytes.
+    """
+
+    def __init__(self, directory: str, max_size: int, max_age: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+    @classmethod
+    def from_config(cls, config) -> Optional["ResultCache"]:
+        if not config.cache:
+            return None
+        return cls(
+            os.path.join(config.state_dir, "cache"),
+            config.cache_max_size,
+            config.cache_max_age,
+        )
+
+    @property
+    def lock_path(self) -> str:
+        return os.path.join(self.directory, ".lock")
+
+    @property
+    def stats_path(self) -> str:
+        return os.path.join(self.directory, "stats.json")
+
+    def key(
+        self,
+        bodies: List[str],
+        header: str,
+        footer: str,
+        dict_args: dict,
+        cover: str = "",
+        toc: Optional[dict] = None,
+    ) -> str:
+        digest = hashlib.sha256()
+        args = {k: v for k, v in dict_args.items() if k not in VOLATILE_ARGS}
+        digest.update(json.dumps(args, sort_keys=True).encode())
+        if toc is not None:
+            digest.update(b"\0toc\0" + json.dumps(toc, sort_keys=True).encode())
+
+        parts = [("header", header), ("footer", footer), ("cover", cover)]
+        parts += [("body", path) for path in bodies]
+        for role, path in parts:
+            if not path:
+                continue
+            digest.update(f"\0{role}\0{os.stat(path).st_size}\0".encode())
+            with open(path, "rb") as file:
+                while chunk := file.read(CHUNK_SIZE):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def record(self, hit: bool) -> dict:
+        with locked_json(self.stats_path) as stats:
+            name = "hits" if hit else "misses"
+            stats[name] = stats.get(name, 0) + 1
+            return dict(stats)
+
+    def get(self, key: str, output: str) -> bool:
+        """Copy a cached PDF to `output`, returning False on a miss.
+
+        Like downloads, `output` is replaced atomically: it never holds a
+        partial copy.
+        """
+        path = self.entry_path(key)
+        tmp_path = f"{output}.{os.getpid()}.cache"
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                raise FileNotFoundError(path)
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, output)
+            os.utime(path)
+        except FileNotFoundError:
+            hit = False
+        else:
+            hit = True
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        stats = self.record(hit)
+        logging.info(
+            "Cache %s for %s (hits=%d, misses=%d)",
+            "hit" if hit else "miss",
+            key,
+            stats.get("hits", 0),
+            stats.get("misses", 0),
+        )
+        return hit
+
+    def put(self, key: str, source: str) -> None:
+        """Store the PDF at `source` under `key` and enforce the limits."""
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.evict()
+
+    def entries(self) -> List[Tuple[str, os.stat_result]]:
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    found.append((path, os.stat(path)))
+                except FileNotFoundError:
+                    continue
+        return found
+
+    def evict(self) -> None:
+        with locked(self.lock_path):
+            now = time.time()
+            entries = sorted(self.entries(), key=lambda item: item[1].st_mtime)
+            total = sum(stat.st_size for _path, stat in entries)
+            removed = 0
+
+            for path, stat in entries:
+                if total <= self.max_size and now - stat.st_mtime <= self.max_age:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= stat.st_size
+                removed += 1
+
+            if removed:
+                logging.info("Cache evicted %d entries, %d bytes left", removed, total)
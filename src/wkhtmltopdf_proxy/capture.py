@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+from .trace import scrub
+
+FILES = "{files}"
+OUTPUT = "{output}"
+HTML_OPTIONS = ("header-html", "footer-html")
+
+
+def capture(directory: str, args: List[str], parsed_args: dict) -> str:
+    """Archive the arguments and input files of an invocation for replay.
+
+    Each invocation gets a directory holding `request.json` and the input
+    files in `files/`. The input and output paths of the arguments are
+    replaced by the `{files}/<index>/<name>` and `{output}` placeholders,
+    the cookie jar is dropped and secret values are masked. Capture errors
+    are logged, the render goes on.
+    """
+    dict_args = parsed_args["dict_args"]
+    inputs = list(parsed_args["bodies"])
+    for path in [parsed_args["cover"], *(dict_args.get(key) for key in HTML_OPTIONS)]:
+        if path:
+            inputs.append(path)
+
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{os.urandom(4).hex()}"
+    tmp_dir = ""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+
+        # The server sees the same filenames, one directory per input
+        names = {}
+        for index, path in enumerate(inputs):
+            if os.path.exists(path) and path not in names:
+                names[path] = f"{index}/{os.path.basename(path)}"
+                os.makedirs(os.path.join(tmp_dir, "files", str(index)))
+                shutil.copyfile(path, os.path.join(tmp_dir, "files", names[path]))
+
+        replayed = []
+        skip = False
+        for index, arg in enumerate(args):
+            if skip:
+                skip = False
+                continue
+            # The cookie jar holds the session of the user
+            if arg == "--cookie-jar":
+                skip = True
+                continue
+            if index == len(args) - 1 and arg == parsed_args["output"]:
+                replayed.append(OUTPUT)
+            elif arg in names:
+                replayed.append(f"{FILES}/{names[arg]}")
+            else:
+                replayed.append(arg)
+
+        request = {
+            "args": scrub(replayed),
+            "time": time.time(),
+            "size": sum(os.path.getsize(path) for path in names),
+        }
+        with open(os.path.join(tmp_dir, "request.json"), "w") as file:
+            json.dump(request, file)
+        os.rename(tmp_dir, os.path.join(directory, name))
+    except OSError as error:
+        logging.warning("Invocation not captured: %s", error)
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return ""
+
+    logging.debug("Invocation captured in %s", name)
+    return os.path.join(directory, name)
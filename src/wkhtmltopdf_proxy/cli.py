@@ -0,0 +1,38 @@
+import sys
+from typing import List, Optional
+
+from .daemon import forward
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Console entry point.
+
+    Only the lightweight daemon client is imported up front: when a daemon
+    is listening the command line is forwarded to it, otherwise the request
+    is handled in-process by wkhtmltopdf_proxy.main.
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    if args[:1] == ["serve"]:
+        from .daemon import serve
+
+        return serve(args[1:])
+
+    if args[:1] == ["stats"]:
+        from .routing import print_stats
+
+        return print_stats(args[1:])
+
+    if args[:1] == ["replay"]:
+        from .replay import main as replay
+
+        return replay(args[1:])
+
+    status = forward(args)
+    if status is not None:
+        sys.exit(status)
+
+    from .main import main as run
+
+    return run(args)
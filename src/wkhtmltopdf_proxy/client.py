@@ -0,0 +1,217 @@
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .compression import accept_encoding
+from .download import download
+from .endpoints import Endpoint, EndpointFailure, EndpointPool, parse_endpoints
+from .log import logs
+from .main import ProxyConfig, build_data, output_kind
+from .multipart import FilePart, MultipartEncoder
+from .retry import RetryPolicy
+
+Source = Union[str, bytes, os.PathLike]
+
+
+def read_source(source: Source) -> bytes:
+    """Return the HTML of a document given as markup or as a file path.
+
+    A `str` is always markup, file paths are given as `os.PathLike` objects.
+    """
+    if isinstance(source, os.PathLike):
+        with open(source, "rb") as file:
+            return file.read()
+    if isinstance(source, str):
+        return source.encode("utf-8")
+    return source
+
+
+class ProxyClient:
+    """In-process client of the rendering API.
+
+    Documents are rendered through a single pooled `requests.Session`, so
+    connections are kept alive between calls. Bodies, header and footer are
+    given either as HTML markup (`str` or `bytes`) or as a path-like object
+    pointing to an HTML file; a `str` is never read as a path. Options use
+    the `dict_args` format returned by `parse_args`, e.g.
+    `{"page-size": "A4", "quiet": None}`.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        config: Optional[ProxyConfig] = None,
+        max_workers: int = 4,
+    ):
+        self.config = config or ProxyConfig.load()
+        self.url = url or self.config.url
+        self.max_workers = max_workers
+
+        if not self.url:
+            raise ValueError("Proxy URL is not defined.")
+
+        self.pool = EndpointPool(
+            parse_endpoints(self.url),
+            os.path.join(self.config.state_dir, "endpoints.json"),
+            self.config.eject_time,
+        )
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "ProxyClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def prepare(
+        self,
+        bodies: List[Source],
+        header: Optional[Source] = None,
+        footer: Optional[Source] = None,
+        options: Optional[dict] = None,
+    ):
+        """Build the file parts and form fields of a render request."""
+        if not bodies:
+            raise ValueError("No files provided.")
+
+        dict_args = dict(options or {})
+        parts = [
+            (f"body.{index}.html", read_source(body))
+            for index, body in enumerate(bodies)
+        ]
+        header_name = footer_name = ""
+
+        if header is not None:
+            header_name = dict_args["header-html"] = "header.html"
+            parts.append((header_name, read_source(header)))
+
+        if footer is not None:
+            footer_name = dict_args["footer-html"] = "footer.html"
+            parts.append((footer_name, read_source(footer)))
+
+        encoding = self.config.compression
+        threshold = self.config.compression_threshold
+        files = [
+            FilePart.from_bytes(
+                name, content, encoding, threshold, minify=self.config.clean_html
+            )
+            for name, content in parts
+        ]
+
+        total = sum(len(content) for _name, content in parts)
+        data = build_data(
+            dict_args,
+            header_name,
+            footer_name,
+            output_kind(total, self.config.threshold),
+            self.config.clean_html,
+            encoding,
+        )
+        return files, data
+
+    @logs
+    def render(
+        self,
+        bodies: List[Source],
+        header: Optional[Source] = None,
+        footer: Optional[Source] = None,
+        options: Optional[dict] = None,
+        output: Optional[Union[str, os.PathLike]] = None,
+    ) -> Optional[bytes]:
+        """Render a document.
+
+        Returns the PDF content, or writes it to `output` and returns None
+        when a path is given. Requests failing with a server or connection
+        error are sent to the next endpoint, if any, then retried. HTTP
+        errors are raised as `requests.HTTPError`.
+        """
+        files, data = self.prepare(bodies, header, footer, options)
+        encoder = MultipartEncoder(data, files)
+        key = uuid.uuid4().hex
+
+        def attempt():
+            return self.pool.call(
+                lambda endpoint: self.send(endpoint, encoder, output, key)
+            )
+
+        try:
+            return RetryPolicy.from_config(self.config).call(attempt)
+        except EndpointFailure as error:
+            # Callers get the error raised by requests, when there is one
+            if error.__cause__ is None:
+                raise
+            raise error.__cause__ from None
+
+    def send(
+        self,
+        endpoint: Endpoint,
+        encoder: MultipartEncoder,
+        output: Optional[Union[str, os.PathLike]],
+        key: str,
+    ) -> Optional[bytes]:
+        try:
+            with self.session.post(
+                endpoint.url,
+                data=encoder.body(),
+                headers={
+                    "Idempotency-Key": key,
+                    "Accept-Encoding": accept_encoding(),
+                    "Content-Type": encoder.content_type,
+                },
+                stream=True,
+                timeout=self.config.timeout,
+            ) as response:
+                try:
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as error:
+                    if response.status_code >= 500:
+                        raise EndpointFailure(str(error)) from error
+                    raise
+                logging.debug(response.headers)
+
+                if output is None:
+                    return response.content
+
+                download(
+                    self.session,
+                    response,
+                    os.fspath(output),
+                    self.config.download_buffer_size,
+                    self.config.download_resumes,
+                    timeout=self.config.timeout,
+                )
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as error:
+            raise EndpointFailure(str(error)) from error
+
+        return None
+
+    def render_many(
+        self, documents: Iterable[dict], max_workers: Optional[int] = None
+    ) -> List[Optional[bytes]]:
+        """Render several documents concurrently on a bounded thread pool.
+
+        Each document is a dict of `render` keyword arguments. Results are
+        returned in the order of `documents`; the first error is re-raised.
+        """
+        workers = min(max_workers or self.max_workers, self.max_workers)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self.render, **document) for document in documents
+            ]
+            return [future.result() for future in futures]
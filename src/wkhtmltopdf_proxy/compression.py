@@ -0,0 +1,67 @@
+import logging
+import zlib
+from typing import Iterable, Iterator
+
+try:
+    from compression import zstd
+except ImportError:  # Python < 3.14
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+VALID_ENCODINGS = {"none", "gzip", "zstd"}
+
+
+def accept_encoding() -> str:
+    """Response encodings that urllib3 decompresses while streaming."""
+    from urllib3.util.request import ACCEPT_ENCODING
+
+    return ACCEPT_ENCODING
+
+
+def get_encoding(name: str) -> str:
+    """Return the usable upload encoding for the configured name."""
+    if name not in VALID_ENCODINGS:
+        logging.warning(f"Invalid compression '{name}', falling back to 'none'")
+        return "none"
+
+    if name == "zstd" and zstd is None:
+        logging.warning("zstd support is not installed, falling back to 'gzip'")
+        return "gzip"
+
+    return name
+
+
+def compressor(encoding: str):
+    """Return an incremental compressor exposing compress() and flush()."""
+    if encoding == "gzip":
+        return zlib.compressobj(wbits=31)
+    if encoding == "zstd":
+        return zstd.ZstdCompressor()
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+
+def decompress(content: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompress(content, wbits=31)
+    if encoding == "zstd":
+        return zstd.decompress(content)
+    return content
+
+
+def compress_bytes(content: bytes, encoding: str) -> bytes:
+    engine = compressor(encoding)
+    return engine.compress(content) + engine.flush()
+
+
+def iter_compressed(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a stream of chunks incrementally, skipping empty outputs."""
+    engine = compressor(encoding)
+
+    for chunk in chunks:
+        if output := engine.compress(chunk):
+            yield output
+
+    if output := engine.flush():
+        yield output
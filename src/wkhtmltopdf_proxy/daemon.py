@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".wkhtmltopdf-proxy.sock")
+MAX_MESSAGE_SIZE = 1024 * 1024
+STD_FDS = (0, 1, 2)
+
+
+def get_socket_path() -> str:
+    """Return the Unix socket path shared by the daemon and its clients."""
+    return os.getenv("WKHTMLTOPDF_PROXY_SOCKET", DEFAULT_SOCKET)
+
+
+def get_proxy_env() -> Dict[str, str]:
+    """Return the `WKHTMLTOPDF_PROXY_*` variables the configuration is loaded from."""
+    return {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith("WKHTMLTOPDF_PROXY_") and key != "WKHTMLTOPDF_PROXY_SOCKET"
+    }
+
+
+def forward(
+    args: List[str], socket_path: Optional[str] = None, fds: Sequence[int] = STD_FDS
+) -> Optional[int]:
+    """Forward a command line to a running daemon.
+
+    Returns the exit status of the render, or None when no daemon is
+    listening or when it runs with another `WKHTMLTOPDF_PROXY_*`
+    environment, so the caller can fall back to the in-process path.
+    """
+    path = socket_path or get_socket_path()
+    if not os.path.exists(path):
+        return None
+
+    payload = {"args": args, "cwd": os.getcwd(), "env": get_proxy_env()}
+    message = json.dumps(payload).encode() + b"\n"
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return None
+
+        # The standard streams travel alongside the first chunk, the rest of
+        # the message (if any) follows as plain data.
+        sent = socket.send_fds(client, [message], list(fds))
+        client.sendall(message[sent:])
+        client.shutdown(socket.SHUT_WR)
+
+        reply = client.makefile("rb").readline()
+
+    if not reply:
+        sys.stderr.write("wkhtmltopdf-proxy daemon closed the connection.\n")
+        return 1
+
+    status = json.loads(reply)["status"]
+    return None if status is None else int(status)
+
+
+def exit_status(error: SystemExit) -> int:
+    """Translate a SystemExit raised by main() into a process exit status."""
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+
+    sys.stderr.write(f"{error.code}\n")
+    return 1
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def receive(self):
+        message, fds, _flags, _addr = socket.recv_fds(
+            self.request, MAX_MESSAGE_SIZE, len(STD_FDS)
+        )
+        while not message.endswith(b"\n"):
+            chunk = self.request.recv(MAX_MESSAGE_SIZE)
+            if not chunk:
+                break
+            message += chunk
+
+        return json.loads(message), fds
+
+    def render(self, payload: dict, fds: List[int]) -> int:
+        """Run main() in a child attached to the client's standard streams.
+
+        A second fork keeps the daemon's own streams, working directory and
+        reply channel out of reach of main().
+        """
+        pid = os.fork()
+        if pid:
+            for fd in fds:
+                os.close(fd)
+            _pid, status = os.waitpid(pid, 0)
+            return os.waitstatus_to_exitcode(status)
+
+        status = 1
+        try:
+            self.request.close()
+            for target, fd in zip(STD_FDS, fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            sys.stdin = open(0, closefd=False)
+            sys.stdout = open(1, "w", closefd=False)
+            sys.stderr = open(2, "w", closefd=False)
+            os.chdir(payload["cwd"])
+
+            from .main import main
+
+            try:
+                main(payload["args"], config=self.server.config)
+                status = 0
+            except SystemExit as error:
+                status = exit_status(error)
+        except BaseException:
+            logging.exception("Daemon request failed")
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            logging.shutdown()
+            os._exit(status)
+
+    def handle(self):
+        payload, fds = self.receive()
+        logging.info("Daemon request: %s", payload["args"])
+
+        # The configuration was loaded from the daemon's environment, a
+        # client with other settings renders in-process
+        if payload.get("env") != self.server.env:
+            logging.warning("Daemon request refused: proxy environment differs")
+            for fd in fds:
+                os.close(fd)
+            status = None
+        else:
+            status = self.render(payload, fds)
+        self.wfile.write(json.dumps({"status": status}).encode() + b"\n")
+
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    def __init__(self, socket_path: str, config):
+        self.config = config
+        self.env = get_proxy_env()
+        super().__init__(socket_path, RequestHandler)
+        os.chmod(socket_path, 0o600)
+
+
+def is_listening(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def create_server(socket_path: Optional[str] = None) -> DaemonServer:
+    """Create the daemon with a warm configuration and imports.
+
+    Each request is rendered in a forked child, so HTTP connections are not
+    kept alive from one request to the next.
+    """
+    from .log import setup_logging
+    from .main import ProxyConfig, get_session
+
+    path = socket_path or get_socket_path()
+    if os.path.exists(path):
+        if is_listening(path):
+            sys.exit(f"A wkhtmltopdf-proxy daemon is already listening on {path}.")
+        os.unlink(path)
+
+    config = ProxyConfig.load()
+    setup_logging(config)
+    # Imports requests once, the children inherit it
+    get_session()
+
+    return DaemonServer(path, config)
+
+
+def serve(args: List[str]) -> None:
+    """Entry point of `wkhtmltopdf-proxy serve [--socket PATH]`."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="wkhtmltopdf-proxy serve")
+    parser.add_argument("--socket", default=get_socket_path())
+    options = parser.parse_args(args)
+
+    server = create_server(options.socket)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.info("Daemon listening on %s", options.socket)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(options.socket):
+            os.unlink(options.socket)
+        logging.info("Daemon stopped")
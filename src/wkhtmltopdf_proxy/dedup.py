@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .endpoints import EndpointFailure
+from .multipart import FilePart
+from .state import locked_json, read_json
+
+MAX_INDEX_SIZE = 1000
+
+
+class MissingParts(Exception):
+    """The server no longer knows some of the referenced digests."""
+
+    def __init__(self, digests: List[str]):
+        super().__init__(f"Server is missing {len(digests)} part(s)")
+        self.digests = digests
+
+
+def part_digest(part: FilePart) -> str:
+    """SHA-256 of a part as decoded by the server (minified, uncompressed)."""
+    digest = hashlib.sha256()
+    for chunk in part.content_chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DigestUploader:
+    """Upload-by-digest negotiation with the rendering API.
+
+    The SHA-256 of every file part is sent first to `<url>/digests`, which
+    answers with the digests it does not have, and only those parts are
+    uploaded; the render request references every part through its
+    `digests` form field, a list of [filename, digest] pairs in upload
+    order, so parts sharing a filename keep their own digest. Digests
+    confirmed by a successful render are kept in a local index so that the
+    negotiation round trip is skipped when all parts are already known.
+    """
+
+    def __init__(self, session, url: str, index_path: str, timeout: int):
+        self.session = session
+        self.url = url
+        self.index_path = index_path
+        self.timeout = timeout
+        self.digests: List[Tuple[str, str]] = []
+        self.parts: Dict[str, FilePart] = {}
+
+    @classmethod
+    def from_config(cls, config, session, url: str) -> Optional["DigestUploader"]:
+        if not config.dedup:
+            return None
+        return cls(
+            session,
+            url,
+            os.path.join(config.state_dir, "digests.json"),
+            config.timeout,
+        )
+
+    @property
+    def digests_url(self) -> str:
+        return self.url.rstrip("/") + "/digests"
+
+    def known(self) -> set:
+        # The index is replaced atomically, reading it needs no lock
+        return set(read_json(self.index_path).get(self.url, {}))
+
+    def missing(self, digests: List[str]) -> List[str]:
+        """Ask the server which digests it does not have.
+
+        Connection errors, timeouts and server errors are raised as
+        EndpointFailure; when the server rejects the request, every part is
+        uploaded.
+        """
+        import requests
+
+        try:
+            response = self.session.post(
+                self.digests_url, json={"digests": digests}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json().get("missing", [])
+        except requests.exceptions.HTTPError as error:
+            if error.response.status_code >= 500:
+                raise EndpointFailure(str(error)) from error
+            logging.warning("Upload by digest refused, uploading every part: %s", error)
+            return digests
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as error:
+            raise EndpointFailure(str(error)) from error
+
+    def negotiate(self, parts: List[FilePart]) -> List[FilePart]:
+        """Return the parts whose content must be uploaded."""
+        digests = [part_digest(part) for part in parts]
+        self.digests = [(part.filename, digest) for part, digest in zip(parts, digests)]
+        self.parts.update(zip(digests, parts))
+
+        if set(digests) <= self.known():
+            missing = []
+        else:
+            missing = self.missing(list(dict.fromkeys(digests)))
+
+        uploads = [part for part, digest in zip(parts, digests) if digest in missing]
+        saved = sum(part.size for part in parts if part not in uploads)
+        logging.info(
+            "Upload by digest: %d/%d part(s) to upload, %d bytes saved",
+            len(uploads),
+            len(parts),
+            saved,
+        )
+        return uploads
+
+    def resolve(self, digests: List[str]) -> List[FilePart]:
+        """Forget digests rejected by the server and return their parts."""
+        with locked_json(self.index_path) as index:
+            known = index.get(self.url, {})
+            for digest in digests:
+                known.pop(digest, None)
+
+        logging.warning("Server is missing %d part(s), uploading them", len(digests))
+        return [self.parts[digest] for digest in digests if digest in self.parts]
+
+    def confirm(self) -> None:
+        """Record every digest of a successful render in the local index."""
+        now = time.time()
+        with locked_json(self.index_path) as index:
+            known = index.setdefault(self.url, {})
+            known.update({digest: now for _name, digest in self.digests})
+
+            if len(known) > MAX_INDEX_SIZE:
+                recent = sorted(known.items(), key=lambda item: item[1])
+                index[self.url] = dict(recent[-MAX_INDEX_SIZE:])
+
+    def form_field(self) -> str:
+        return json.dumps(self.digests)
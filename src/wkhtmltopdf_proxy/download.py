@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Optional, Tuple
+from urllib.parse import urljoin
+
+from .endpoints import EndpointFailure
+from .metrics import metrics
+from .multipart import Cancelled
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_BUFFER_SIZE = 256 * 1024
+DEFAULT_RESUMES = 3
+DIGEST_ALGORITHMS = {"sha-256": "sha256", "sha-512": "sha512"}
+DIGEST_PATTERNS = {
+    # RFC 9530: sha-256=:base64:
+    "Repr-Digest": r"([\w-]+)=:([^:]*):",
+    # RFC 3230: SHA-256=base64
+    "Digest": r"([\w-]+)=([^,\s]+)",
+}
+
+
+def expected_digest(headers) -> Optional[Tuple[str, bytes]]:
+    """hashlib name and value of the first supported digest header."""
+    for header, pattern in DIGEST_PATTERNS.items():
+        for algorithm, value in re.findall(pattern, headers.get(header, "")):
+            if name := DIGEST_ALGORITHMS.get(algorithm.lower()):
+                return name, base64.b64decode(value)
+    return None
+
+
+def resume(
+    session: "requests.Session", url: str, offset: int, etag: Optional[str], **kwargs
+) -> "requests.Response":
+    """Request the rest of the body, from `offset`."""
+    headers = {"Range": f"bytes={offset}-"}
+    if etag:
+        headers["If-Range"] = etag
+
+    response = session.get(url, headers=headers, stream=True, **kwargs)
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code != 206 or not content_range.startswith(f"bytes {offset}-"):
+        response.close()
+        raise EndpointFailure(f"Download of {url} cannot be resumed at byte {offset}")
+    return response
+
+
+def download(
+    session: "requests.Session",
+    response: "requests.Response",
+    path: str,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    resumes: int = DEFAULT_RESUMES,
+    cancelled: Optional[threading.Event] = None,
+    **kwargs,
+) -> None:
+    """Write the body of `response` to `path`, replaced atomically.
+
+    The body goes to a temporary file next to `path` and is checked against
+    the Content-Length and digest headers before the rename, so a dropped
+    connection never leaves a truncated PDF behind. An interrupted download
+    is resumed with Range requests on the Content-Location of the response
+    when the server accepts them; otherwise, or after `resumes` attempts,
+    EndpointFailure is raised for the whole request to be retried.
+    """
+    import requests
+
+    # Lengths, digests and ranges apply to the encoded body, while
+    # iter_content() yields decoded chunks
+    plain = "Content-Encoding" not in response.headers
+    length = response.headers.get("Content-Length") if plain else None
+    digest = expected_digest(response.headers) if plain else None
+    hasher = hashlib.new(digest[0]) if digest else None
+    location = response.headers.get("Content-Location")
+    resumable = plain and location and response.headers.get("Accept-Ranges") == "bytes"
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.download"
+    written = 0
+    current = response
+    attempts = 0
+    try:
+        with open(tmp_path, "wb", buffering=buffer_size) as file:
+            while True:
+                try:
+                    if current is None:
+                        url = urljoin(response.url, location)
+                        current = resume(
+                            session,
+                            url,
+                            written,
+                            response.headers.get("ETag"),
+                            **kwargs,
+                        )
+                    for chunk in current.iter_content(chunk_size=buffer_size):
+                        file.write(chunk)
+                        written += len(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        metrics.inc("download_bytes", len(chunk))
+                        if cancelled is not None and cancelled.is_set():
+                            raise Cancelled()
+                    break
+                except (
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                ) as error:
+                    if not resumable or attempts == resumes:
+                        raise EndpointFailure(
+                            f"Download interrupted after {written} bytes: {error}"
+                        ) from error
+                    attempts += 1
+                    logging.warning(
+                        "Download interrupted after %d bytes, resuming (%s)",
+                        written,
+                        error,
+                    )
+                finally:
+                    if current is not response and current is not None:
+                        current.close()
+                    current = None
+
+        if length is not None and written != int(length):
+            raise EndpointFailure(f"Truncated download: {written} of {length} bytes")
+        if digest and hasher and hasher.digest() != digest[1]:
+            raise EndpointFailure("Downloaded PDF does not match its digest")
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
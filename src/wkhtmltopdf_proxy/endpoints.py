@@ -0,0 +1,211 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+from .state import locked_json
+
+DEFAULT_EJECT_TIME = 30.0
+PROBE_TIMEOUT = 2.0
+
+T = TypeVar("T")
+
+
+class EndpointFailure(Exception):
+    """The endpoint could not serve the request: eject it."""
+
+
+class RenderError(Exception):
+    """The renderer rejected the request or failed to render it."""
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    url: str
+    weight: float = 1.0
+
+
+def parse_endpoints(value: str) -> List[Endpoint]:
+    """Parse `WKHTMLTOPDF_PROXY_URL`: comma-separated URLs with weights.
+
+    Example: `http://a:8000;weight=2,http://b:8000`.
+    """
+    endpoints = []
+    for item in value.split(","):
+        url, *params = (token.strip() for token in item.split(";"))
+        if not url:
+            continue
+
+        weight = 1.0
+        for param in params:
+            key, _sep, param_value = param.partition("=")
+            if key.strip() == "weight":
+                weight = float(param_value)
+        endpoints.append(Endpoint(url, max(weight, 0.001)))
+
+    return endpoints
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class EndpointPool:
+    """Least-loaded balancing over several rendering endpoints.
+
+    Outstanding requests are counted per endpoint and per process in a
+    state file shared by every proxy process, so concurrent invocations
+    spread over the endpoints; counts of dead processes are dropped. Each
+    request goes to the healthy endpoint with the fewest outstanding
+    requests relative to its weight. A failing endpoint is ejected for
+    `eject_time` seconds, after which it is probed in a background thread
+    and put back in rotation once it answers.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        state_path: str,
+        eject_time: float = DEFAULT_EJECT_TIME,
+    ):
+        if not endpoints:
+            raise ValueError("No endpoint defined.")
+        self.endpoints = endpoints
+        self.state_path = state_path
+        self.eject_time = eject_time
+
+    @classmethod
+    def from_config(cls, config) -> "EndpointPool":
+        return cls(
+            parse_endpoints(config.url),
+            os.path.join(config.state_dir, "endpoints.json"),
+            config.eject_time,
+        )
+
+    def entry(self, state: dict, endpoint: Endpoint) -> dict:
+        entry = state.setdefault(endpoint.url, {})
+        entry.setdefault("outstanding", {})
+        entry.setdefault("ejected_until", 0)
+        outstanding = entry["outstanding"]
+        for pid in [pid for pid in outstanding if not pid_alive(int(pid))]:
+            del outstanding[pid]
+        return entry
+
+    def load(self, entry: dict, endpoint: Endpoint) -> float:
+        return sum(entry["outstanding"].values()) / endpoint.weight
+
+    def acquire(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """Pick the least loaded endpoint and count a request on it."""
+        now = time.time()
+        probes = []
+        with locked_json(self.state_path) as state:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+
+            entries = {e: self.entry(state, e) for e in candidates}
+            healthy = [e for e in candidates if entries[e]["ejected_until"] <= now]
+
+            for endpoint in candidates:
+                entry = entries[endpoint]
+                # Probe once the ejection is over, one process at a time
+                if entry["ejected_until"] and entry["ejected_until"] <= now:
+                    entry["ejected_until"] = now + self.eject_time
+                    probes.append(endpoint)
+
+            # When every endpoint is down, try the one ejected first
+            if not healthy:
+                healthy = [min(candidates, key=lambda e: entries[e]["ejected_until"])]
+
+            endpoint = min(healthy, key=lambda e: self.load(entries[e], e))
+            outstanding = entries[endpoint]["outstanding"]
+            pid = str(os.getpid())
+            outstanding[pid] = outstanding.get(pid, 0) + 1
+
+        # Not a daemon thread: a short-lived proxy process waits for its
+        # probes, otherwise the endpoint would stay ejected
+        for probe in probes:
+            threading.Thread(target=self.probe, args=(probe,)).start()
+
+        return endpoint
+
+    def release(self, endpoint: Endpoint, failed: bool = False) -> None:
+        with locked_json(self.state_path) as state:
+            entry = self.entry(state, endpoint)
+            pid = str(os.getpid())
+            count = entry["outstanding"].get(pid, 0) - 1
+            if count > 0:
+                entry["outstanding"][pid] = count
+            else:
+                entry["outstanding"].pop(pid, None)
+
+            if failed:
+                entry["ejected_until"] = time.time() + self.eject_time
+
+        if failed:
+            logging.warning(
+                "Endpoint %s ejected for %ss", endpoint.url, self.eject_time
+            )
+
+    def restore(self, endpoint: Endpoint) -> None:
+        with locked_json(self.state_path) as state:
+            self.entry(state, endpoint)["ejected_until"] = 0
+        logging.info("Endpoint %s is back in rotation", endpoint.url)
+
+    def probe(self, endpoint: Endpoint) -> bool:
+        """Check whether an ejected endpoint answers again."""
+        import requests
+
+        try:
+            response = requests.get(endpoint.url, timeout=PROBE_TIMEOUT)
+        except requests.exceptions.RequestException as error:
+            logging.info("Endpoint %s probe failed: %s", endpoint.url, error)
+            return False
+
+        if response.status_code >= 500:
+            logging.info(
+                "Endpoint %s probe failed: %s", endpoint.url, response.status_code
+            )
+            return False
+
+        self.restore(endpoint)
+        return True
+
+    def call(self, function: Callable[[Endpoint], T]) -> T:
+        """Call `function` with an endpoint, failing over to the others.
+
+        The last EndpointFailure is raised when every endpoint failed.
+        """
+        # Nothing to balance: skip the shared state
+        if len(self.endpoints) == 1:
+            return function(self.endpoints[0])
+
+        failed: List[Endpoint] = []
+        error = EndpointFailure("No endpoint available.")
+        while True:
+            endpoint = self.acquire(failed)
+            if endpoint is None:
+                raise error
+
+            try:
+                result = function(endpoint)
+            except EndpointFailure as failure:
+                self.release(endpoint, failed=True)
+                logging.warning("Endpoint %s failed: %s", endpoint.url, failure)
+                failed.append(endpoint)
+                error = failure
+                continue
+            except BaseException:
+                self.release(endpoint)
+                raise
+
+            self.release(endpoint)
+            return result
@@ -0,0 +1,76 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+def split(items: Sequence[T], groups: int) -> List[List[T]]:
+    """Split `items` into at most `groups` contiguous groups of even sizes."""
+    groups = max(min(groups, len(items)), 1)
+    size, extra = divmod(len(items), groups)
+    result, start = [], 0
+    for index in range(groups):
+        end = start + size + (index < extra)
+        result.append(list(items[start:end]))
+        start = end
+    return result
+
+
+def can_merge() -> bool:
+    # pypdf is an optional dependency, only imported when bodies are split
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        logging.warning("pypdf is not installed, bodies are rendered in one request")
+        return False
+    return True
+
+
+def merge_pdfs(paths: List[str], output: str) -> None:
+    """Concatenate PDF files in order, replacing `output` atomically."""
+    import pypdf
+
+    writer = pypdf.PdfWriter()
+    for path in paths:
+        writer.append(path)
+
+    tmp_path = f"{output}.{os.getpid()}.merge.part"
+    try:
+        with open(tmp_path, "wb") as file:
+            writer.write(file)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def fan_out(
+    groups: List[List[str]], render: Callable[[List[str], str], None], output: str
+) -> None:
+    """Render each group of bodies in parallel, then merge them in order.
+
+    `render(bodies, path)` renders one group to `path`; the first error
+    raised by a group is re-raised once every group has finished.
+    """
+    paths = [
+        f"{output}.{os.getpid()}.group-{index}.part" for index in range(len(groups))
+    ]
+    logging.info("Rendering %d bodies in %d groups", sum(map(len, groups)), len(groups))
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = [
+                executor.submit(render, bodies, path)
+                for bodies, path in zip(groups, paths)
+            ]
+            for future in futures:
+                future.result()
+
+        merge_pdfs(paths, output)
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.unlink(path)
@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional
+from urllib.parse import urljoin
+
+from .compression import accept_encoding
+from .dedup import MissingParts
+from .download import DEFAULT_BUFFER_SIZE, DEFAULT_RESUMES, download
+from .endpoints import EndpointFailure, RenderError
+from .log import logs
+from .metrics import metrics
+from .multipart import Cancelled, FilePart, MultipartEncoder
+from .trace import tracer
+
+if TYPE_CHECKING:
+    import requests
+
+DONE, FAILED = "done", "failed"
+
+
+class JobClient:
+    """Asynchronous rendering through the job API of the renderer.
+
+    The files are posted to `<url>/jobs`, which answers `202 Accepted` with
+    the job URL in its Location header. The job is then polled with
+    `GET <job url>?wait=<seconds>`: servers supporting long polling answer
+    once the job is over or after `wait` seconds, others at once, in which
+    case polls are spaced from `poll_interval` up to `poll_max` seconds (or
+    by their Retry-After header). The job status is a JSON object with
+    `status` (`pending`, `running`, `done` or `failed`), `progress` from 0
+    to 1, `error`, and the URL of the PDF in `result` once done.
+
+    No connection is held while the PDF is rendered, and polls failing with
+    a connection error, a timeout or a 5xx answer are retried until
+    `job_timeout` seconds have passed. A rejected request or a failed job
+    raises RenderError.
+    """
+
+    def __init__(
+        self,
+        session: "requests.Session",
+        poll_interval: float,
+        poll_max: float,
+        job_timeout: float,
+    ):
+        self.session = session
+        self.poll_interval = poll_interval
+        self.poll_max = poll_max
+        self.job_timeout = job_timeout
+
+    @classmethod
+    def from_config(cls, config, session, total: int) -> Optional["JobClient"]:
+        if not config.jobs or total < config.job_threshold:
+            return None
+        return cls(
+            session, config.job_poll_interval, config.job_poll_max, config.job_timeout
+        )
+
+    def submit(
+        self,
+        url: str,
+        files: List[FilePart],
+        data: dict,
+        headers: dict,
+        cancelled: Optional[threading.Event],
+        timeout: Optional[float],
+    ) -> str:
+        """Upload the files, returning the job URL."""
+        import requests
+
+        encoder = MultipartEncoder(data, files)
+        headers = {
+            **headers,
+            "Content-Type": encoder.content_type,
+            "traceparent": tracer.traceparent(),
+        }
+        start = time.perf_counter()
+        response = self.session.post(
+            url.rstrip("/") + "/jobs",
+            data=encoder.body(cancelled),
+            headers=headers,
+            timeout=timeout,
+        )
+        metrics.observe(
+            "phase_duration_seconds", time.perf_counter() - start, phase="upload"
+        )
+        metrics.inc("upload_bytes", encoder.sent)
+        tracer.response(headers, response)
+
+        if response.status_code == 409 and "digests" in data:
+            raise MissingParts(response.json().get("missing", []))
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as error:
+            logging.error(error)
+            if response.status_code >= 500:
+                raise EndpointFailure(str(error)) from error
+            raise RenderError(str(error)) from error
+
+        if "Location" not in response.headers:
+            raise EndpointFailure(f"No job location in the answer of {url}")
+
+        job_url = urljoin(response.url, response.headers["Location"])
+        logging.info("Job submitted: %s", job_url)
+        return job_url
+
+    def poll(self, job_url: str, wait: float, timeout: Optional[float]) -> dict:
+        """Return the status of the job, waiting up to `wait` seconds for it."""
+        import requests
+
+        headers = {"Accept": "application/json", "traceparent": tracer.traceparent()}
+        response = self.session.get(
+            job_url,
+            params={"wait": f"{wait:g}"},
+            headers=headers,
+            timeout=wait + timeout if timeout else None,
+        )
+        tracer.response(headers, response)
+        # The job is gone, e.g. the renderer restarted
+        if response.status_code == 404:
+            raise EndpointFailure(f"Job {job_url} is unknown to the renderer")
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as error:
+            # Only server errors are worth polling again
+            if response.status_code < 500:
+                raise RenderError(str(error)) from error
+            raise
+
+        try:
+            status = response.json()
+        except ValueError:
+            status = None
+        if not isinstance(status, dict):
+            raise RenderError(f"Invalid status of job {job_url}: {response.text!r}")
+        if retry_after := response.headers.get("Retry-After", "").strip():
+            if retry_after.isdigit():
+                status.setdefault("retry_after", int(retry_after))
+        return status
+
+    def wait(
+        self,
+        job_url: str,
+        cancelled: Optional[threading.Event],
+        timeout: Optional[float],
+    ) -> str:
+        """Poll the job until it is over, returning the URL of the PDF."""
+        import requests
+
+        start = time.monotonic()
+        deadline = start + self.job_timeout
+        interval = self.poll_interval
+        last = None
+
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise Cancelled()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise EndpointFailure(
+                    f"Job {job_url} not done after {self.job_timeout}s"
+                )
+
+            wait = min(self.poll_max, remaining)
+            polled = time.monotonic()
+            try:
+                status = self.poll(job_url, wait, timeout)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.HTTPError,
+            ) as error:
+                # The job keeps running on the renderer, only the poll is lost
+                logging.warning(
+                    "Job poll failed, retrying in %.1fs: %s", interval, error
+                )
+                status = {"retry_after": interval}
+
+            state = status.get("status")
+            if state == DONE:
+                if not status.get("result"):
+                    raise RenderError(f"Job {job_url} done without a result")
+                logging.info("Job done in %.3fs: %s", time.monotonic() - start, job_url)
+                return urljoin(job_url, status["result"])
+            if state == FAILED:
+                error = status.get("error") or "unknown error"
+                logging.error("Job failed: %s", error)
+                raise RenderError(error)
+
+            if state and (state, status.get("progress")) != last:
+                last = (state, status.get("progress"))
+                logging.info(
+                    "Job %s: %s, %d%% after %.1fs",
+                    job_url,
+                    state,
+                    100 * float(status.get("progress") or 0),
+                    time.monotonic() - start,
+                )
+
+            # No need to sleep after a long poll, but a server answering
+            # at once is polled less and less often
+            pause = status.get("retry_after", interval) - (time.monotonic() - polled)
+            if pause > 0:
+                time.sleep(min(pause, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, self.poll_max)
+
+    @logs
+    def send(
+        self,
+        url: str,
+        files: List[FilePart],
+        data: dict,
+        output_filepath: str,
+        headers: Optional[dict] = None,
+        cancelled: Optional[threading.Event] = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        resumes: int = DEFAULT_RESUMES,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Render as a job, like `send_request` does synchronously."""
+        import requests
+
+        try:
+            job_url = self.submit(url, files, data, headers or {}, cancelled, timeout)
+            try:
+                with metrics.phase("wait"):
+                    result_url = self.wait(job_url, cancelled, timeout)
+            except Cancelled:
+                self.cancel(job_url)
+                raise
+
+            headers = {"Accept-Encoding": accept_encoding()}
+            with self.session.get(
+                result_url, headers=headers, stream=True, timeout=timeout
+            ) as response:
+                if response.status_code >= 400:
+                    raise EndpointFailure(
+                        f"Download of {result_url} failed: {response.status_code}"
+                    )
+                with metrics.phase("download"):
+                    download(
+                        self.session,
+                        response,
+                        output_filepath,
+                        buffer_size,
+                        resumes,
+                        cancelled,
+                        timeout=timeout,
+                    )
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as error:
+            logging.error(error)
+            raise EndpointFailure(str(error)) from error
+
+    def cancel(self, job_url: str) -> None:
+        """Tell the renderer the job is no longer needed, on a best effort."""
+        import requests
+
+        try:
+            self.session.delete(job_url, timeout=self.poll_interval or 1)
+        except requests.exceptions.RequestException as error:
+            logging.debug("Job %s not cancelled: %s", job_url, error)
@@ -0,0 +1,83 @@
+import logging
+import os
+import signal
+import subprocess
+import time
+from typing import List, Optional
+
+from .metrics import metrics
+from .state import FileSemaphore
+
+BINARY = "wkhtmltopdf"
+# Exit status of a render killed after its timeout, as timeout(1) does
+TIMEOUT_STATUS = 124
+
+
+class LocalRenderer:
+    """Run the local wkhtmltopdf binary through a bounded pool of slots.
+
+    At most `workers` renderers run at the same time across every proxy
+    process sharing the state directory; other invocations wait in line
+    for up to `queue_timeout` seconds. A renderer still running after
+    `timeout` seconds is killed together with its child processes.
+    """
+
+    def __init__(
+        self,
+        slots_dir: str,
+        workers: int,
+        timeout: float,
+        queue_timeout: Optional[float] = None,
+        binary: str = BINARY,
+    ):
+        self.semaphore = FileSemaphore(slots_dir, workers)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.binary = binary
+
+    @classmethod
+    def from_config(cls, config) -> "LocalRenderer":
+        return cls(
+            os.path.join(config.state_dir, "local"),
+            config.local_workers,
+            config.local_timeout,
+            config.queue_timeout,
+        )
+
+    def run(self, args: List[str]) -> int:
+        """Render with the local binary and return its exit status."""
+        start = time.perf_counter()
+        try:
+            with self.semaphore.acquire(self.queue_timeout):
+                waited = time.perf_counter() - start
+                logging.info("Local render: waited %.3fs for a slot", waited)
+                metrics.observe("phase_duration_seconds", waited, phase="queue")
+                with metrics.phase("render"):
+                    return self.execute(args)
+        except TimeoutError:
+            logging.error(
+                "Local render: no free slot after %.3fs", time.perf_counter() - start
+            )
+            raise
+
+    def execute(self, args: List[str]) -> int:
+        start = time.perf_counter()
+        # The renderer gets its own process group so that a kill reaches
+        # the processes it spawned too
+        process = subprocess.Popen([self.binary] + args, start_new_session=True)
+        try:
+            status = process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            logging.error("Local render: killed after %ss timeout", self.timeout)
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            status = TIMEOUT_STATUS
+        except BaseException:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            raise
+
+        logging.info(
+            "Local render: exit status %d in %.3fs", status, time.perf_counter() - start
+        )
+        return status
@@ -0,0 +1,197 @@
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from functools import wraps
+from typing import List, Optional
+
+DEFAULT_LOG_FILE = os.path.join(os.path.expanduser("~"), "wkhtmltopdf.log")
+FORMAT = (
+    "%(asctime)s - %(filename)s:%(funcName)s:%(lineno)d %(levelname)s - '%(message)s'"
+)
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_handler: Optional["BackgroundHandler"] = None
+
+
+def logs(function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        logging.debug("%s: start", function.__qualname__)
+        output = function(*args, **kwargs)
+
+        duration = time.perf_counter() - start
+        logging.info(
+            "%s: end",
+            function.__qualname__,
+            extra={
+                "fields": {
+                    "function": function.__qualname__,
+                    "duration": round(duration, 6),
+                }
+            },
+        )
+
+        return output
+
+    return wrapper
+
+
+class FieldsFormatter(logging.Formatter):
+    """Append the `fields` of a record as `key=value` pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if not fields:
+            return message
+        return (
+            message + " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        )
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a random fraction of the DEBUG records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class BackgroundHandler(logging.Handler):
+    """Hand records over to a thread that writes them to `target`.
+
+    Logging calls only put the record on a queue, the formatting and the
+    write happen off the hot path. Closing the handler, which
+    logging.shutdown() does at exit, drains the queue first.
+
+    logging.handlers is imported only once a log destination is set up.
+    """
+
+    def __init__(self, target: logging.Handler):
+        super().__init__()
+        self.target = target
+        self.start()
+
+    def start(self) -> None:
+        """Start the writer thread, e.g. again in a forked child."""
+        from logging.handlers import QueueListener
+
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener = QueueListener(
+            self.queue, self.target, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            # The arguments may change before the writer thread formats them
+            record.msg = record.getMessage()
+            record.args = None
+            self.queue.put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+    @classmethod
+    def from_config(cls, config) -> "BackgroundHandler":
+        if config.log_file == "-":
+            target: logging.Handler = logging.StreamHandler(sys.stderr)
+        else:
+            from logging.handlers import RotatingFileHandler
+
+            # Several processes can rotate the file at the same time, a few
+            # records may then land in a backup file instead
+            target = RotatingFileHandler(
+                config.log_file,
+                maxBytes=config.log_max_size,
+                backupCount=config.log_backups,
+            )
+        target.setFormatter(FieldsFormatter(FORMAT, DATE_FORMAT))
+        handler = cls(target)
+        if config.log_sample < 1:
+            handler.addFilter(DebugSampler(config.log_sample))
+        return handler
+
+    def close(self) -> None:
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
+
+
+class HeldRecords(logging.Handler):
+    """Hold the records logged before setup_logging(), to replay them after.
+
+    Without any handler, logging.warning() would call basicConfig(), and
+    setup_logging() would then keep that stderr handler. Nothing is held
+    when the logger already has handlers.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        super().__init__()
+        self.logger = logger or logging.getLogger()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+    def __enter__(self) -> "HeldRecords":
+        if not self.logger.handlers:
+            self.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.logger.removeHandler(self)
+
+    def replay(self) -> None:
+        for record in self.records:
+            if self.logger.isEnabledFor(record.levelno):
+                self.logger.handle(record)
+        self.records = []
+
+
+def get_level(name: str) -> int:
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+        logging.warning("Invalid log level '%s', falling back to DEBUG", name)
+        return logging.DEBUG
+    return level
+
+
+def setup_logging(config, logger: Optional[logging.Logger] = None) -> None:
+    """Send the records of `logger` to the configured log destination.
+
+    Like logging.basicConfig(), nothing is done when the logger already has
+    handlers, e.g. when the proxy is used as a library.
+    """
+    global _handler
+
+    logger = logger or logging.getLogger()
+    if logger.handlers:
+        return
+
+    with HeldRecords(logger) as held:
+        logger.setLevel(get_level(config.log_level))
+    if not config.log_file:
+        logger.addHandler(logging.NullHandler())
+        return
+
+    _handler = BackgroundHandler.from_config(config)
+    logger.addHandler(_handler)
+    held.replay()
+
+
+def _after_fork() -> None:
+    # The writer thread does not survive a fork, e.g. in the daemon
+    if _handler is not None:
+        _handler.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
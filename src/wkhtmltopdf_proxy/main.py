@@ -2,39 +2,43 @@ import json
 import logging
 import os
 import re
+import shutil
 import sys
+import threading
 import time
+import uuid
+from contextlib import nullcontext
 from dataclasses import dataclass
-from functools import wraps
-from typing import List, Literal, cast
-
-import requests
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple, cast
+
+from .admission import URGENCY, Admission, classify
+from .breaker import CircuitBreaker
+from .cache import ResultCache
+from .compression import accept_encoding, get_encoding
+from .dedup import DigestUploader, MissingParts
+from .download import DEFAULT_BUFFER_SIZE, DEFAULT_RESUMES, download
+from .endpoints import Endpoint, EndpointFailure, EndpointPool, RenderError
+from .log import DEFAULT_LOG_FILE, HeldRecords, logs, setup_logging
+from .metrics import metrics
+from .minify import minify_bytes
+from .multipart import Cancelled, FilePart, MultipartEncoder
+from .options import OptionError, parse_argv
+from .retry import Hedger, RetryPolicy
+from .routing import Router
+from .trace import tracer
+
+# requests takes longer to import than the rest of the proxy together, it
+# is loaded only once a request has to be sent. The assets, capture, fanout,
+# jobs and local modules are imported where their feature is enabled; the
+# small modules above are needed to decide it for every invocation.
+if TYPE_CHECKING:
+    import requests
 
 VALID_MODES = {"auto", "local", "remote"}
 SESSION_PATTERN = r"session_id=([^;]+)"
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".wkhtmltopdf-proxy")
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    filename=os.path.join(os.path.expanduser("~"), "wkhtmltopdf.log"),
-    format="%(asctime)s - %(filename)s:%(funcName)s:%(lineno)d %(levelname)s - '%(message)s'",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
-
-
-def logs(function):
-    @wraps(function)
-    def wrapper(*args, **kwargs):
-        start = time.perf_counter()
-        logging.info("%s: start", function.__qualname__)
-        output = function(*args, **kwargs)
-
-        end = time.perf_counter()
-        message = f"{function.__qualname__}: end ({end - start:.6f})"
-        logging.info(message)
-
-        return output
-
-    return wrapper
+_session: Optional["requests.Session"] = None
 
 
 @dataclass(frozen=True)
@@ -46,6 +50,50 @@ class ProxyConfig:
     mode: Literal["auto", "local", "remote"]
     url: str
     skip_cookie: bool = False
+    state_dir: str = DEFAULT_STATE_DIR
+    cache: bool = False
+    cache_max_size: int = 512 * 1024 * 1024
+    cache_max_age: int = 7 * 24 * 3600
+    compression: str = "none"
+    compression_threshold: int = 64 * 1024
+    dedup: bool = False
+    local_workers: int = os.cpu_count() or 1
+    local_timeout: int = 600
+    routing_min_samples: int = 20
+    routing_explore: float = 0.05
+    eject_time: int = 30
+    retries: int = 0
+    retry_backoff: float = 0.5
+    hedge_percentile: float = 0
+    fanout: int = 0
+    metrics_file: str = ""
+    log_level: str = "DEBUG"
+    log_file: str = DEFAULT_LOG_FILE
+    log_max_size: int = 10 * 1024 * 1024
+    log_backups: int = 5
+    log_sample: float = 1.0
+    download_buffer_size: int = DEFAULT_BUFFER_SIZE
+    download_resumes: int = DEFAULT_RESUMES
+    inline_assets: bool = False
+    max_concurrency: int = 0
+    rate_limit: float = 0
+    rate_burst: float = 0
+    queue_timeout: float = 60
+    breaker_failures: int = 0
+    breaker_window: float = 60
+    breaker_open_time: float = 30
+    breaker_slow_time: float = 0
+    jobs: bool = False
+    job_threshold: int = 0
+    job_poll_interval: float = 1.0
+    job_poll_max: float = 30
+    job_timeout: float = 3600
+    trace_file: str = ""
+    capture_dir: str = ""
+    priority: str = ""
+    priority_batch_bodies: int = 20
+    priority_batch_size: int = 0
+    interactive_slots: int = 0
 
     @classmethod
     def load(cls) -> "ProxyConfig":
@@ -63,6 +111,83 @@ class ProxyConfig:
             mode=cast(Literal["auto", "local", "remote"], mode),
             url=os.getenv("WKHTMLTOPDF_PROXY_URL", ""),
             skip_cookie=bool(int(os.getenv("WKHTMLTOPDF_PROXY_SKIP_COOKIE", 0))),
+            state_dir=os.getenv("WKHTMLTOPDF_PROXY_STATE_DIR", DEFAULT_STATE_DIR),
+            cache=bool(int(os.getenv("WKHTMLTOPDF_PROXY_CACHE", 0))),
+            cache_max_size=int(
+                os.getenv("WKHTMLTOPDF_PROXY_CACHE_MAX_SIZE", 512 * 1024 * 1024)
+            ),
+            cache_max_age=int(
+                os.getenv("WKHTMLTOPDF_PROXY_CACHE_MAX_AGE", 7 * 24 * 3600)
+            ),
+            compression=get_encoding(
+                os.getenv("WKHTMLTOPDF_PROXY_COMPRESSION", "none").lower()
+            ),
+            compression_threshold=int(
+                os.getenv("WKHTMLTOPDF_PROXY_COMPRESSION_THRESHOLD", 64 * 1024)
+            ),
+            dedup=bool(int(os.getenv("WKHTMLTOPDF_PROXY_DEDUP", 0))),
+            local_workers=int(
+                os.getenv("WKHTMLTOPDF_PROXY_LOCAL_WORKERS", os.cpu_count() or 1)
+            ),
+            local_timeout=int(
+                os.getenv(
+                    "WKHTMLTOPDF_PROXY_LOCAL_TIMEOUT",
+                    os.getenv("WKHTMLTOPDF_PROXY_TIMEOUT", 600),
+                )
+            ),
+            routing_min_samples=int(
+                os.getenv("WKHTMLTOPDF_PROXY_ROUTING_MIN_SAMPLES", 20)
+            ),
+            routing_explore=float(os.getenv("WKHTMLTOPDF_PROXY_ROUTING_EXPLORE", 0.05)),
+            eject_time=int(os.getenv("WKHTMLTOPDF_PROXY_EJECT_TIME", 30)),
+            retries=int(os.getenv("WKHTMLTOPDF_PROXY_RETRIES", 0)),
+            retry_backoff=float(os.getenv("WKHTMLTOPDF_PROXY_RETRY_BACKOFF", 0.5)),
+            hedge_percentile=float(os.getenv("WKHTMLTOPDF_PROXY_HEDGE_PERCENTILE", 0)),
+            fanout=int(os.getenv("WKHTMLTOPDF_PROXY_FANOUT", 0)),
+            metrics_file=os.getenv("WKHTMLTOPDF_PROXY_METRICS_FILE", ""),
+            log_level=os.getenv("WKHTMLTOPDF_PROXY_LOG_LEVEL", "DEBUG"),
+            log_file=os.getenv("WKHTMLTOPDF_PROXY_LOG_FILE", DEFAULT_LOG_FILE),
+            log_max_size=int(
+                os.getenv("WKHTMLTOPDF_PROXY_LOG_MAX_SIZE", 10 * 1024 * 1024)
+            ),
+            log_backups=int(os.getenv("WKHTMLTOPDF_PROXY_LOG_BACKUPS", 5)),
+            log_sample=float(os.getenv("WKHTMLTOPDF_PROXY_LOG_SAMPLE", 1.0)),
+            download_buffer_size=int(
+                os.getenv("WKHTMLTOPDF_PROXY_DOWNLOAD_BUFFER_SIZE", DEFAULT_BUFFER_SIZE)
+            ),
+            download_resumes=int(
+                os.getenv("WKHTMLTOPDF_PROXY_DOWNLOAD_RESUMES", DEFAULT_RESUMES)
+            ),
+            inline_assets=bool(int(os.getenv("WKHTMLTOPDF_PROXY_INLINE_ASSETS", 0))),
+            max_concurrency=int(os.getenv("WKHTMLTOPDF_PROXY_MAX_CONCURRENCY", 0)),
+            rate_limit=float(os.getenv("WKHTMLTOPDF_PROXY_RATE_LIMIT", 0)),
+            rate_burst=float(os.getenv("WKHTMLTOPDF_PROXY_RATE_BURST", 0)),
+            queue_timeout=float(os.getenv("WKHTMLTOPDF_PROXY_QUEUE_TIMEOUT", 60)),
+            breaker_failures=int(os.getenv("WKHTMLTOPDF_PROXY_BREAKER_FAILURES", 0)),
+            breaker_window=float(os.getenv("WKHTMLTOPDF_PROXY_BREAKER_WINDOW", 60)),
+            breaker_open_time=float(
+                os.getenv("WKHTMLTOPDF_PROXY_BREAKER_OPEN_TIME", 30)
+            ),
+            breaker_slow_time=float(
+                os.getenv("WKHTMLTOPDF_PROXY_BREAKER_SLOW_TIME", 0)
+            ),
+            jobs=bool(int(os.getenv("WKHTMLTOPDF_PROXY_JOBS", 0))),
+            job_threshold=int(os.getenv("WKHTMLTOPDF_PROXY_JOB_THRESHOLD", 0)),
+            job_poll_interval=float(
+                os.getenv("WKHTMLTOPDF_PROXY_JOB_POLL_INTERVAL", 1.0)
+            ),
+            job_poll_max=float(os.getenv("WKHTMLTOPDF_PROXY_JOB_POLL_MAX", 30)),
+            job_timeout=float(os.getenv("WKHTMLTOPDF_PROXY_JOB_TIMEOUT", 3600)),
+            trace_file=os.getenv("WKHTMLTOPDF_PROXY_TRACE_FILE", ""),
+            capture_dir=os.getenv("WKHTMLTOPDF_PROXY_CAPTURE_DIR", ""),
+            priority=os.getenv("WKHTMLTOPDF_PROXY_PRIORITY", "").lower(),
+            priority_batch_bodies=int(
+                os.getenv("WKHTMLTOPDF_PROXY_PRIORITY_BATCH_BODIES", 20)
+            ),
+            priority_batch_size=int(
+                os.getenv("WKHTMLTOPDF_PROXY_PRIORITY_BATCH_SIZE", 0)
+            ),
+            interactive_slots=int(os.getenv("WKHTMLTOPDF_PROXY_INTERACTIVE_SLOTS", 0)),
         )
 
     @property
@@ -73,60 +198,37 @@ class ProxyConfig:
         return json.dumps(self.__dict__, indent=2)
 
 
-@logs
-def parse_args(input_args: List, skip_cookie: bool = False) -> dict:
-    def is_arg(value):
-        return value.startswith("--")
+def get_session() -> "requests.Session":
+    """Return the HTTP session shared by every request of this process."""
+    global _session
 
-    def find_values(items, start):
-        for item in items[start:]:
-            if is_arg(item):
-                break
-            yield item
+    if _session is None:
+        import requests
 
-    def removeprefix(value, prefix="--"):
-        # Python <= 3.8
-        return value.replace(prefix, "") if value.startswith(prefix) else value
+        _session = requests.Session()
 
-    logging.debug(f"Input arguments: \n{input_args}")
+    return _session
 
-    args = input_args.copy()
+
+@logs
+def parse_args(input_args: List, skip_cookie: bool = False) -> dict:
+    logging.debug("Input arguments: \n%s", input_args)
+
+    try:
+        parsed = parse_argv(input_args)
+    except OptionError as error:
+        # wkhtmltopdf would fail too, no need for a round trip
+        logging.error("Invalid arguments: %s", error)
+        sys.exit(f"Invalid arguments: {error}")
+
+    dict_args = parsed["options"]
     vals = {
-        "output": args.pop(),
+        "output": parsed["output"],
         "header": False,
         "footer": False,
-        "header-html": False,
-        "footer-html": False,
+        "header-html": "header-html" in dict_args,
+        "footer-html": "footer-html" in dict_args,
     }
-    dict_args = {}
-    first_index, last_index = 0, 0
-
-    for key in ["--header-html", "--footer-html"]:
-        if key in args:
-            name = removeprefix(key)
-            index = args.index(key)
-
-            vals[name] = True
-            if index < first_index:
-                first_index = index
-            if index + 1 > last_index:
-                last_index = index + 1
-
-    command_args = args[: first_index - 1]
-    for index, item in enumerate(command_args):
-        if not is_arg(item):
-            continue
-
-        name = removeprefix(item)
-        dict_args.setdefault(name)
-
-        values = list(iter(find_values(command_args, index + 1)))
-        if not values:
-            dict_args[name] = None
-        elif len(values) == 1:
-            dict_args[name] = values[0]
-        else:
-            dict_args[name] = values
 
     # Handle cookie-jar to extract session_id cookie
     if not skip_cookie and (cookie_jar := dict_args.pop("cookie-jar", None)):
@@ -138,36 +240,90 @@ def parse_args(input_args: List, skip_cookie: bool = False) -> dict:
                 # session_id=af8671bxxxxxxxxxxxxxxxx; HttpOnly; domain=test.com; path=/;
                 # https://stackoverflow.com/questions/58571962/how-to-send-cookies-with-pdfkit-in-python
 
-                dict_args["cookie"] = [(cookie[0], cookie[1])]
+                dict_args.setdefault("cookie", []).append((cookie[0], cookie[1]))
 
     vals.update(
         {
             "dict_args": dict_args,
-            "bodies": args[last_index + 1 :],
+            "bodies": parsed["bodies"],
+            "cover": parsed["cover"],
+            "toc": parsed["toc"],
         }
     )
 
-    logging.debug(f"Parsed values: \n{vals}")
+    logging.debug("Parsed values: \n%s", vals)
 
     return vals
 
 
 @logs
 def send_request(
-    url: str, files: List, data: dict, output_filepath: str, **kwargs
+    url: str,
+    files: List[FilePart],
+    data: dict,
+    output_filepath: str,
+    headers: Optional[dict] = None,
+    cancelled: Optional[threading.Event] = None,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    resumes: int = DEFAULT_RESUMES,
+    **kwargs,
 ) -> None:
-    with requests.post(url, files=files, data=data, stream=True, **kwargs) as response:
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as error:
-            logging.error(error)
-            sys.exit(f"Error during PDF generation: {error}")
-
-        logging.debug(response.headers)
+    import requests
+
+    # The multipart body is streamed, file parts are read only when sent
+    encoder = MultipartEncoder(data, files)
+    headers = {
+        **(headers or {}),
+        "Accept-Encoding": accept_encoding(),
+        "Content-Type": encoder.content_type,
+        "traceparent": tracer.traceparent(),
+    }
 
-        with open(output_filepath, "wb") as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+    session = get_session()
+    start = time.perf_counter()
+    try:
+        with session.post(
+            url, data=encoder.body(cancelled), headers=headers, stream=True, **kwargs
+        ) as response:
+            # The body is fully sent before the server answers
+            answered = time.perf_counter()
+            tracer.response(headers, response)
+            sent = encoder.sent_at or answered
+            metrics.observe("phase_duration_seconds", sent - start, phase="upload")
+            metrics.observe("phase_duration_seconds", answered - sent, phase="wait")
+            metrics.inc("upload_bytes", encoder.sent)
+
+            # Parts referenced by digest have been evicted by the server
+            if response.status_code == 409 and "digests" in data:
+                raise MissingParts(response.json().get("missing", []))
+
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as error:
+                logging.error(error)
+                # Server errors are worth another endpoint
+                if response.status_code >= 500:
+                    raise EndpointFailure(str(error)) from error
+                raise RenderError(str(error)) from error
+
+            logging.debug(response.headers)
+
+            if cancelled is not None and cancelled.is_set():
+                raise Cancelled()
+
+            with metrics.phase("download"):
+                download(
+                    session,
+                    response,
+                    output_filepath,
+                    buffer_size,
+                    resumes,
+                    cancelled,
+                    timeout=kwargs.get("timeout"),
+                )
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+        logging.error(error)
+        raise EndpointFailure(str(error)) from error
 
 
 def sizeof(paths: List[str]) -> int:
@@ -180,38 +336,102 @@ def guess_output(paths: List, threshold: int) -> str:
     total = sizeof(paths)
     logging.warning("Total size of files: %d", total)
 
+    return output_kind(total, threshold)
+
+
+def output_kind(total: int, threshold: int) -> str:
     return "auto" if total >= threshold else "standard"
 
 
-def minify_html(html: str) -> str:
-    """Minify HTML by removing extra whitespace and line breaks."""
+def build_data(
+    dict_args: dict,
+    header: str,
+    footer: str,
+    output: str,
+    clean: bool,
+    encoding: str = "none",
+    cover: str = "",
+    toc: Optional[dict] = None,
+) -> dict:
+    """Build the form fields sent to the API alongside the uploaded files."""
+    dict_args = dict(dict_args)
 
-    lines = html.splitlines()
-    compact = [line.strip() for line in lines if line.strip()]
-    return "".join(compact)
+    # Header and footer filenames need to be known by the API
+    for key in ["header-html", "footer-html"]:
+        if value := dict_args.get(key):
+            dict_args[key] = os.path.basename(value)
+
+    data = {
+        "args": json.dumps(dict_args),
+        "header": os.path.basename(header),
+        "footer": os.path.basename(footer),
+        "output": output,
+        "clean": clean,
+    }
 
+    # Parts above the compression threshold carry a Content-Encoding header
+    if encoding != "none":
+        data["encoding"] = encoding
 
-@logs
-def main(args: list | None = None) -> None:
-    if args is None:
-        args = []
+    # The cover is an uploaded page, the table of contents only options
+    if cover:
+        data["cover"] = os.path.basename(cover)
+    if toc is not None:
+        data["toc"] = json.dumps(toc)
 
-    if not args:
+    return data
+
+
+def render_local(args: List[str], config: ProxyConfig) -> int:
+    """Render with the local wkhtmltopdf binary and return its exit status."""
+    from .local import LocalRenderer
+
+    try:
+        return LocalRenderer.from_config(config).run(args)
+    except TimeoutError:
+        sys.exit("No local wkhtmltopdf worker available.")
+
+
+def fall_back(args: List[str], config: ProxyConfig, reason: str) -> None:
+    """Render locally instead of remotely, then exit."""
+    from .local import BINARY
+
+    if not shutil.which(BINARY):
+        logging.error("%s, no local wkhtmltopdf to fall back to", reason)
+        sys.exit(f"{reason}.")
+
+    logging.warning("%s, using local wkhtmltopdf.", reason)
+    metrics.route = "local"
+    sys.exit(render_local(args, config))
+
+
+def minify_html(html: str) -> str:
+    """Minify HTML by removing comments and collapsing whitespace."""
+    return minify_bytes(html.encode("utf-8")).decode("utf-8")
+
+
+def main(args: list | None = None, config: Optional[ProxyConfig] = None) -> None:
+    if args is None:
         args = sys.argv[1:]
 
     if not args:
         sys.exit(0)
 
-    original_cmd = " ".join(["wkhtmltopdf"] + args)
-    logging.debug(f"Original command: \n{original_cmd}")
-
-    config = ProxyConfig.load()
+    # The configuration warnings go to the configured log destination
+    held = HeldRecords()
+    if config is None:
+        with held:
+            config = ProxyConfig.load()
 
     # Emulate wkhtmltopdf version command
     if len(args) == 1 and args[0] == "--version":
         print(config.version_string)
         sys.exit(0)
 
+    setup_logging(config)
+    held.replay()
+    logging.debug("Original command: \n%s", " ".join(["wkhtmltopdf"] + args))
+
     if not config.url:
         logging.error("Proxy URL is not defined.")
         sys.exit("Proxy URL is not defined.")
@@ -223,79 +443,317 @@ def main(args: list | None = None) -> None:
         )
 
     logging.info("New wkhtmltopdf proxy request")
-    logging.info(f"Using configuration: {config.to_json()}")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Using configuration: %s", config.to_json())
+
+    metrics.reset(config.metrics_file, config.state_dir)
+    tracer.reset(args, config.trace_file)
+    status = "error"
+    try:
+        proxy(args, config)
+    except SystemExit as error:
+        if not error.code:
+            status = "ok"
+        raise
+    finally:
+        tracer.finish(metrics.route, status, metrics.phases(), metrics.priority)
+        metrics.finish(status)
+
+
+def input_paths(parsed_args: dict) -> List[str]:
+    """Paths of the bodies, cover, header and footer files, in this order."""
+    dict_args = parsed_args["dict_args"]
+    paths = list(parsed_args.get("bodies", []))
+    for path in (
+        parsed_args["cover"],
+        dict_args.get("header-html", ""),
+        dict_args.get("footer-html", ""),
+    ):
+        if path:
+            paths.append(path)
+    return paths
+
+
+def lookup_cache(
+    config: ProxyConfig, parsed_args: dict, paths: List[str]
+) -> Tuple[Optional[ResultCache], str]:
+    """Serve identical reports from the result cache, or return its key."""
+    cache = ResultCache.from_config(config)
+    if not cache or not paths or not all(os.path.exists(path) for path in paths):
+        return cache, ""
+
+    dict_args = parsed_args["dict_args"]
+    cache_key = cache.key(
+        parsed_args["bodies"],
+        dict_args.get("header-html", ""),
+        dict_args.get("footer-html", ""),
+        dict_args,
+        parsed_args["cover"],
+        parsed_args["toc"],
+    )
+    if cache.get(cache_key, parsed_args["output"]):
+        metrics.route = "cache"
+        sys.exit(0)
+    return cache, cache_key
+
+
+def prepare_parts(
+    config: ProxyConfig, paths: List[str], dict_args: dict
+) -> Dict[str, FilePart]:
+    """File parts of the request (multipart/form-data) by path.
+
+    HTML files are minified while being uploaded if enabled, and their
+    assets inlined unless they are too large.
+    """
+    options = (config.compression, config.compression_threshold)
+    inliner = None
+    if config.inline_assets:
+        from .assets import AssetInliner
+
+        inliner = AssetInliner.from_config(config, get_session(), dict_args)
+    if not inliner:
+        return {
+            path: FilePart.from_path(path, *options, minify=config.clean_html)
+            for path in paths
+        }
 
-    # TODO: Implement local mode. Act as a wrapper to local wkhtmltopdf binary.
+    # Assets are fetched here, the remote renderer needs no callback
+    parts = {}
+    with metrics.phase("assets"):
+        for path in paths:
+            content = inliner.inline_file(path)
+            if content is None:
+                parts[path] = FilePart.from_path(
+                    path, *options, minify=config.clean_html
+                )
+            else:
+                parts[path] = FilePart.from_bytes(
+                    os.path.basename(path), content, *options, minify=config.clean_html
+                )
+    return parts
+
+
+class RemoteRender:
+    """Remote rendering of a report prepared by `proxy()`.
+
+    Each request waits for its turn in the admission control, goes to an
+    endpoint of the pool, is hedged and retried; large documents are
+    rendered as jobs. Several bodies can be rendered in parallel and merged
+    locally.
+    """
+
+    def __init__(
+        self,
+        config: ProxyConfig,
+        data: dict,
+        parts: Dict[str, FilePart],
+        extra_paths: List[str],
+        priority: str,
+        total: int,
+    ):
+        self.config = config
+        self.data = data
+        self.parts = parts
+        self.extra_paths = extra_paths
+        self.priority = priority
+        self.pool = EndpointPool.from_config(config)
+        self.jobs = None
+        if config.jobs:
+            from .jobs import JobClient
+
+            self.jobs = JobClient.from_config(config, get_session(), total)
+        self.hedger = Hedger.from_config(config)
+        self.admission = Admission.from_config(config)
+
+    def send(
+        self,
+        endpoint: Endpoint,
+        files: List[FilePart],
+        headers: dict,
+        output: str,
+        cancelled: Optional[threading.Event],
+    ) -> None:
+        """Upload the files to `endpoint`, only the unknown ones by digest."""
+        data = dict(self.data)
+        uploads = files
+        uploader = DigestUploader.from_config(self.config, get_session(), endpoint.url)
+        if uploader:
+            uploads = uploader.negotiate(files)
+            data["digests"] = uploader.form_field()
+
+        # Large documents are rendered as jobs, without holding a connection
+        send = self.jobs.send if self.jobs else send_request
+        kwargs = {
+            "headers": headers,
+            "cancelled": cancelled,
+            "buffer_size": self.config.download_buffer_size,
+            "resumes": self.config.download_resumes,
+            "timeout": self.config.timeout,
+        }
+        try:
+            send(endpoint.url, uploads, data, output, **kwargs)
+        except MissingParts as error:
+            resolved = set(uploads) | set(uploader.resolve(error.digests))
+            uploads = [part for part in files if part in resolved]
+            send(endpoint.url, uploads, data, output, **kwargs)
+
+        if uploader:
+            uploader.confirm()
+
+    def render(self, paths: List[str], output: str) -> None:
+        """Render the files of `paths` with the header and footer to `output`."""
+        files = [self.parts[path] for path in paths + self.extra_paths]
+        # Retries and hedged copies carry the same key, for the server to
+        # deduplicate them
+        headers = {
+            "Idempotency-Key": uuid.uuid4().hex,
+            "Priority": f"u={URGENCY[self.priority]}",
+        }
+        admission = self.admission
+
+        def attempt(path: str, cancelled: Optional[threading.Event] = None) -> None:
+            with admission.admit(self.priority) if admission else nullcontext():
+                self.pool.call(
+                    lambda endpoint: self.send(
+                        endpoint, files, headers, path, cancelled
+                    )
+                )
+
+        def once() -> None:
+            if self.hedger:
+                self.hedger.run(attempt, output)
+            else:
+                attempt(output)
+
+        RetryPolicy.from_config(self.config).call(once)
+
+    def run(self, bodies: List[str], cover: List[str], toc: bool, output: str):
+        """Render the report, in parallel groups of bodies when enabled.
+
+        A cover or a table of contents spans the whole document, which is
+        then rendered in a single request.
+        """
+        fanout = self.config.fanout
+        if fanout > 1 and len(bodies) > 1 and not (cover or toc):
+            from .fanout import can_merge, fan_out, split
+
+            if can_merge():
+                fan_out(split(bodies, fanout), self.render, output)
+                return
+        self.render(cover + bodies, output)
+
+
+def proxy(args: List[str], config: ProxyConfig) -> None:
+    """Render the PDF described by the wkhtmltopdf arguments, then exit."""
     if config.mode == "local":
         logging.info("Using local wkhtmltopdf.")
-        return os.execvp("wkhtmltopdf", ["wkhtmltopdf"] + args)
+        metrics.route = "local"
+        sys.exit(render_local(args, config))
 
-    parsed_args = parse_args(args)
+    with metrics.phase("parse"):
+        parsed_args = parse_args(args)
 
-    logging.debug(f"Parsed args: {parsed_args}")
+    logging.debug("Parsed args: %s", parsed_args)
 
-    header_path = parsed_args["dict_args"].get("header-html", "")
-    footer_path = parsed_args["dict_args"].get("footer-html", "")
-    paths = parsed_args.get("bodies", [])
+    # Real invocations are archived to be replayed as a load test
+    if config.capture_dir:
+        from .capture import capture
 
-    if header_path:
-        paths.append(header_path)
+        capture(config.capture_dir, args, parsed_args)
 
-    if footer_path:
-        paths.append(footer_path)
+    paths = input_paths(parsed_args)
+    logging.debug("Paths: %s", paths)
 
-    logging.debug(f"Paths: {paths}")
+    # Identical reports are served from the result cache
+    cache, cache_key = lookup_cache(config, parsed_args, paths)
 
-    # Clean HTML files if enabled
-    if config.clean_html:
-        for path in paths:
-            if not os.path.exists(path):
-                continue
-
-            old_size = os.stat(path).st_size
-
-            with open(path, encoding="utf-8", mode="r+") as file:
-                minified_content = minify_html(file.read())
-                file.seek(0)
-                file.write(minified_content)
-                file.truncate()
-
-            new_size = os.stat(path).st_size
-            logging.info(f"Minified {path}: {old_size} bytes to {new_size} bytes")
+    paths = [path for path in paths if os.path.exists(path)]
 
-    # Prepare files for request (multipart/form-data)
-    files = [("files", open(path, "rb")) for path in paths if os.path.exists(path)]
-
-    if not files:
+    if not paths:
         logging.error("No files provided.")
         sys.exit("No files provided.")
 
-    # Auto mode: decide based on total size of files
-    if config.mode == "auto" and sizeof(paths) < config.threshold:
-        logging.info(
-            "Total size of files (%d bytes) is below threshold (%d bytes). Using local wkhtmltopdf.",
-            sizeof(paths),
-            config.threshold,
+    # Auto mode: route to the fastest path, by size until enough samples
+    total = sizeof(paths)
+    bodies = len(parsed_args["bodies"])
+    router = Router.from_config(config)
+    if config.mode == "auto" and router.choose(total, bodies) == "local":
+        logging.info("Total size of files: %d bytes. Using local wkhtmltopdf.", total)
+        metrics.route = "local"
+        start = time.perf_counter()
+        status = render_local(args, config)
+        if status == 0:
+            duration = time.perf_counter() - start
+            router.record("local", total, bodies, duration)
+        sys.exit(status)
+
+    # Users waiting on a print go before scheduled mass renders
+    priority = classify(
+        config.priority,
+        bodies,
+        total,
+        config.priority_batch_bodies,
+        config.priority_batch_size,
+    )
+    metrics.priority = priority
+    logging.info("Priority: %s", priority)
+
+    # While the remote renderer is failing, render locally when possible
+    breaker = CircuitBreaker.from_config(config)
+    if breaker and not breaker.allow():
+        fall_back(args, config, "Remote renderer unavailable (circuit open)")
+
+    dict_args = parsed_args["dict_args"]
+    header_path = dict_args.get("header-html", "")
+    footer_path = dict_args.get("footer-html", "")
+    cover_path = parsed_args["cover"]
+    data_payload = build_data(
+        dict_args,
+        header_path,
+        footer_path,
+        guess_output(paths, config.threshold),
+        config.clean_html,
+        config.compression,
+        cover_path,
+        parsed_args["toc"],
+    )
+    logging.debug("Data: %s", data_payload["args"])
+
+    parts = prepare_parts(config, paths, dict_args)
+    body_paths = [path for path in parsed_args["bodies"] if path in parts]
+    extra_paths = [path for path in (header_path, footer_path) if path in parts]
+    cover_paths = [cover_path] if cover_path in parts else []
+    remote = RemoteRender(config, data_payload, parts, extra_paths, priority, total)
+
+    start = time.perf_counter()
+    try:
+        remote.run(
+            body_paths,
+            cover_paths,
+            parsed_args["toc"] is not None,
+            parsed_args["output"],
+        )
+    except EndpointFailure as error:
+        if not breaker:
+            sys.exit(f"Error during PDF generation: {error}")
+        breaker.record(False, time.perf_counter() - start)
+        fall_back(args, config, f"Error during PDF generation: {error}")
+    except RenderError as error:
+        sys.exit(f"Error during PDF generation: {error}")
+    except TimeoutError:
+        sys.exit(
+            f"Rendering queue is full: no slot or rate limit token within "
+            f"{config.queue_timeout}s."
         )
-        return os.execvp("wkhtmltopdf", ["wkhtmltopdf"] + args)
 
-    # Header and footer filenames need to be known by the API
-    for key in ["header-html", "footer-html"]:
-        if value := parsed_args["dict_args"].get(key):
-            parsed_args["dict_args"][key] = os.path.basename(value)
-
-    data_payload = {
-        "args": json.dumps(parsed_args["dict_args"]),
-        "header": os.path.basename(header_path),
-        "footer": os.path.basename(footer_path),
-        "output": guess_output(paths, config.threshold),
-        "clean": config.clean_html,
-    }
+    duration = time.perf_counter() - start
+    if breaker:
+        breaker.record(True, duration)
 
-    logging.debug(f"Data: {data_payload['args']}")
+    if config.mode == "auto":
+        router.record("remote", total, bodies, duration)
 
-    send_request(
-        config.url, files, data_payload, parsed_args["output"], timeout=config.timeout
-    )
+    if cache_key:
+        cache.put(cache_key, parsed_args["output"])
 
     sys.exit(0)
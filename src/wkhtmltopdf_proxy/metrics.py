@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+from .state import atomic_write, locked_json, read_json
+
+PREFIX = "wkhtmltopdf_proxy_"
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+)
+HELP = {
+    "requests": "Proxy invocations by route and outcome.",
+    "request_duration_seconds": "Total latency of proxy invocations.",
+    "phase_duration_seconds": "Time spent in each phase of an invocation.",
+    "upload_bytes": "Bytes uploaded to the rendering API.",
+    "download_bytes": "Bytes of PDF written to the output.",
+}
+
+
+def number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def label_string(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+class Metrics:
+    """Counters and histograms of one proxy invocation.
+
+    Values are collected in memory while the request runs; `flush()` adds
+    them to the totals kept in the state directory, shared by every proxy
+    process, and rewrites the OpenMetrics textfile atomically, e.g. for the
+    node-exporter textfile collector. Nothing is written without a
+    textfile path.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, textfile: str = "", state_dir: str = ""):
+        self.textfile = textfile
+        self.state_path = os.path.join(state_dir, "metrics.json")
+        self.start = time.perf_counter()
+        self.route = "remote"
+        self.priority = ""
+        self.counters: Dict[str, Dict[str, float]] = {}
+        self.histograms: Dict[str, Dict[str, list]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.textfile)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = label_string(labels)
+        with self.lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record `value` as [bucket counts..., sum, count]."""
+        key = label_string(labels)
+        with self.lock:
+            values = self.histograms.setdefault(name, {})
+            histogram = values.setdefault(key, [0] * (len(DURATION_BUCKETS) + 3))
+            histogram[bisect_left(DURATION_BUCKETS, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "phase_duration_seconds", time.perf_counter() - start, phase=name
+            )
+
+    def phases(self) -> Dict[str, float]:
+        """Seconds spent in each phase of this invocation."""
+        with self.lock:
+            values = self.histograms.get("phase_duration_seconds", {})
+            return {key[8:-2]: value[-2] for key, value in values.items()}
+
+    def timed(self, name: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Time spent producing the chunks of a lazy pipeline, as one phase."""
+        spent = 0.0
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - start
+                yield chunk
+        finally:
+            self.observe("phase_duration_seconds", spent, phase=name)
+
+    def finish(self, status: str) -> None:
+        """Record the outcome of the invocation and flush."""
+        duration = time.perf_counter() - self.start
+        self.inc("requests", route=self.route, status=status)
+        # The priority class is known once the request reaches the renderer
+        labels = {"route": self.route}
+        if self.priority:
+            labels["priority"] = self.priority
+        self.observe("request_duration_seconds", duration, **labels)
+        self.flush()
+
+    def flush(self) -> None:
+        if not self.enabled:
+            return
+
+        with locked_json(self.state_path) as state:
+            counters = state.setdefault("counters", {})
+            for name, values in self.counters.items():
+                totals = counters.setdefault(name, {})
+                for key, value in values.items():
+                    totals[key] = totals.get(key, 0) + value
+
+            histograms = state.setdefault("histograms", {})
+            for name, values in self.histograms.items():
+                totals = histograms.setdefault(name, {})
+                for key, value in values.items():
+                    total = totals.setdefault(key, [0] * len(value))
+                    totals[key] = [a + b for a, b in zip(total, value)]
+
+            atomic_write(self.textfile, render(state).encode())
+
+        self.reset(self.textfile, os.path.dirname(self.state_path))
+
+
+def describe_priorities(state_path: str) -> str:
+    """Mean latency of each priority class, from the accumulated totals."""
+    values = read_json(state_path).get("histograms", {})
+    classes: Dict[str, list] = {}
+    for key, value in values.get("request_duration_seconds", {}).items():
+        if match := re.search(r'priority="(\w+)"', key):
+            total = classes.setdefault(match.group(1), [0.0, 0])
+            total[0] += value[-2]
+            total[1] += value[-1]
+
+    if not classes:
+        return "priorities: no sample"
+    return "priorities: " + ", ".join(
+        f"{name} {count} request(s), mean {seconds / count:.3f}s"
+        for name, (seconds, count) in sorted(classes.items())
+        if count
+    )
+
+
+def render(state: dict) -> str:
+    """OpenMetrics text exposition of the accumulated totals."""
+    lines = []
+    for name, values in sorted(state.get("counters", {}).items()):
+        lines += [
+            f"# TYPE {PREFIX}{name} counter",
+            f"# HELP {PREFIX}{name} {HELP[name]}",
+        ]
+        for key, value in sorted(values.items()):
+            lines.append(f"{PREFIX}{name}_total{key} {number(value)}")
+
+    for name, values in sorted(state.get("histograms", {}).items()):
+        lines += [
+            f"# TYPE {PREFIX}{name} histogram",
+            f"# HELP {PREFIX}{name} {HELP[name]}",
+        ]
+        for key, value in sorted(values.items()):
+            labels = key[1:-1] + "," if key else ""
+            cumulative = 0
+            bounds = [f"{bound:g}" for bound in DURATION_BUCKETS] + ["+Inf"]
+            for bound, count in zip(bounds, value[:-2]):
+                cumulative += count
+                lines.append(
+                    f'{PREFIX}{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{PREFIX}{name}_sum{key} {number(value[-2])}")
+            lines.append(f"{PREFIX}{name}_count{key} {value[-1]}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,152 @@
+import re
+from typing import Iterable, Iterator
+
+# Elements whose content is sent verbatim
+RAW_TAGS = (b"pre", b"textarea", b"script", b"style")
+
+ATTRIBUTES = rb"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>"""
+SPECIAL_RE = re.compile(
+    rb"<!--|<(" + b"|".join(RAW_TAGS) + rb")(?=[\s/>])" + ATTRIBUTES, re.IGNORECASE
+)
+# Tags with a quoted attribute value spanning lines are sent verbatim,
+# looked for only in the regions where a value may reach a line break
+QUOTED_NEWLINE_RE = re.compile(rb"""=\s*(?:"[^"\n]*|'[^'\n]*)\n""")
+MULTILINE_TAG_RE = re.compile(
+    rb"""<[a-z][^>"']*(?:(?:"[^"\n]*"|'[^'\n]*')[^>"']*)*"""
+    rb"""(?:"[^"\n]*\n[^"]*"|'[^'\n]*\n[^']*')""" + ATTRIBUTES,
+    re.IGNORECASE,
+)
+WHITESPACE = b" \t\n\r\f"
+
+TEXT, COMMENT, RAW = range(3)
+
+
+class Minifier:
+    """Incremental HTML minifier working on UTF-8 chunks.
+
+    Comments are removed and runs of whitespace spanning a line break are
+    collapsed into a single space, which does not change the rendering;
+    working line by line keeps this close to the speed of str.strip(). The
+    content of <pre>, <textarea>, <script> and <style> elements, and tags
+    with a quoted attribute value spanning lines, are left untouched.
+    Incomplete tokens at the end of a chunk are buffered until the next
+    one, so memory use is bounded by the largest tag rather than by the
+    document.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.state = TEXT
+        self.raw_end = None
+        self.raw_end_size = 0
+        # Whitespace after a whitespace (or at the start) is dropped
+        self.space = True
+
+    def text(self, region: bytes) -> bytes:
+        """Minify a region of text and tags, outside of raw elements."""
+        if not QUOTED_NEWLINE_RE.search(region):
+            return self.collapse(region)
+
+        output, pos = [], 0
+        for match in MULTILINE_TAG_RE.finditer(region):
+            output.append(self.collapse(region[pos : match.start()]))
+            output.append(match.group())
+            pos, self.space = match.end(), False
+        output.append(self.collapse(region[pos:]))
+        return b"".join(output)
+
+    def collapse(self, region: bytes) -> bytes:
+        """Collapse the whitespace around the line breaks of a region."""
+        lines = region.split(b"\n")
+        if len(lines) > 1:
+            stripped = (line.strip(WHITESPACE) for line in lines[1:-1])
+            lines = [
+                lines[0].rstrip(WHITESPACE),
+                *(line for line in stripped if line),
+                lines[-1].lstrip(WHITESPACE),
+            ]
+            region = b" ".join(lines)
+
+        if self.space and region.startswith(b" "):
+            region = region[1:]
+        if region:
+            self.space = region.endswith(b" ")
+        return region
+
+    def process(self, final: bool) -> bytes:
+        buffer, pos, output = self.buffer, 0, []
+
+        while pos < len(buffer):
+            if self.state == COMMENT:
+                end = buffer.find(b"-->", pos)
+                if end == -1:
+                    # Keep a possible partial "-->" for the next chunk
+                    pos = len(buffer) if final else max(pos, len(buffer) - 2)
+                    break
+                pos, self.state = end + 3, TEXT
+                continue
+
+            if self.state == RAW:
+                match = self.raw_end.search(buffer, pos)
+                if match is None:
+                    keep = 0 if final else self.raw_end_size - 1
+                    end = max(pos, len(buffer) - keep)
+                    output.append(buffer[pos:end])
+                    pos = end
+                    break
+                output.append(buffer[pos : match.start()])
+                pos, self.state, self.space = match.start(), TEXT, False
+                continue
+
+            match = SPECIAL_RE.search(buffer, pos)
+            if match is not None:
+                end = match.start()
+            elif final:
+                end = len(buffer)
+            else:
+                # The last tag may be incomplete and the last run of
+                # whitespace may continue in the next chunk
+                end = buffer.rfind(b"<", pos)
+                end = len(buffer) if end == -1 else end
+                end = pos + len(buffer[pos:end].rstrip(WHITESPACE))
+
+            output.append(self.text(buffer[pos:end]))
+            pos = end
+            if match is None:
+                break
+
+            if match.group(1) is None:
+                pos, self.state = match.end(), COMMENT
+                continue
+
+            output.append(match.group())
+            closing = b"</" + match.group(1)
+            pos, self.space = match.end(), False
+            self.state, self.raw_end_size = RAW, len(closing)
+            self.raw_end = re.compile(re.escape(closing), re.IGNORECASE)
+
+        self.buffer = buffer[pos:]
+        return b"".join(output)
+
+    def feed(self, data: bytes) -> bytes:
+        self.buffer += data
+        return self.process(final=False)
+
+    def close(self) -> bytes:
+        return self.process(final=True)
+
+
+def iter_minify(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Minify a stream of HTML chunks, yielding non-empty outputs."""
+    minifier = Minifier()
+
+    for chunk in chunks:
+        if output := minifier.feed(chunk):
+            yield output
+
+    if output := minifier.close():
+        yield output
+
+
+def minify_bytes(html: bytes) -> bytes:
+    return b"".join(iter_minify([html]))
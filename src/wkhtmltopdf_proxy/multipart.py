@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .compression import iter_compressed
+from .metrics import metrics
+from .minify import iter_minify
+
+CHUNK_SIZE = 256 * 1024
+
+
+class Cancelled(Exception):
+    """The upload was cancelled, e.g. a hedged request lost the race."""
+
+
+@dataclass(frozen=True)
+class FilePart:
+    """A file part of a multipart upload, read lazily when sent.
+
+    `source` is either the path of a file or in-memory content. Parts with
+    `minify` set are minified and parts with an `encoding` other than "none"
+    are compressed on the fly, the source itself is never modified.
+    """
+
+    filename: str
+    source: Union[str, bytes]
+    encoding: str = "none"
+    minify: bool = False
+    name: str = "files"
+    content_type: str = "text/html"
+
+    @classmethod
+    def from_path(
+        cls, path: str, encoding: str = "none", threshold: int = 0, minify: bool = False
+    ) -> "FilePart":
+        """Build a part for `path`, compressed when above `threshold` bytes."""
+        if os.stat(path).st_size < threshold:
+            encoding = "none"
+        return cls(os.path.basename(path), path, encoding, minify)
+
+    @classmethod
+    def from_bytes(
+        cls,
+        filename: str,
+        content: bytes,
+        encoding: str = "none",
+        threshold: int = 0,
+        minify: bool = False,
+    ) -> "FilePart":
+        if len(content) < threshold:
+            encoding = "none"
+        return cls(filename, content, encoding, minify)
+
+    @property
+    def size(self) -> int:
+        """Size of the uncompressed content."""
+        if isinstance(self.source, bytes):
+            return len(self.source)
+        return os.stat(self.source).st_size
+
+    @property
+    def length(self) -> Optional[int]:
+        """Size on the wire, unknown until minified or compressed."""
+        if self.minify or self.encoding != "none":
+            return None
+        return self.size
+
+    def headers(self) -> bytes:
+        lines = [
+            f'Content-Disposition: form-data; name="{self.name}"; '
+            f'filename="{self.filename}"',
+            f"Content-Type: {self.content_type}",
+        ]
+        if self.encoding != "none":
+            lines.append(f"Content-Encoding: {self.encoding}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+    def raw_chunks(self) -> Iterator[bytes]:
+        if isinstance(self.source, bytes):
+            for start in range(0, len(self.source), CHUNK_SIZE):
+                yield self.source[start : start + CHUNK_SIZE]
+            return
+
+        with open(self.source, "rb") as file:
+            while chunk := file.read(CHUNK_SIZE):
+                yield chunk
+
+    def content_chunks(self) -> Iterator[bytes]:
+        """Chunks of the content as the server sees it once decoded."""
+        if self.minify:
+            return metrics.timed("minify", iter_minify(self.raw_chunks()))
+        return self.raw_chunks()
+
+    def chunks(self) -> Iterator[bytes]:
+        if self.encoding == "none":
+            return self.content_chunks()
+        return iter_compressed(self.content_chunks(), self.encoding)
+
+
+class MultipartEncoder:
+    """Streaming multipart/form-data encoder.
+
+    Iterating over the encoder yields the body chunk by chunk, reading file
+    parts only when they are sent, so memory use does not depend on the
+    size of the files. The encoder can be iterated several times, e.g. to
+    retry a request.
+    """
+
+    def __init__(self, fields: Dict[str, object], parts: List[FilePart]):
+        self.fields = fields
+        self.parts = parts
+        self.boundary = uuid.uuid4().hex
+        # Progress of the last upload
+        self.sent = 0
+        self.sent_at: Optional[float] = None
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def field_bytes(self, name: str, value: object) -> bytes:
+        return (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode()
+
+    def part_prefix(self, part: FilePart) -> bytes:
+        return f"--{self.boundary}\r\n".encode() + part.headers()
+
+    @property
+    def closing(self) -> bytes:
+        return f"--{self.boundary}--\r\n".encode()
+
+    @property
+    def length(self) -> Optional[int]:
+        """Total body size, or None when a part is transformed on the fly."""
+        total = sum(len(self.field_bytes(k, v)) for k, v in self.fields.items())
+        for part in self.parts:
+            if part.length is None:
+                return None
+            total += len(self.part_prefix(part)) + part.length + 2
+        return total + len(self.closing)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for name, value in self.fields.items():
+            yield self.field_bytes(name, value)
+
+        for part in self.parts:
+            yield self.part_prefix(part)
+            yield from part.chunks()
+            yield b"\r\n"
+
+        yield self.closing
+
+    def iter_chunks(self, cancelled: Optional[threading.Event] = None):
+        self.sent, self.sent_at = 0, None
+        for chunk in self:
+            if cancelled is not None and cancelled.is_set():
+                raise Cancelled()
+            self.sent += len(chunk)
+            yield chunk
+        self.sent_at = time.perf_counter()
+
+    def body(self, cancelled: Optional[threading.Event] = None) -> Iterable[bytes]:
+        """Return the request body for requests.
+
+        A sized body is sent with a Content-Length header, an unsized one
+        with chunked transfer encoding. Setting `cancelled` aborts the
+        upload.
+        """
+        length = self.length
+        if length is None:
+            return self.iter_chunks(cancelled)
+        return SizedBody(self, length, cancelled)
+
+
+class SizedBody:
+    def __init__(
+        self,
+        encoder: MultipartEncoder,
+        length: int,
+        cancelled: Optional[threading.Event] = None,
+    ):
+        self.encoder = encoder
+        self.length = length
+        self.cancelled = cancelled
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.encoder.iter_chunks(self.cancelled)
@@ -0,0 +1,300 @@
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+GLOBAL, PAGE, TOC = "global", "page", "toc"
+LOG_LEVELS = ("none", "error", "warn", "info")
+ERROR_HANDLINGS = ("abort", "ignore", "skip")
+# Numbers as read by QString::toInt() and toDouble(): ASCII decimal digits,
+# surrounding whitespace allowed
+INT_PATTERN = re.compile(r"\s*[+-]?[0-9]+\s*")
+FLOAT_PATTERN = re.compile(r"\s*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?\s*")
+
+
+class OptionError(ValueError):
+    """The command line would be rejected by wkhtmltopdf."""
+
+
+class Option(NamedTuple):
+    arity: int = 0
+    scope: str = PAGE
+    repeat: bool = False
+    kind: Optional[Callable[[str], object]] = None
+    choices: Tuple[str, ...] = ()
+
+
+def qt_int(value: str) -> int:
+    """Parse `value` as wkhtmltopdf does its integer arguments (32 bits)."""
+    if not INT_PATTERN.fullmatch(value) or not -(2**31) <= int(value) < 2**31:
+        raise ValueError(value)
+    return int(value)
+
+
+def qt_float(value: str) -> float:
+    """Parse `value` as wkhtmltopdf does its real arguments."""
+    if not FLOAT_PATTERN.fullmatch(value):
+        raise ValueError(value)
+    return float(value)
+
+
+def flags(scope: str, *names: str) -> Dict[str, Option]:
+    return {name: Option(0, scope) for name in names}
+
+
+def values(scope: str, *names: str) -> Dict[str, Option]:
+    return {name: Option(1, scope) for name in names}
+
+
+# Options of wkhtmltopdf 0.12.6 (with patched qt), see `wkhtmltopdf -H`
+SCHEMA: Dict[str, Option] = {
+    **flags(
+        GLOBAL,
+        "collate",
+        "no-collate",
+        "extended-help",
+        "grayscale",
+        "help",
+        "htmldoc",
+        "license",
+        "lowquality",
+        "manpage",
+        "no-pdf-compression",
+        "quiet",
+        "read-args-from-stdin",
+        "readme",
+        "use-xserver",
+        "version",
+        "dump-default-toc-xsl",
+        "outline",
+        "no-outline",
+    ),
+    **values(
+        GLOBAL,
+        "cookie-jar",
+        "margin-bottom",
+        "margin-left",
+        "margin-right",
+        "margin-top",
+        "page-height",
+        "page-size",
+        "page-width",
+        "title",
+        "dump-outline",
+    ),
+    "copies": Option(1, GLOBAL, kind=qt_int),
+    "dpi": Option(1, GLOBAL, kind=qt_int),
+    "image-dpi": Option(1, GLOBAL, kind=qt_int),
+    "image-quality": Option(1, GLOBAL, kind=qt_int),
+    "outline-depth": Option(1, GLOBAL, kind=qt_int),
+    "log-level": Option(1, GLOBAL, choices=LOG_LEVELS),
+    "orientation": Option(1, GLOBAL, choices=("Landscape", "Portrait")),
+    **flags(
+        PAGE,
+        "background",
+        "no-background",
+        "custom-header-propagation",
+        "no-custom-header-propagation",
+        "debug-javascript",
+        "no-debug-javascript",
+        "default-header",
+        "disable-external-links",
+        "enable-external-links",
+        "disable-forms",
+        "enable-forms",
+        "images",
+        "no-images",
+        "disable-internal-links",
+        "enable-internal-links",
+        "disable-javascript",
+        "enable-javascript",
+        "keep-relative-links",
+        "disable-local-file-access",
+        "enable-local-file-access",
+        "exclude-from-outline",
+        "include-in-outline",
+        "disable-plugins",
+        "enable-plugins",
+        "print-media-type",
+        "no-print-media-type",
+        "proxy-hostname-lookup",
+        "resolve-relative-links",
+        "disable-smart-shrinking",
+        "enable-smart-shrinking",
+        "stop-slow-scripts",
+        "no-stop-slow-scripts",
+        "disable-toc-back-links",
+        "enable-toc-back-links",
+        "footer-line",
+        "no-footer-line",
+        "header-line",
+        "no-header-line",
+    ),
+    **values(
+        PAGE,
+        "cache-dir",
+        "checkbox-checked-svg",
+        "checkbox-svg",
+        "encoding",
+        "password",
+        "proxy",
+        "radiobutton-checked-svg",
+        "radiobutton-svg",
+        "ssl-crt-path",
+        "ssl-key-password",
+        "ssl-key-path",
+        "user-style-sheet",
+        "username",
+        "viewport-size",
+        "window-status",
+        "footer-center",
+        "footer-font-name",
+        "footer-html",
+        "footer-left",
+        "footer-right",
+        "footer-spacing",
+        "header-center",
+        "header-font-name",
+        "header-html",
+        "header-left",
+        "header-right",
+        "header-spacing",
+    ),
+    "javascript-delay": Option(1, kind=qt_int),
+    "minimum-font-size": Option(1, kind=qt_int),
+    "page-offset": Option(1, kind=qt_int),
+    "footer-font-size": Option(1, kind=qt_int),
+    "header-font-size": Option(1, kind=qt_int),
+    "zoom": Option(1, kind=qt_float),
+    "load-error-handling": Option(1, choices=ERROR_HANDLINGS),
+    "load-media-error-handling": Option(1, choices=ERROR_HANDLINGS),
+    "allow": Option(1, repeat=True),
+    "bypass-proxy-for": Option(1, repeat=True),
+    "run-script": Option(1, repeat=True),
+    "cookie": Option(2, repeat=True),
+    "custom-header": Option(2, repeat=True),
+    "post": Option(2, repeat=True),
+    "post-file": Option(2, repeat=True),
+    "replace": Option(2, repeat=True),
+    **flags(TOC, "disable-dotted-lines", "disable-toc-links"),
+    **values(TOC, "toc-header-text", "toc-level-indentation", "xsl-style-sheet"),
+    "toc-text-size-shrink": Option(1, TOC, kind=qt_float),
+}
+
+SHORT_OPTIONS = {
+    "-B": "margin-bottom",
+    "-d": "dpi",
+    "-g": "grayscale",
+    "-H": "extended-help",
+    "-h": "help",
+    "-L": "margin-left",
+    "-l": "lowquality",
+    "-n": "disable-javascript",
+    "-O": "orientation",
+    "-p": "proxy",
+    "-q": "quiet",
+    "-R": "margin-right",
+    "-s": "page-size",
+    "-T": "margin-top",
+    "-V": "version",
+}
+
+
+def option_name(token: str) -> Optional[str]:
+    """Long name of the option given by `token`, None for a page object."""
+    if token.startswith("--"):
+        return token[2:]
+    return SHORT_OPTIONS.get(token)
+
+
+def check_value(name: str, option: Option, value: str) -> None:
+    # wkhtmltopdf compares the choices with strcasecmp()
+    if option.choices and value.lower() not in map(str.lower, option.choices):
+        raise OptionError(
+            f"invalid value '{value}' for --{name}, expected one of "
+            + ", ".join(option.choices)
+        )
+    if option.kind is not None:
+        try:
+            option.kind(value)
+        except ValueError:
+            raise OptionError(f"invalid value '{value}' for --{name}") from None
+
+
+def parse_argv(argv: List[str]) -> dict:
+    """Parse a wkhtmltopdf command line in a single pass.
+
+    Returns the options as a normalized dict: flags map to None, options
+    taking a value to a string, and repeatable ones to a list of values,
+    or of (name, value) tuples for the two-value options such as
+    `--cookie`. Options are keyed by their long name and given after the
+    pages too; page options apply to every page, the remote API having a
+    single set of options. Table of contents options go to `toc`, which is
+    None without a `toc` object.
+    """
+    if not argv or option_name(argv[-1]) is not None:
+        raise OptionError("missing output file")
+
+    options: dict = {}
+    toc: Optional[dict] = None
+    bodies: List[str] = []
+    cover = ""
+    in_toc = False
+    end = len(argv) - 1
+    index = 0
+
+    while index < end:
+        token = argv[index]
+        index += 1
+        name = option_name(token)
+
+        if name is None:
+            in_toc = token == "toc"
+            if in_toc:
+                toc = toc if toc is not None else {}
+            elif token in ("cover", "page"):
+                if index == end:
+                    raise OptionError(f"missing path after {token}")
+                path = argv[index]
+                index += 1
+                if token == "cover":
+                    if cover:
+                        raise OptionError("only one cover is supported")
+                    cover = path
+                else:
+                    bodies.append(path)
+            else:
+                bodies.append(token)
+            continue
+
+        option = SCHEMA.get(name)
+        if option is None:
+            raise OptionError(f"unknown option {token}")
+        if index + option.arity > end:
+            raise OptionError(f"missing value for {token}")
+
+        if option.arity == 0:
+            value = None
+        elif option.arity == 1:
+            value = argv[index]
+            check_value(name, option, value)
+        else:
+            value = tuple(argv[index : index + option.arity])
+        index += option.arity
+
+        if option.scope == TOC and not in_toc:
+            raise OptionError(f"{token} is only valid after toc")
+        target = toc if in_toc and toc is not None else options
+        if option.repeat:
+            target.setdefault(name, []).append(value)
+        else:
+            target[name] = value
+
+    if not bodies:
+        raise OptionError("no page to render")
+
+    return {
+        "options": options,
+        "bodies": bodies,
+        "cover": cover,
+        "toc": toc,
+        "output": argv[-1],
+    }
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from .capture import FILES, OUTPUT
+from .retry import percentile
+
+# Each replayed invocation runs main() in a new interpreter, like Odoo does
+COMMAND = [sys.executable, "-c", "from wkhtmltopdf_proxy.main import main; main()"]
+
+
+class Sample(NamedTuple):
+    latency: float
+    status: int
+    cpu: float
+    rss: int
+
+
+def load_corpus(directory: str) -> List[List[str]]:
+    """Arguments of the captured invocations, oldest first."""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name, "request.json")
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        with open(path) as file:
+            args = json.load(file)["args"]
+        files = os.path.join(directory, name, "files")
+        corpus.append([arg.replace(FILES, files, 1) for arg in args])
+    return corpus
+
+
+def run_one(args: List[str], output: str, env: Dict[str, str]) -> Sample:
+    """Run one invocation, measuring its latency, CPU time and peak RSS."""
+    args = [output if arg == OUTPUT else arg for arg in args]
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        COMMAND + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    latency = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if os.path.exists(output):
+        os.unlink(output)
+    # ru_maxrss is in kilobytes on Linux
+    return Sample(
+        latency,
+        process.returncode,
+        usage.ru_utime + usage.ru_stime,
+        usage.ru_maxrss * 1024,
+    )
+
+
+def replay(
+    corpus: List[List[str]],
+    env: Dict[str, str],
+    requests: int,
+    concurrency: int = 1,
+    rate: float = 0,
+) -> dict:
+    """Replay `requests` invocations of the corpus in turn and summarize them.
+
+    With a `rate`, invocations start at that many per second whatever the
+    number in flight (open loop); otherwise `concurrency` workers run them
+    back to back (closed loop).
+    """
+    samples: List[Sample] = []
+    lock = threading.Lock()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        def run(index: int) -> None:
+            output = os.path.join(tmpdir, f"{index}.pdf")
+            sample = run_one(corpus[index % len(corpus)], output, env)
+            with lock:
+                samples.append(sample)
+
+        start = time.perf_counter()
+        if rate:
+            threads = []
+            for index in range(requests):
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                threads.append(threading.Thread(target=run, args=(index,)))
+                threads[-1].start()
+        else:
+            indexes = iter(range(requests))
+
+            def worker() -> None:
+                while True:
+                    with lock:
+                        index = next(indexes, None)
+                    if index is None:
+                        return
+                    run(index)
+
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    latencies = [sample.latency for sample in samples]
+    errors = sum(1 for sample in samples if sample.status)
+    return {
+        "requests": len(samples),
+        "seconds": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "cpu": sum(sample.cpu for sample in samples) / max(len(samples), 1),
+        "rss": max((sample.rss for sample in samples), default=0),
+    }
+
+
+def format_report(report: dict) -> str:
+    return "\n".join(
+        [
+            f"requests:   {report['requests']} in {report['seconds']:.3f}s",
+            f"throughput: {report['throughput']:.2f} req/s",
+            f"errors:     {report['error_rate']:.1%}",
+            f"latency:    p50 {report['p50']:.3f}s, p95 {report['p95']:.3f}s, "
+            f"p99 {report['p99']:.3f}s",
+            f"client:     {report['cpu']:.3f}s CPU per request, "
+            f"{report['rss'] / 1024 / 1024:.1f}MB peak RSS",
+        ]
+    )
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Replay a captured corpus (`wkhtmltopdf-proxy replay`)."""
+    parser = argparse.ArgumentParser(prog="wkhtmltopdf-proxy replay")
+    parser.add_argument("corpus", help="WKHTMLTOPDF_PROXY_CAPTURE_DIR to replay")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0, help="requests per second")
+    parser.add_argument(
+        "--requests", type=int, default=0, help="default: the size of the corpus"
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="default: WKHTMLTOPDF_PROXY_URL")
+    target.add_argument("--stub", action="store_true", help="bundled stub server")
+    parser.add_argument("--stub-latency", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true")
+    options = parser.parse_args(args)
+
+    corpus = load_corpus(options.corpus)
+    if not corpus:
+        sys.exit(f"No captured invocation in {options.corpus}.")
+
+    env = {**os.environ, "WKHTMLTOPDF_PROXY_CAPTURE_DIR": ""}
+    # The replayed processes import this very package
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, os.environ.get("PYTHONPATH")])
+    )
+
+    server = None
+    if options.stub:
+        from .stub import StubRenderServer
+
+        server = StubRenderServer(latency=options.stub_latency).start()
+        env["WKHTMLTOPDF_PROXY_URL"] = server.url
+    elif options.url:
+        env["WKHTMLTOPDF_PROXY_URL"] = options.url
+
+    try:
+        report = replay(
+            corpus,
+            env,
+            options.requests or len(corpus),
+            options.concurrency,
+            options.rate,
+        )
+    finally:
+        if server:
+            server.stop()
+
+    print(json.dumps(report) if options.json else format_report(report))
@@ -0,0 +1,167 @@
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Callable, List, Optional, TypeVar
+
+from .endpoints import EndpointFailure
+from .state import locked_json, read_json
+
+T = TypeVar("T")
+MAX_LATENCIES = 200
+MIN_HEDGE_SAMPLES = 20
+
+
+class RetryPolicy:
+    """Retry failed requests with exponential backoff and full jitter.
+
+    Only EndpointFailure errors (connection errors, timeouts and 5xx
+    answers) are retried; requests carry the same idempotency key on every
+    attempt so that the server can deduplicate them.
+    """
+
+    def __init__(self, retries: int, backoff: float, max_backoff: float = 30.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_config(cls, config) -> "RetryPolicy":
+        return cls(config.retries, config.retry_backoff)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def call(self, function: Callable[[], T]) -> T:
+        for attempt in range(self.retries + 1):
+            try:
+                return function()
+            except EndpointFailure as error:
+                if attempt == self.retries:
+                    raise
+                delay = self.delay(attempt)
+                logging.warning(
+                    "Attempt %d failed (%s), retrying in %.3fs",
+                    attempt + 1,
+                    error,
+                    delay,
+                )
+                time.sleep(delay)
+
+
+def percentile(values: List[float], rank: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = round(rank / 100 * (len(ordered) - 1))
+    return ordered[min(max(index, 0), len(ordered) - 1)]
+
+
+class Hedger:
+    """Send a second copy of slow requests and keep the first to finish.
+
+    When an attempt has not completed within the `rank` percentile of the
+    recent latencies, stored in a state file shared by every proxy process,
+    a hedged copy is started, and whichever completes first wins; the other
+    one is cancelled. Each attempt writes to its own temporary file, and the
+    winner's file is renamed over the output. Counters of hedged requests
+    and wins measure the extra load put on the servers.
+    """
+
+    def __init__(self, stats_path: str, rank: float):
+        self.stats_path = stats_path
+        self.rank = rank
+
+    @classmethod
+    def from_config(cls, config) -> Optional["Hedger"]:
+        if not config.hedge_percentile:
+            return None
+        return cls(
+            os.path.join(config.state_dir, "latency.json"), config.hedge_percentile
+        )
+
+    def delay(self) -> Optional[float]:
+        """Time to wait before hedging, None while samples are too few."""
+        latencies = read_json(self.stats_path).get("latencies", [])
+        if len(latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        return percentile(latencies, self.rank)
+
+    def record(self, latency: float, hedged: bool, hedge_won: bool) -> None:
+        with locked_json(self.stats_path) as stats:
+            latencies = stats.setdefault("latencies", [])
+            latencies.append(latency)
+            del latencies[:-MAX_LATENCIES]
+            stats["requests"] = stats.get("requests", 0) + 1
+            stats["hedged"] = stats.get("hedged", 0) + hedged
+            stats["hedge_wins"] = stats.get("hedge_wins", 0) + hedge_won
+
+    def run(self, attempt: Callable[[str, threading.Event], None], output: str) -> None:
+        """Run `attempt(path, cancelled)` once or twice, racing to `output`."""
+        delay = self.delay()
+        start = time.perf_counter()
+        results: "queue.Queue" = queue.Queue()
+        cancelled = threading.Event()
+        paths: List[str] = []
+
+        def target(index: int, path: str):
+            try:
+                attempt(path, cancelled)
+            except BaseException as error:
+                results.put((index, error))
+                return
+
+            # Finished after losing the race
+            if cancelled.is_set() and os.path.exists(path):
+                os.unlink(path)
+            results.put((index, None))
+
+        def launch():
+            index = len(paths)
+            paths.append(f"{output}.{os.getpid()}.{index}.part")
+            # Daemon threads: the loser must not delay the exit of the proxy
+            thread = threading.Thread(
+                target=target, args=(index, paths[-1]), daemon=True
+            )
+            thread.start()
+
+        launch()
+        try:
+            index, error = results.get(timeout=delay)
+        except queue.Empty:
+            logging.info("No response after %.3fs, sending a hedged request", delay)
+            launch()
+            index, error = results.get()
+            # Fall back to the other attempt when the first to finish failed
+            if error is not None:
+                index, error = results.get()
+
+        cancelled.set()
+        try:
+            if error is not None:
+                raise error
+            os.replace(paths[index], output)
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+        hedged = len(paths) > 1
+        self.record(time.perf_counter() - start, hedged, hedged and index == 1)
+
+    def describe(self) -> str:
+        stats = read_json(self.stats_path)
+        requests = stats.get("requests", 0)
+        hedged = stats.get("hedged", 0)
+        if not requests:
+            return "hedging: no request yet"
+
+        delay = self.delay()
+        threshold = "warming up" if delay is None else f"hedge after {delay:.3f}s"
+        return (
+            f"hedging: {hedged}/{requests} requests hedged "
+            f"(+{100 * hedged / requests:.1f}% load), "
+            f"{stats.get('hedge_wins', 0)} won by the hedge, {threshold}"
+        )
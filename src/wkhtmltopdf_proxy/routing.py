@@ -0,0 +1,201 @@
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .state import FileSemaphore, locked_json, read_json
+
+ROUTES = ("local", "remote")
+MAX_SAMPLES = 500
+
+
+def features(size: int, bodies: int) -> List[float]:
+    """Model inputs: a constant, the size in MB and the page count hint.
+
+    Odoo writes one body file per printed record, so the number of bodies
+    stands in for the page count without parsing the HTML.
+    """
+    return [1.0, size / (1024 * 1024), float(bodies)]
+
+
+def solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve a small linear system by Gaussian elimination."""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda row: abs(rows[row][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for row in range(col + 1, size):
+            factor = rows[row][col] / rows[col][col]
+            for index in range(col, size + 1):
+                rows[row][index] -= factor * rows[col][index]
+
+    result = [0.0] * size
+    for row in reversed(range(size)):
+        total = sum(rows[row][index] * result[index] for index in range(row + 1, size))
+        result[row] = (rows[row][size] - total) / rows[row][row]
+    return result
+
+
+def fit(samples: Sequence[dict], ridge: float = 1e-3) -> List[float]:
+    """Least-squares coefficients of the duration over the features."""
+    count = len(features(0, 0))
+    matrix = [[ridge if i == j else 0.0 for j in range(count)] for i in range(count)]
+    vector = [0.0] * count
+
+    for sample in samples:
+        x = features(sample["size"], sample["bodies"])
+        for i in range(count):
+            vector[i] += x[i] * sample["duration"]
+            for j in range(count):
+                matrix[i][j] += x[i] * x[j]
+
+    return solve(matrix, vector)
+
+
+def predict(coefficients: Sequence[float], size: int, bodies: int) -> float:
+    x = features(size, bodies)
+    return max(sum(c * v for c, v in zip(coefficients, x)), 0.0)
+
+
+class Router:
+    """Route auto mode requests to the path with the lowest predicted latency.
+
+    The duration of every successful render is stored in `routing.json` of the
+    state directory, with the input size and the number of bodies; a linear
+    model is fitted per route on the most recent samples. The local
+    prediction accounts for the renderers already running in the shared
+    worker pool. Until both routes have `min_samples` samples the static size
+    threshold is used.
+
+    A fraction `explore` of the requests goes to the route predicted to be
+    slower, so that its samples follow the changes of the server or of the
+    local load instead of going stale.
+    """
+
+    def __init__(
+        self,
+        stats_path: str,
+        threshold: int,
+        min_samples: int,
+        semaphore: Optional[FileSemaphore] = None,
+        explore: float = 0.0,
+    ):
+        self.stats_path = stats_path
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.semaphore = semaphore
+        self.explore = explore
+
+    @classmethod
+    def from_config(cls, config) -> "Router":
+        return cls(
+            os.path.join(config.state_dir, "routing.json"),
+            config.threshold,
+            config.routing_min_samples,
+            FileSemaphore(
+                os.path.join(config.state_dir, "local"), config.local_workers
+            ),
+            config.routing_explore,
+        )
+
+    def samples(self) -> Dict[str, List[dict]]:
+        stats = read_json(self.stats_path)
+        return {route: stats.get(route, []) for route in ROUTES}
+
+    def model(self) -> Dict[str, Optional[List[float]]]:
+        """Coefficients per route, None while samples are too few."""
+        return {
+            route: fit(samples) if len(samples) >= self.min_samples else None
+            for route, samples in self.samples().items()
+        }
+
+    def local_load(self) -> float:
+        """Fraction of the local worker slots currently in use."""
+        if self.semaphore is None:
+            return 0.0
+        return self.semaphore.busy() / self.semaphore.slots
+
+    def choose(self, size: int, bodies: int) -> str:
+        model = self.model()
+        if model["local"] is None or model["remote"] is None:
+            route = "local" if size < self.threshold else "remote"
+            logging.info("Routing: %s by size threshold (not enough samples)", route)
+            return route
+
+        # A full pool makes a new local render wait for a running one
+        local = predict(model["local"], size, bodies) * (1 + self.local_load())
+        remote = predict(model["remote"], size, bodies)
+        route = "local" if local <= remote else "remote"
+        if random.random() < self.explore:
+            route = "remote" if route == "local" else "local"
+            logging.info("Routing: %s to refresh its samples", route)
+        logging.info(
+            "Routing: %s (predicted local %.3fs, remote %.3fs)", route, local, remote
+        )
+        return route
+
+    def record(self, route: str, size: int, bodies: int, duration: float) -> None:
+        sample = {
+            "time": time.time(),
+            "size": size,
+            "bodies": bodies,
+            "duration": duration,
+        }
+        with locked_json(self.stats_path) as stats:
+            samples = stats.setdefault(route, [])
+            samples.append(sample)
+            del samples[:-MAX_SAMPLES]
+
+    def describe(self) -> str:
+        """Human readable summary of the samples and the fitted model."""
+        lines = []
+        model = self.model()
+        for route, samples in self.samples().items():
+            coefficients = model[route]
+            if coefficients is None:
+                lines.append(
+                    f"{route}: {len(samples)}/{self.min_samples} samples, "
+                    f"using the {self.threshold} bytes threshold"
+                )
+                continue
+            base, per_mb, per_body = coefficients
+            lines.append(
+                f"{route}: {len(samples)} samples, "
+                f"duration = {base:.3f}s + {per_mb:.3f}s/MB + {per_body:.3f}s/body"
+            )
+        return "\n".join(lines)
+
+
+def print_stats(args: List[str]) -> None:
+    """Print the stats kept in the state directory (`wkhtmltopdf-proxy stats`)."""
+    import argparse
+    import dataclasses
+
+    from .breaker import CircuitBreaker
+    from .main import ProxyConfig
+    from .metrics import describe_priorities
+    from .retry import Hedger
+
+    parser = argparse.ArgumentParser(prog="wkhtmltopdf-proxy stats")
+    parser.add_argument("--state-dir", help="default: WKHTMLTOPDF_PROXY_STATE_DIR")
+    options = parser.parse_args(args)
+
+    config = ProxyConfig.load()
+    if options.state_dir:
+        config = dataclasses.replace(config, state_dir=options.state_dir)
+    print(Router.from_config(config).describe())
+
+    hedger = Hedger.from_config(config)
+    print(hedger.describe() if hedger else "hedging: disabled")
+
+    breaker = CircuitBreaker.from_config(config)
+    print(breaker.describe() if breaker else "circuit breaker: disabled")
+
+    # Latencies per priority class come from the metrics totals
+    if config.metrics_file:
+        print(describe_priorities(os.path.join(config.state_dir, "metrics.json")))
+    else:
+        print("priorities: metrics disabled")
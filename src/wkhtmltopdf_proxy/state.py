@@ -0,0 +1,118 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on `path` shared by every proxy process."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def atomic_write(path: str, content: bytes) -> None:
+    """Write `content` to a temporary file and rename it over `path`."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_json(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def locked_json(path: str) -> Iterator[dict]:
+    """Load a JSON state file under lock and save it back on exit.
+
+    The lock is taken on a sibling `.lock` file so that readers never see a
+    partially written state.
+    """
+    with locked(path + ".lock"):
+        state = read_json(path)
+        yield state
+        atomic_write(path, json.dumps(state).encode())
+
+
+class FileSemaphore:
+    """Counting semaphore shared by every proxy process.
+
+    Each of the `slots` permits is an exclusive lock on a file of
+    `directory`; locks are released by the kernel when a process dies, so a
+    crashed holder never leaks its permit.
+    """
+
+    def __init__(self, directory: str, slots: int, poll_interval: float = 0.05):
+        self.directory = directory
+        self.slots = max(slots, 1)
+        self.poll_interval = poll_interval
+
+    def try_acquire(self) -> Optional[IO]:
+        os.makedirs(self.directory, exist_ok=True)
+        for slot in range(self.slots):
+            file = open(os.path.join(self.directory, f"slot-{slot}.lock"), "a")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                continue
+            return file
+        return None
+
+    def busy(self) -> int:
+        """Number of slots currently held."""
+        count = 0
+        for slot in range(self.slots):
+            path = os.path.join(self.directory, f"slot-{slot}.lock")
+            try:
+                file = open(path)
+            except FileNotFoundError:
+                continue
+            with file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    count += 1
+        return count
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Wait for a free slot, raising TimeoutError after `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (file := self.try_acquire()) is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No free slot in {self.directory}")
+            time.sleep(self.poll_interval)
+
+        try:
+            yield
+        finally:
+            self.release(file)
+
+    @staticmethod
+    def release(file: IO) -> None:
+        """Release a slot returned by `try_acquire()`."""
+        fcntl.flock(file, fcntl.LOCK_UN)
+        file.close()
@@ -0,0 +1,578 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from .compression import compress_bytes, decompress
+
+PDF_HEADER = b"%PDF-1.4\n%stub\n"
+CHUNK_SIZE = 1024 * 1024
+# Job attributes not sent in its status
+HIDDEN = {"done", "timing"}
+
+
+def make_pdf(pages: List[bytes]) -> bytes:
+    """Build a valid PDF with one page per item, showing its text."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b""]
+    kids = []
+    for text in pages:
+        escaped = (
+            text.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+        )
+        stream = b"BT /F1 12 Tf 72 720 Td (" + escaped + b") Tj ET"
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        kids.append(b"%d 0 R" % (len(objects) + 1))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 "
+            b"/BaseFont /Helvetica >> >> >> >>" % len(objects)
+        )
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(kids),
+        len(kids),
+    )
+
+    content = bytearray(PDF_HEADER)
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(content)
+
+
+def parse_form(content_type: str, body: bytes) -> Tuple[dict, List[dict]]:
+    """Split a form body into form fields and file parts.
+
+    Clients may send an urlencoded body when no file is uploaded, which
+    happens when every part is referenced by digest.
+    """
+    if not content_type.startswith("multipart/"):
+        return dict(parse_qsl(body.decode())), []
+
+    message = BytesParser().parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    fields, files = {}, []
+
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        content = part.get_payload(decode=True) or b""
+        filename = part.get_filename()
+        size = len(content)
+
+        if encoding := part.get("Content-Encoding"):
+            content = decompress(content, encoding)
+
+        if filename is None:
+            fields[name] = content.decode()
+            continue
+
+        files.append(
+            {
+                "name": name,
+                "filename": filename,
+                "headers": dict(part.items()),
+                "content": content,
+                "size": size,
+            }
+        )
+
+    return fields, files
+
+
+class StubRenderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubRenderServer"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def iter_body(self) -> Iterator[bytes]:
+        """Read the request body, with or without chunked transfer encoding."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                yield self.rfile.read(size)
+                self.rfile.readline()
+            self.rfile.readline()
+            return
+
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def read_body(self) -> bytes:
+        return b"".join(self.iter_body())
+
+    def accepted_encoding(self) -> Optional[str]:
+        encoding = self.server.response_encoding
+        if encoding and encoding in self.headers.get("Accept-Encoding", ""):
+            return encoding
+        return None
+
+    def send_content(
+        self,
+        status: int,
+        content: bytes,
+        content_type: str,
+        headers: Optional[dict] = None,
+        droppable: bool = False,
+    ):
+        encoding = self.accepted_encoding()
+        if encoding:
+            content = compress_bytes(content, encoding)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+
+        with self.server.lock:
+            dropping = droppable and self.server.drop_next > 0
+            self.server.drop_next -= dropping
+
+        if dropping:
+            # Disconnect mid-stream, the client sees a truncated body
+            self.wfile.write(content[: self.server.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(content)
+
+    def send_pdf(self, content: bytes, timing: Optional[Dict[str, float]] = None):
+        """Send a rendered PDF, addressable for Range requests when plain."""
+        headers = self.server_timing(timing or {})
+        if not self.accepted_encoding():
+            key = hashlib.sha256(content).hexdigest()
+            digest = hashlib.sha256(b"" if self.server.corrupt_digest else content)
+            with self.server.lock:
+                self.server.results[key] = content
+            headers["Content-Location"] = f"/results/{key}"
+            headers["ETag"] = f'"{key}"'
+            headers[
+                "Repr-Digest"
+            ] = f"sha-256=:{base64.b64encode(digest.digest()).decode()}:"
+            if self.server.ranges:
+                headers["Accept-Ranges"] = "bytes"
+
+        self.send_content(200, content, "application/pdf", headers, droppable=True)
+
+    def send_json(self, status: int, payload: dict):
+        self.send_content(status, json.dumps(payload).encode(), "application/json")
+
+    def render(self, fields: dict, files: List[dict]) -> bytes:
+        """Produce a fake PDF made of the body parts, in upload order."""
+        skipped = {fields.get("header"), fields.get("footer")}
+        bodies = [item["content"] for item in files if item["filename"] not in skipped]
+        if self.server.pdf_pages:
+            return make_pdf(bodies)
+        return PDF_HEADER + b"".join(bodies)
+
+    def record(self, **values):
+        with self.server.lock:
+            self.server.requests.append(
+                {"path": self.path, "headers": dict(self.headers), **values}
+            )
+
+    def resolve_digests(self, digests: List[List[str]], files: List[dict]):
+        """Rebuild the file parts referenced by digest, in declared order."""
+        blobs = self.server.blobs
+        with self.server.lock:
+            for item in files:
+                blobs[hashlib.sha256(item["content"]).hexdigest()] = item["content"]
+
+            missing = [digest for _name, digest in digests if digest not in blobs]
+            files = [
+                {"filename": name, "content": blobs.get(digest, b"")}
+                for name, digest in digests
+            ]
+
+        return files, missing
+
+    def do_digests(self):
+        digests = json.loads(self.read_body())["digests"]
+        self.record(digests=digests)
+        if self.server.digests_status:
+            return self.send_json(self.server.digests_status, {"error": "Failing"})
+
+        with self.server.lock:
+            missing = [digest for digest in digests if digest not in self.server.blobs]
+
+        self.send_json(200, {"missing": missing})
+
+    def do_render(self):
+        with self.server.lock:
+            failing = self.server.fail_next > 0
+            self.server.fail_next -= failing
+
+        if failing:
+            self.read_body()
+            self.record()
+            return self.send_json(503, {"error": "Transient failure"})
+
+        if self.server.fail_status:
+            self.read_body()
+            self.record()
+            return self.send_json(self.server.fail_status, {"error": "Failing"})
+
+        if self.server.discard_uploads:
+            size = sum(len(chunk) for chunk in self.iter_body())
+            self.record(size=size)
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            return self.send_content(200, PDF_HEADER, "application/pdf")
+
+        start = time.perf_counter()
+        fields, files = parse_form(self.headers["Content-Type"], self.read_body())
+        self.record(fields=fields, files=files)
+        parsed = time.perf_counter()
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if "digests" in fields:
+            files, missing = self.resolve_digests(json.loads(fields["digests"]), files)
+            if missing:
+                return self.send_json(409, {"missing": missing})
+
+        if not files:
+            return self.send_json(400, {"error": "No files provided."})
+
+        content = self.render(fields, files)
+        timing = {"parse": parsed - start, "render": time.perf_counter() - parsed}
+        self.send_pdf(content, timing)
+
+    def server_timing(self, timing: Dict[str, float]) -> Dict[str, str]:
+        metrics = [f"{name};dur={value * 1000:.3f}" for name, value in timing.items()]
+        return {"Server-Timing": ", ".join(metrics)} if metrics else {}
+
+    def do_submit(self):
+        fields, files = parse_form(self.headers["Content-Type"], self.read_body())
+        self.record(fields=fields, files=files)
+
+        if self.server.fail_status:
+            return self.send_json(self.server.fail_status, {"error": "Failing"})
+
+        if "digests" in fields:
+            files, missing = self.resolve_digests(json.loads(fields["digests"]), files)
+            if missing:
+                return self.send_json(409, {"missing": missing})
+
+        if not files:
+            return self.send_json(400, {"error": "No files provided."})
+
+        # Retries of a submission carry the same key and get the same job
+        job_id = self.headers.get("Idempotency-Key") or uuid.uuid4().hex
+        with self.server.lock:
+            known = job_id in self.server.jobs
+            if not known:
+                self.server.jobs[job_id] = {
+                    "id": job_id,
+                    "status": "pending",
+                    "progress": 0.0,
+                    "done": threading.Event(),
+                }
+
+        if not known:
+            content = self.render(fields, files)
+            threading.Thread(
+                target=self.server.run_job, args=(job_id, content), daemon=True
+            ).start()
+
+        self.send_content(
+            202,
+            json.dumps({"id": job_id}).encode(),
+            "application/json",
+            {"Location": f"/jobs/{job_id}"},
+        )
+
+    def do_job(self):
+        url = urlsplit(self.path)
+        self.record()
+        job = self.server.jobs.get(url.path.rsplit("/", 1)[-1])
+        if job is None:
+            return self.send_json(404, {"error": f"Unknown job {url.path}"})
+
+        with self.server.lock:
+            dropping = self.server.drop_polls > 0
+            self.server.drop_polls -= dropping
+        if dropping:
+            self.close_connection = True
+            return
+        if self.server.poll_status:
+            return self.send_json(self.server.poll_status, {"error": "Failing"})
+        if self.server.poll_body is not None:
+            return self.send_content(200, self.server.poll_body, "application/json")
+
+        if self.server.long_poll:
+            wait = float(dict(parse_qsl(url.query)).get("wait", 0))
+            job["done"].wait(wait)
+
+        status = {key: value for key, value in job.items() if key not in HIDDEN}
+        self.send_content(
+            200,
+            json.dumps(status).encode(),
+            "application/json",
+            self.server_timing(job.get("timing", {})),
+        )
+
+    def do_DELETE(self):
+        self.record()
+        job = self.server.jobs.get(self.path.rsplit("/", 1)[-1])
+        if job is None:
+            return self.send_json(404, {"error": f"Unknown job {self.path}"})
+        if not job["done"].is_set():
+            job.update(status="failed", error="Cancelled")
+            job["done"].set()
+        self.send_json(200, {"id": job["id"], "status": job["status"]})
+
+    def do_POST(self):
+        routes = {
+            "/": self.do_render,
+            "/digests": self.do_digests,
+            "/jobs": self.do_submit,
+        }
+
+        if self.path not in routes:
+            self.read_body()
+            return self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+        routes[self.path]()
+
+    def do_result(self):
+        self.record()
+        key = self.path.rsplit("/", 1)[-1]
+        content = self.server.results.get(key)
+        if content is None:
+            return self.send_json(404, {"error": f"Unknown result {key}"})
+
+        headers = {"ETag": f'"{key}"', "Accept-Ranges": "bytes"}
+        ranges = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range")
+        if not ranges.startswith("bytes=") or if_range not in (None, headers["ETag"]):
+            return self.send_content(200, content, "application/pdf", headers, True)
+
+        start = int(ranges[len("bytes=") :].split("-")[0])
+        headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        self.send_content(206, content[start:], "application/pdf", headers, True)
+
+    def do_GET(self):
+        if self.path.startswith("/results/"):
+            return self.do_result()
+        if self.path.startswith("/jobs/"):
+            return self.do_job()
+
+        # Health check
+        self.send_json(self.server.fail_status or 200, {"status": "ok"})
+
+
+class StubRenderServer(ThreadingHTTPServer):
+    """Threaded HTTP server mimicking the rendering API.
+
+    Every request is recorded in `requests` and every accepted connection is
+    counted in `connections`, so tests can check what was sent and whether
+    connections were reused. Compressed file parts are decoded, and responses
+    are compressed with `response_encoding` when the client accepts it.
+
+    Parts uploaded by digest are kept in `blobs`; clearing it simulates a
+    server evicting them, and `digests_status` makes the negotiation of
+    digests fail with that HTTP status. With `discard_uploads`, render
+    requests are only counted in bytes, which keeps the memory of the stub
+    flat for large uploads. Setting `fail_status` makes renders and health
+    checks fail with that HTTP status, and `fail_next` makes that many
+    renders fail with a 503. With `pdf_pages`, a valid PDF with a page per
+    body is returned.
+
+    Uncompressed PDFs are kept in `results` and can be downloaded again from
+    their Content-Location, with Range requests unless `ranges` is unset.
+    `drop_next` makes that many PDF responses disconnect after `drop_after`
+    bytes, and `corrupt_digest` sends a wrong Repr-Digest header.
+
+    Renders can also be submitted as jobs to `/jobs`, which take `job_time`
+    seconds and fail with `job_error` when set. Jobs are kept in `jobs` and
+    polled at `/jobs/<id>`, long polls waiting for the end of the job unless
+    `long_poll` is unset; `drop_polls` makes that many polls disconnect
+    without an answer, `poll_status` makes polls fail with that HTTP status
+    and `poll_body` replaces the job status in their answers.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        handler=StubRenderHandler,
+        response_encoding: Optional[str] = None,
+        discard_uploads: bool = False,
+    ):
+        super().__init__(address, handler)
+        self.discard_uploads = discard_uploads
+        self.fail_status = 0
+        self.fail_next = 0
+        self.digests_status = 0
+        self.pdf_pages = False
+        self.ranges = True
+        self.drop_next = 0
+        self.drop_after = 0
+        self.corrupt_digest = False
+        self.results: Dict[str, bytes] = {}
+        self.jobs: Dict[str, dict] = {}
+        self.job_time = 0.0
+        self.job_error = ""
+        self.long_poll = True
+        self.drop_polls = 0
+        self.poll_status = 0
+        self.poll_body: Optional[bytes] = None
+        self.latency = latency
+        self.response_encoding = response_encoding
+        self.lock = threading.Lock()
+        self.requests: List[dict] = []
+        self.blobs: Dict[str, bytes] = {}
+        self.connections = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def run_job(self, job_id: str, content: bytes):
+        """Complete a job after `job_time` seconds, half of it at 50%."""
+        job = self.jobs[job_id]
+        start = time.perf_counter()
+        time.sleep(self.job_time / 2)
+        with self.lock:
+            if job["status"] == "pending":
+                job.update(status="running", progress=0.5)
+        running = time.perf_counter()
+        time.sleep(self.job_time / 2)
+        job["timing"] = {
+            "queue": running - start,
+            "render": time.perf_counter() - running,
+        }
+
+        with self.lock:
+            if job["done"].is_set():
+                return
+            if self.job_error:
+                job.update(status="failed", error=self.job_error)
+            else:
+                key = hashlib.sha256(content).hexdigest()
+                self.results[key] = content
+                job.update(status="done", progress=1.0, result=f"/results/{key}")
+        job["done"].set()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubRenderServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubRenderServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubAssetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubAssetServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(
+                {"path": self.path, "headers": dict(self.headers)}
+            )
+        if self.path not in self.server.assets:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            return self.end_headers()
+
+        content_type, content = self.server.assets[self.path]
+        etag = f'"{hashlib.sha256(content).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            return self.end_headers()
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubAssetServer(StubRenderServer):
+    """HTTP server of report assets, standing for Odoo.
+
+    `assets` maps paths to (content type, content); responses carry an
+    ETag and conditional requests are answered with a 304. Every request is
+    recorded in `requests`.
+    """
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0)):
+        super().__init__(address, handler=StubAssetHandler)
+        self.assets: Dict[str, Tuple[str, bytes]] = {}
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m wkhtmltopdf_proxy.stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    options = parser.parse_args(args)
+
+    server = StubRenderServer((options.host, options.port), latency=options.latency)
+    print(f"Stub render server listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+TRACEPARENT_PATTERN = r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})"
+SECRET_OPTIONS = {"--cookie": 2, "--custom-header": 2, "--password": 1}
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Durations in seconds of the metrics of a Server-Timing header."""
+    timings: Dict[str, float] = {}
+    for metric in header.split(","):
+        name, *params = (item.strip() for item in metric.split(";"))
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() != "dur":
+                continue
+            try:
+                duration = float(value.strip().strip('"')) / 1000
+            except ValueError:
+                continue
+            timings[name] = timings.get(name, 0) + duration
+    return timings
+
+
+def scrub(args: List[str]) -> List[str]:
+    """Mask cookie, header and password values of wkhtmltopdf arguments."""
+    args = list(args)
+    for index, arg in enumerate(args):
+        if arg in SECRET_OPTIONS:
+            # The value is the last of the option arguments
+            value = index + SECRET_OPTIONS[arg]
+            if value < len(args):
+                args[value] = "***"
+    return args
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started, from /proc when available."""
+    try:
+        with open("/proc/self/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as file:
+            uptime = float(file.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return max(uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+class Tracer:
+    """Trace of one proxy invocation.
+
+    Every request to the renderer carries a W3C `traceparent` header with
+    the trace ID of the invocation, taken from the `TRACEPARENT` environment
+    variable when Odoo runs in a trace, and a new span ID. The durations of
+    the `Server-Timing` response headers are collected, and `finish()` logs
+    one JSON record splitting the time between the proxy phases and the
+    server ones, appended to `trace_file` when set.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, args: Optional[List[str]] = None, trace_file: str = ""):
+        self.trace_file = trace_file
+        self.command = " ".join(["wkhtmltopdf"] + scrub(args or []))
+        self.startup = process_age()
+        self.start = time.perf_counter()
+        self.requests: List[dict] = []
+        self.parent_id = ""
+        self.flags = "01"
+        self.trace_id = os.urandom(16).hex()
+        if match := re.fullmatch(TRACEPARENT_PATTERN, os.getenv("TRACEPARENT", "")):
+            self.trace_id, self.parent_id, self.flags = match.groups()
+
+    def traceparent(self) -> str:
+        """Header value for a new request span."""
+        return f"00-{self.trace_id}-{os.urandom(8).hex()}-{self.flags}"
+
+    def response(self, headers: dict, response) -> None:
+        """Record the span and server timings of the answer to a request."""
+        span = {
+            "span_id": headers.get("traceparent", "")[36:52],
+            "url": response.url,
+            "status": response.status_code,
+        }
+        if timing := response.headers.get("Server-Timing"):
+            span["server"] = parse_server_timing(timing)
+        with self.lock:
+            self.requests.append(span)
+
+    def record(
+        self, route: str, status: str, phases: Dict[str, float], priority: str = ""
+    ) -> dict:
+        # Attempts and polls repeat the server metrics, the last answer has
+        # the ones of the request that succeeded
+        server = {}
+        for span in self.requests:
+            server = span.get("server") or server
+        return {
+            "trace_id": self.trace_id,
+            "parent_id": self.parent_id,
+            "command": self.command,
+            "route": route,
+            "priority": priority,
+            "status": status,
+            "duration": round(time.perf_counter() - self.start, 6),
+            "startup": round(self.startup, 3) if self.startup is not None else None,
+            "client": {name: round(value, 6) for name, value in phases.items()},
+            "server": {name: round(value, 6) for name, value in server.items()},
+            "requests": self.requests,
+        }
+
+    def finish(
+        self, route: str, status: str, phases: Dict[str, float], priority: str = ""
+    ) -> None:
+        line = json.dumps(self.record(route, status, phases, priority))
+        logging.info("Trace: %s", line)
+        if self.trace_file:
+            os.makedirs(os.path.dirname(self.trace_file) or ".", exist_ok=True)
+            # A single append write per line, not interleaved by other proxies
+            with open(self.trace_file, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+
+tracer = Tracer()
@@ -0,0 +1,38 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+
+
+class ProxyTestCase(unittest.TestCase):
+    """Base class of the tests running the proxy in-process.
+
+    `setUp` creates `tmpdir`, the state directory of the proxy. `run_proxy`
+    renders in remote mode against `self.server` unless a URL is given, with
+    the variables of `env` and the given ones set.
+    """
+
+    env: Dict[str, str] = {}
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def run_proxy(self, args: List[str], url: str = "", **env: str):
+        """Run main() with `args`, returning its exit code."""
+        env = {
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_URL": url or self.server.url,
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+            **self.env,
+            **env,
+        }
+        with patch.dict(os.environ, env), self.assertRaises(SystemExit) as error:
+            wk.main(args)
+        return error.exception.code
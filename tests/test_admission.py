@@ -0,0 +1,139 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import threading
+import time
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.admission import (
+    BATCH,
+    INTERACTIVE,
+    Admission,
+    TokenBucket,
+    classify,
+)
+from wkhtmltopdf_proxy.metrics import describe_priorities
+from wkhtmltopdf_proxy.state import FileSemaphore
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+
+class TestWkhtmltopdfProxyAdmission(ProxyTestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(os.path.join(self.tmpdir.name, "rate.json"), 20, 2)
+        start = time.monotonic()
+        bucket.take()
+        bucket.take()
+        self.assertLess(time.monotonic() - start, 0.04)
+
+        bucket.take()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+        with self.assertRaises(TimeoutError):
+            bucket.take(deadline=time.monotonic())
+
+    def test_concurrency_limit(self):
+        admission = Admission(self.tmpdir.name, 1, 0, 0, queue_timeout=0.2)
+        admitted, release = threading.Event(), threading.Event()
+
+        def hold():
+            with admission.admit():
+                admitted.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        admitted.wait(5)
+
+        with self.assertLogs(level="ERROR") as logs, self.assertRaises(TimeoutError):
+            with admission.admit():
+                pass
+        self.assertIn("rejected after 0.2", logs.output[0])
+
+        release.set()
+        thread.join()
+        with self.assertLogs(level="INFO") as logs, admission.admit():
+            pass
+        self.assertIn("queue depth 0", logs.output[0])
+
+    def test_main_rejects_when_full(self):
+        # Another process holds the only slot
+        slots = FileSemaphore(os.path.join(self.tmpdir.name, "admission"), 1)
+        body = os.path.join(self.tmpdir.name, "body.html")
+        with open(body, "w") as file:
+            file.write("<p>report</p>")
+
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        with StubRenderServer() as server, slots.acquire():
+            code = self.run_proxy(
+                [body, output],
+                server.url,
+                WKHTMLTOPDF_PROXY_MAX_CONCURRENCY="1",
+                WKHTMLTOPDF_PROXY_QUEUE_TIMEOUT="0.1",
+            )
+
+            self.assertIn("Rendering queue is full", code)
+            self.assertEqual(server.requests, [])
+
+    def test_classify(self):
+        self.assertEqual(classify("", 1, 1000, 20), INTERACTIVE)
+        self.assertEqual(classify("", 20, 1000, 20), BATCH)
+        self.assertEqual(classify("", 1, 10**6, 20, 10**6), BATCH)
+        self.assertEqual(classify("interactive", 50, 10**9, 20, 10**6), INTERACTIVE)
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(classify("urgent", 1, 1000, 20), INTERACTIVE)
+
+    def test_reserved_slots(self):
+        admission = Admission(self.tmpdir.name, 2, 0, 0, queue_timeout=0.1, reserved=1)
+        with admission.admit(BATCH):
+            # The other slot is kept for interactive requests
+            with self.assertLogs(level="ERROR"), self.assertRaises(TimeoutError):
+                with admission.admit(BATCH):
+                    pass
+            with admission.admit(INTERACTIVE):
+                pass
+
+    def test_batch_yields_to_interactive(self):
+        admission = Admission(self.tmpdir.name, 1, 0, 0, queue_timeout=0.1)
+        # An interactive request of this process is waiting
+        admission.enqueue(f"{os.getpid()}:0:0", INTERACTIVE)
+        with self.assertLogs(level="ERROR"), self.assertRaises(TimeoutError):
+            with admission.admit(BATCH):
+                pass
+
+        admission.dequeue(f"{os.getpid()}:0:0")
+        with admission.admit(BATCH):
+            pass
+
+    def test_priority_header_and_metrics(self):
+        body = os.path.join(self.tmpdir.name, "body.html")
+        with open(body, "w") as file:
+            file.write("<p>report</p>")
+        textfile = os.path.join(self.tmpdir.name, "metrics.prom")
+
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        with StubRenderServer() as server:
+            for priority in ("", "batch"):
+                code = self.run_proxy(
+                    [body, output],
+                    server.url,
+                    WKHTMLTOPDF_PROXY_METRICS_FILE=textfile,
+                    WKHTMLTOPDF_PROXY_PRIORITY=priority,
+                )
+                self.assertFalse(code)
+
+            headers = [request["headers"]["Priority"] for request in server.requests]
+            self.assertEqual(headers, ["u=1", "u=6"])
+
+        with open(textfile) as file:
+            content = file.read()
+        for priority in ("interactive", "batch"):
+            labels = f'{{priority="{priority}",route="remote"}}'
+            self.assertIn(f"request_duration_seconds_count{labels} 1", content)
+
+        stats = describe_priorities(os.path.join(self.tmpdir.name, "metrics.json"))
+        self.assertIn("batch 1 request(s)", stats)
+        self.assertIn("interactive 1 request(s)", stats)
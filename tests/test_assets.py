@@ -0,0 +1,112 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import base64
+import os
+import re
+from unittest.mock import patch
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.stub import StubAssetServer, StubRenderServer
+
+CSS = b"@font-face { font-family: Lato; src: url('fonts/lato.woff'); }"
+FONT = b"wOFF-font"
+PNG = b"\x89PNG-logo"
+
+
+def data_uri(content_type: str, content: bytes) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(content).decode()}"
+
+
+class TestWkhtmltopdfProxyAssets(ProxyTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.odoo = StubAssetServer().start()
+        self.addCleanup(self.odoo.stop)
+        self.odoo.assets = {
+            "/web/assets/report.css": ("text/css", CSS),
+            "/web/assets/fonts/lato.woff": ("font/woff", FONT),
+            "/web/image?model=res.company&id=1": ("image/png", PNG),
+        }
+        self.cdn = StubAssetServer().start()
+        self.addCleanup(self.cdn.stop)
+        self.cdn.assets = {"/stamp.png": ("image/png", PNG)}
+
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+
+    def proxy(self) -> str:
+        """Render a report, returning the uploaded body."""
+        html = f"""<html><head>
+<base href="{self.odoo.url}/"/>
+<link type="text/css" rel="stylesheet" href="/web/assets/report.css"/>
+<link rel="icon" href="/favicon.ico"/>
+<style>.stamp {{ background: url({self.cdn.url}/stamp.png) }}</style>
+</head><body>
+<img src="/web/image?model=res.company&amp;id=1"/>
+<img data-src="/lazy.png" src="/missing.png"/>
+</body></html>"""
+        body = os.path.join(self.tmpdir.name, "body.html")
+        header = os.path.join(self.tmpdir.name, "header.html")
+        for path in (body, header):
+            with open(path, "w") as file:
+                file.write(html)
+
+        argv = [
+            "--cookie",
+            "session_id",
+            "secret",
+            "--header-html",
+            header,
+            body,
+            os.path.join(self.tmpdir.name, "output.pdf"),
+        ]
+        self.assertFalse(self.run_proxy(argv, WKHTMLTOPDF_PROXY_INLINE_ASSETS="1"))
+
+        files = self.server.requests[-1]["files"]
+        return next(
+            item["content"] for item in files if item["filename"] == "body.html"
+        )
+
+    def test_inline(self):
+        content = self.proxy().decode()
+
+        css = CSS.replace(
+            b"'fonts/lato.woff'", f'"{data_uri("font/woff", FONT)}"'.encode()
+        )
+        self.assertIn(f'href="{data_uri("text/css", css)}"', content)
+        self.assertIn(f'url("{data_uri("image/png", PNG)}")', content)
+        self.assertIn(f'<img src="{data_uri("image/png", PNG)}"/>', content)
+        # Other links and missing assets are left alone
+        self.assertIn('<link rel="icon" href="/favicon.ico"/>', content)
+        self.assertIn('<img data-src="/lazy.png" src="/missing.png"/>', content)
+
+        # Each asset is fetched once for the body and the header
+        paths = [request["path"] for request in self.odoo.requests]
+        self.assertEqual(len(paths), len(set(paths)))
+
+    def test_cookie_sent_to_base_host_only(self):
+        self.proxy()
+        for request in self.odoo.requests:
+            self.assertEqual(request["headers"].get("Cookie"), "session_id=secret")
+        self.assertNotIn("Cookie", self.cdn.requests[0]["headers"])
+
+    def test_revalidated_with_etag(self):
+        first = self.proxy()
+        self.odoo.requests.clear()
+
+        self.assertEqual(self.proxy(), first)
+        conditional = [
+            request
+            for request in self.odoo.requests
+            if re.fullmatch(r'"\w+"', request["headers"].get("If-None-Match", ""))
+        ]
+        self.assertEqual(len(conditional), 3)
+
+    def test_large_document_not_inlined(self):
+        with patch("wkhtmltopdf_proxy.assets.MAX_DOCUMENT_SIZE", 100):
+            content = self.proxy().decode()
+        self.assertIn('href="/web/assets/report.css"', content)
+        self.assertFalse(self.odoo.requests)
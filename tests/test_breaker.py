@@ -0,0 +1,124 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+from proxy_case import ProxyTestCase
+from test_local import FAKE_WKHTMLTOPDF
+
+from wkhtmltopdf_proxy.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from wkhtmltopdf_proxy.state import locked_json, read_json
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+
+class TestWkhtmltopdfProxyBreaker(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.state_path = os.path.join(self.tmpdir.name, "breaker.json")
+
+    def breaker(self, **kwargs) -> CircuitBreaker:
+        options = {"failures": 2, "window": 60, "open_time": 0.1, **kwargs}
+        return CircuitBreaker(self.state_path, **options)
+
+    def state(self) -> str:
+        return read_json(self.state_path).get("state", CLOSED)
+
+    def test_open_and_recover(self):
+        breaker = self.breaker()
+        breaker.record(False, 1.0)
+        self.assertTrue(breaker.allow())
+        breaker.record(False, 1.0)
+        self.assertEqual(self.state(), OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(self.state(), HALF_OPEN)
+        # A single probe at a time across processes
+        with locked_json(self.state_path) as state:
+            state["probe"] = os.getppid()
+        self.assertFalse(breaker.allow())
+        with locked_json(self.state_path) as state:
+            state["probe"] = os.getpid()
+
+        breaker.record(True, 0.5)
+        self.assertEqual(self.state(), CLOSED)
+        self.assertIn("closed", breaker.describe())
+
+    def test_failed_probe_reopens(self):
+        breaker = self.breaker(failures=1)
+        breaker.record(False, 1.0)
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record(False, 1.0)
+        self.assertEqual(self.state(), OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_slow_requests_fail(self):
+        breaker = self.breaker(slow_time=2)
+        breaker.record(True, 3.0)
+        breaker.record(True, 1.0)
+        self.assertEqual(self.state(), CLOSED)
+        breaker.record(True, 5.0)
+        self.assertEqual(self.state(), OPEN)
+        self.assertIn("2/3 failed", breaker.describe())
+
+    def test_old_failures_forgotten(self):
+        breaker = self.breaker(window=0.05)
+        breaker.record(False, 1.0)
+        time.sleep(0.06)
+        breaker.record(False, 1.0)
+        self.assertEqual(self.state(), CLOSED)
+
+
+class TestWkhtmltopdfProxyBreakerFallback(ProxyTestCase):
+    env = {
+        "WKHTMLTOPDF_PROXY_RETRIES": "0",
+        "WKHTMLTOPDF_PROXY_BREAKER_FAILURES": "1",
+    }
+
+    def setUp(self):
+        super().setUp()
+
+        self.bin_dir = os.path.join(self.tmpdir.name, "bin")
+        os.makedirs(self.bin_dir)
+        binary = os.path.join(self.bin_dir, "wkhtmltopdf")
+        with open(binary, "w") as file:
+            file.write(FAKE_WKHTMLTOPDF)
+        os.chmod(binary, stat.S_IRWXU)
+
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.fail_status = 503
+
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        with open(self.body, "w") as file:
+            file.write("<p>report</p>")
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+
+    def proxy(self, path: str):
+        fake_log = os.path.join(self.tmpdir.name, "fake.log")
+        return self.run_proxy([self.body, self.output], PATH=path, FAKE_LOG=fake_log)
+
+    def test_local_fallback(self):
+        path = self.bin_dir + os.pathsep + os.environ["PATH"]
+        self.assertFalse(self.proxy(path))
+        self.assertEqual(len(self.server.requests), 1)
+        with open(self.output) as file:
+            self.assertEqual(file.read().split(), [self.body, self.output])
+
+        # The circuit is open: straight to the local binary
+        os.unlink(self.output)
+        self.assertFalse(self.proxy(path))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(os.path.exists(self.output))
+
+    def test_without_local_binary(self):
+        self.assertIn("503", self.proxy(""))
+        self.assertIn("circuit open", self.proxy(""))
+        self.assertEqual(len(self.server.requests), 1)
@@ -0,0 +1,128 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.cache import ResultCache
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+
+class TestWkhtmltopdfProxyCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, "cache"), 1024, 3600)
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_key_ignores_temporary_names(self):
+        body_1 = self.write("body.1.html", b"<p>body</p>")
+        body_2 = self.write("body.2.html", b"<p>body</p>")
+        header_1 = self.write("header.1.html", b"<p>header</p>")
+        header_2 = self.write("header.2.html", b"<p>header</p>")
+
+        key_1 = self.cache.key(
+            [body_1], header_1, "", {"header-html": header_1, "dpi": "90"}
+        )
+        key_2 = self.cache.key(
+            [body_2], header_2, "", {"dpi": "90", "header-html": header_2}
+        )
+        self.assertEqual(key_1, key_2)
+
+        self.assertNotEqual(key_1, self.cache.key([body_1], header_1, "", {}))
+        self.assertNotEqual(
+            key_1, self.cache.key([header_1], body_1, "", {"dpi": "90"})
+        )
+
+    def test_get_put(self):
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        source = self.write("source.pdf", b"%PDF-1.4 content")
+
+        self.assertFalse(self.cache.get("ab" * 32, output))
+        self.cache.put("ab" * 32, source)
+        self.assertTrue(self.cache.get("ab" * 32, output))
+        self.assertEqual(self.read(output), b"%PDF-1.4 content")
+
+        stats = self.cache.record(True)
+        self.assertEqual(stats, {"hits": 2, "misses": 1})
+
+    def test_get_atomic(self):
+        output = self.write("output.pdf", b"previous")
+        self.cache.put("ab" * 32, self.write("source.pdf", b"%PDF-1.4 content"))
+
+        def copy_partially(source, destination):
+            with open(destination, "wb") as file:
+                file.write(b"%PDF-1.4")
+            raise OSError("No space left on device")
+
+        with patch("shutil.copyfile", side_effect=copy_partially):
+            with self.assertRaises(OSError):
+                self.cache.get("ab" * 32, output)
+        self.assertEqual(self.read(output), b"previous")
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir.name)), ["cache", "output.pdf", "source.pdf"]
+        )
+
+    def test_evict_size(self):
+        for index in range(3):
+            source = self.write(f"{index}.pdf", b"x" * 400)
+            self.cache.put(f"{index:064d}", source)
+            entry = self.cache.entry_path(f"{index:064d}")
+            os.utime(entry, (time.time() - 30 + index, time.time() - 30 + index))
+
+        remaining = sorted(os.path.basename(path) for path, _ in self.cache.entries())
+        self.assertEqual(remaining, [f"{1:064d}.pdf", f"{2:064d}.pdf"])
+
+    def test_evict_age(self):
+        source = self.write("old.pdf", b"old")
+        self.cache.put("cd" * 32, source)
+        entry = self.cache.entry_path("cd" * 32)
+        os.utime(entry, (time.time() - 7200, time.time() - 7200))
+
+        self.assertFalse(self.cache.get("cd" * 32, source + ".out"))
+        self.cache.evict()
+        self.assertFalse(os.path.exists(entry))
+
+    def test_concurrent_put(self):
+        sources = [self.write(f"{index}.pdf", b"y" * 100) for index in range(8)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda path: self.cache.put("ef" * 32, path), sources))
+
+        self.assertEqual(self.read(self.cache.entry_path("ef" * 32)), b"y" * 100)
+        self.assertEqual(len(self.cache.entries()), 1)
+
+    def test_main_cache_hit(self):
+        body = self.write("body.html", b"<p>cached</p>")
+        header = self.write("header.html", b"<p>header</p>")
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        env = {
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_CACHE": "1",
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+        }
+
+        with StubRenderServer() as server, patch.dict(os.environ, env):
+            os.environ["WKHTMLTOPDF_PROXY_URL"] = server.url
+            for _ in range(2):
+                with self.assertRaises(SystemExit) as error:
+                    wk.main(["--dpi", "90", "--header-html", header, body, output])
+                self.assertFalse(error.exception.code)
+                self.assertEqual(self.read(output), PDF_HEADER + b"<p>cached</p>")
+                os.unlink(output)
+
+            self.assertEqual(len(server.requests), 1)
@@ -0,0 +1,108 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import dataclasses
+import json
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+
+import requests
+
+from wkhtmltopdf_proxy.client import ProxyClient
+from wkhtmltopdf_proxy.main import ProxyConfig
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+CONFIG = ProxyConfig(
+    timeout=30,
+    version="0.12.6",
+    threshold=2 * 1024 * 1024,
+    clean_html=False,
+    mode="remote",
+    url="",
+)
+
+
+class TestWkhtmltopdfProxyClient(unittest.TestCase):
+    def setUp(self):
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = ProxyClient(self.server.url, config=CONFIG)
+        self.addCleanup(self.client.close)
+
+    def test_missing_url(self):
+        with self.assertRaises(ValueError):
+            ProxyClient(config=CONFIG)
+
+    def test_render_bytes(self):
+        pdf = self.client.render(
+            ["<p>one</p>", b"<p>two</p>"],
+            header="<p>header</p>",
+            footer="<p>footer</p>",
+            options={"page-size": "A4"},
+        )
+        self.assertEqual(pdf, PDF_HEADER + b"<p>one</p><p>two</p>")
+
+        request = self.server.requests[0]
+        self.assertEqual(request["fields"]["header"], "header.html")
+        self.assertEqual(request["fields"]["footer"], "footer.html")
+        self.assertEqual(
+            json.loads(request["fields"]["args"]),
+            {
+                "page-size": "A4",
+                "header-html": "header.html",
+                "footer-html": "footer.html",
+            },
+        )
+
+    def test_render_paths_to_output(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            body = pathlib.Path(tmpdir, "body.html")
+            body.write_text("<p>body</p>")
+            output = os.path.join(tmpdir, "output.pdf")
+
+            self.assertIsNone(self.client.render([body], output=output))
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PDF_HEADER + b"<p>body</p>")
+
+    def test_render_error(self):
+        with self.assertRaises(ValueError):
+            self.client.render([])
+
+        client = ProxyClient(self.server.url + "/missing", config=CONFIG)
+        self.addCleanup(client.close)
+        with self.assertRaises(requests.HTTPError):
+            client.render(["<p>body</p>"])
+
+    def test_render_server_error(self):
+        client = ProxyClient(
+            self.server.url, config=dataclasses.replace(CONFIG, retries=0)
+        )
+        self.addCleanup(client.close)
+        self.server.fail_status = 503
+        with self.assertRaises(requests.HTTPError) as error:
+            client.render(["<p>body</p>"])
+        self.assertEqual(error.exception.response.status_code, 503)
+        # No cycle through the EndpointFailure wrapping it
+        self.assertIsNone(error.exception.__cause__)
+
+    def test_connections_reused(self):
+        for index in range(5):
+            self.client.render([f"<p>{index}</p>"])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_render_many(self):
+        self.server.latency = 0.2
+        documents = [{"bodies": [f"<p>{index}</p>"]} for index in range(4)]
+
+        start = time.perf_counter()
+        results = self.client.render_many(documents)
+        duration = time.perf_counter() - start
+
+        self.assertEqual(
+            results, [PDF_HEADER + f"<p>{index}</p>".encode() for index in range(4)]
+        )
+        self.assertLess(duration, 0.6)
+        self.assertLessEqual(self.server.connections, 4)
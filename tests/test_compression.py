@@ -0,0 +1,84 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.compression as compression
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.multipart import FilePart
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+HTML = b"<tr><td>Product</td><td>1.00</td></tr>\n" * 10000
+
+
+class TestWkhtmltopdfProxyCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def test_get_encoding(self):
+        self.assertEqual(compression.get_encoding("gzip"), "gzip")
+        self.assertEqual(compression.get_encoding("brotli"), "none")
+        with patch.object(compression, "zstd", None):
+            self.assertEqual(compression.get_encoding("zstd"), "gzip")
+
+    def test_file_part_threshold(self):
+        path = self.write("body.html", HTML)
+
+        part = FilePart.from_path(path, "gzip", threshold=len(HTML) + 1)
+        self.assertEqual((part.filename, part.encoding), ("body.html", "none"))
+        self.assertEqual(b"".join(part.chunks()), HTML)
+
+        part = FilePart.from_path(path, "gzip")
+        content = b"".join(part.chunks())
+        self.assertIn(b"Content-Encoding: gzip", part.headers())
+        self.assertLess(len(content) * 5, len(HTML))
+        self.assertEqual(compression.decompress(content, "gzip"), HTML)
+
+    @unittest.skipIf(compression.zstd is None, "zstd support is not installed")
+    def test_zstd_roundtrip(self):
+        content = compression.compress_bytes(HTML, "zstd")
+        self.assertLess(len(content) * 5, len(HTML))
+        self.assertEqual(compression.decompress(content, "zstd"), HTML)
+
+    def test_main_compressed_transport(self):
+        body = self.write("body.html", HTML)
+        header = self.write("header.html", b"<p>header</p>")
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        env = {
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_COMPRESSION": "gzip",
+            "WKHTMLTOPDF_PROXY_COMPRESSION_THRESHOLD": "1024",
+        }
+
+        with StubRenderServer(response_encoding="gzip") as server, patch.dict(
+            os.environ, env
+        ):
+            os.environ["WKHTMLTOPDF_PROXY_URL"] = server.url
+            with self.assertRaises(SystemExit):
+                wk.main(["--header-html", header, body, output])
+
+        request = server.requests[0]
+        self.assertEqual(request["fields"]["encoding"], "gzip")
+        self.assertIn("gzip", request["headers"]["Accept-Encoding"])
+        self.assertEqual(
+            json.loads(request["fields"]["args"])["header-html"], "header.html"
+        )
+
+        parts = {item["filename"]: item for item in request["files"]}
+        self.assertEqual(parts["body.html"]["headers"]["Content-Encoding"], "gzip")
+        self.assertLess(parts["body.html"]["size"] * 5, len(HTML))
+        self.assertNotIn("Content-Encoding", parts["header.html"]["headers"])
+
+        with open(output, "rb") as file:
+            self.assertEqual(file.read(), PDF_HEADER + HTML)
@@ -0,0 +1,110 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.daemon as daemon
+
+
+class TestWkhtmltopdfProxyDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "daemon.sock")
+
+        # The daemon and its clients share the same environment
+        env = {
+            "WKHTMLTOPDF_PROXY_VERSION": "0.13.0",
+            "WKHTMLTOPDF_PROXY_URL": "",
+            "WKHTMLTOPDF_PROXY_LOG_FILE": os.path.join(self.tmpdir.name, "proxy.log"),
+        }
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def start_server(self):
+        # create_server() sets up the logging of this very process
+        root = logging.getLogger()
+        self.addCleanup(root.setLevel, root.level)
+        self.addCleanup(self.remove_handlers, list(root.handlers))
+        server = daemon.create_server(self.socket_path)
+
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def remove_handlers(self, kept):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if handler not in kept:
+                root.removeHandler(handler)
+                handler.close()
+
+    def test_forward_without_daemon(self):
+        self.assertIsNone(daemon.forward(["--version"], self.socket_path))
+
+    def test_forward_stale_socket(self):
+        open(self.socket_path, "w").close()
+        self.assertIsNone(daemon.forward(["--version"], self.socket_path))
+
+    def test_forward_version(self):
+        self.start_server()
+        read_fd, write_fd = os.pipe()
+
+        status = daemon.forward(
+            ["--version"], self.socket_path, fds=(0, write_fd, write_fd)
+        )
+        os.close(write_fd)
+        with os.fdopen(read_fd) as output:
+            self.assertEqual(output.read(), "wkhtmltopdf 0.13.0 (with patched qt)\n")
+        self.assertEqual(status, 0)
+
+    def test_forward_error_status(self):
+        self.start_server()
+        read_fd, write_fd = os.pipe()
+
+        status = daemon.forward(
+            ["input.html", "output.pdf"], self.socket_path, fds=(0, write_fd, write_fd)
+        )
+        os.close(write_fd)
+        with os.fdopen(read_fd) as output:
+            self.assertIn("Proxy URL is not defined.", output.read())
+        self.assertEqual(status, 1)
+
+    def test_forward_no_args(self):
+        self.start_server()
+        read_fd, write_fd = os.pipe()
+
+        # Not the arguments of the daemon process
+        status = daemon.forward([], self.socket_path, fds=(0, write_fd, write_fd))
+        os.close(write_fd)
+        with os.fdopen(read_fd) as output:
+            self.assertEqual(output.read(), "")
+        self.assertEqual(status, 0)
+
+    def test_forward_other_environment(self):
+        self.start_server()
+        read_fd, write_fd = os.pipe()
+
+        with patch.dict(os.environ, {"WKHTMLTOPDF_PROXY_VERSION": "0.12.6"}):
+            status = daemon.forward(
+                ["--version"], self.socket_path, fds=(0, write_fd, write_fd)
+            )
+        os.close(write_fd)
+        with os.fdopen(read_fd) as output:
+            self.assertEqual(output.read(), "")
+        self.assertIsNone(status)
+
+    def test_create_server_already_running(self):
+        self.start_server()
+        with self.assertRaises(SystemExit):
+            daemon.create_server(self.socket_path)
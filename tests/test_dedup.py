@@ -0,0 +1,125 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.dedup import part_digest
+from wkhtmltopdf_proxy.multipart import FilePart
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+
+class TestWkhtmltopdfProxyDedup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+
+        self.header = self.write("header.html", b"<p>header</p>" * 100)
+        self.footer = self.write("footer.html", b"<p>footer</p>" * 100)
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+
+        env = {
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_URL": self.server.url,
+            "WKHTMLTOPDF_PROXY_DEDUP": "1",
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+        }
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def render(self, body: str) -> bytes:
+        self.server.requests.clear()
+        args = ["--header-html", self.header, "--footer-html", self.footer, body]
+        with self.assertRaises(SystemExit) as error:
+            wk.main(args + [self.output])
+        self.assertFalse(error.exception.code)
+
+        with open(self.output, "rb") as file:
+            return file.read()
+
+    def requests_to(self, path: str):
+        return [item for item in self.server.requests if item["path"] == path]
+
+    def uploaded(self):
+        return sorted(
+            item["filename"]
+            for request in self.requests_to("/")
+            for item in request["files"]
+        )
+
+    def test_upload_by_digest(self):
+        body_1 = self.write("body.1.html", b"<p>first</p>")
+        self.assertEqual(self.render(body_1), PDF_HEADER + b"<p>first</p>")
+        self.assertEqual(len(self.requests_to("/digests")), 1)
+        self.assertEqual(self.uploaded(), ["body.1.html", "footer.html", "header.html"])
+
+        # Only the new body is uploaded
+        body_2 = self.write("body.2.html", b"<p>second</p>")
+        self.assertEqual(self.render(body_2), PDF_HEADER + b"<p>second</p>")
+        self.assertEqual(len(self.requests_to("/digests")), 1)
+        self.assertEqual(self.uploaded(), ["body.2.html"])
+
+        digests = json.loads(self.requests_to("/")[0]["fields"]["digests"])
+        names = [name for name, _digest in digests]
+        self.assertEqual(names, ["body.2.html", "header.html", "footer.html"])
+        self.assertEqual(digests[1][1], part_digest(FilePart.from_path(self.header)))
+
+        # Every digest is in the local index: no negotiation, no upload
+        self.assertEqual(self.render(body_2), PDF_HEADER + b"<p>second</p>")
+        self.assertEqual(self.requests_to("/digests"), [])
+        self.assertEqual(self.uploaded(), [])
+
+    def test_same_filename(self):
+        # Odoo writes each file in its own temporary directory
+        os.mkdir(os.path.join(self.tmpdir.name, "other"))
+        body = self.write("other/header.html", b"<p>body</p>")
+        self.render(body)
+
+        digests = json.loads(self.requests_to("/")[0]["fields"]["digests"])
+        self.assertEqual(
+            [digest for _name, digest in digests],
+            [
+                part_digest(FilePart.from_path(path))
+                for path in (body, self.header, self.footer)
+            ],
+        )
+
+    def test_server_evicted_parts(self):
+        body = self.write("body.html", b"<p>body</p>")
+        self.render(body)
+
+        self.server.blobs.clear()
+        self.assertEqual(self.render(body), PDF_HEADER + b"<p>body</p>")
+
+        renders = self.requests_to("/")
+        self.assertEqual(len(renders), 2)
+        self.assertEqual(renders[0]["files"], [])
+        self.assertEqual(self.uploaded(), ["body.html", "footer.html", "header.html"])
+
+    def test_digests_server_error(self):
+        body = self.write("body.html", b"<p>body</p>")
+        self.server.digests_status = 503
+        with patch.dict(os.environ, {"WKHTMLTOPDF_PROXY_RETRIES": "0"}):
+            with self.assertRaises(SystemExit) as error:
+                wk.main([body, self.output])
+        self.assertIn("Error during PDF generation", str(error.exception.code))
+        self.assertEqual(self.requests_to("/"), [])
+
+    def test_digests_refused(self):
+        body = self.write("body.html", b"<p>body</p>")
+        self.server.digests_status = 404
+        self.assertEqual(self.render(body), PDF_HEADER + b"<p>body</p>")
+        self.assertEqual(self.uploaded(), ["body.html", "footer.html", "header.html"])
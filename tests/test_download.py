@@ -0,0 +1,106 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import base64
+import hashlib
+import os
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.download import expected_digest
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+BODY = b"<p>" + b"report " * 20000 + b"</p>"
+EXPECTED = PDF_HEADER + BODY
+
+
+class TestWkhtmltopdfProxyDownload(ProxyTestCase):
+    env = {
+        "WKHTMLTOPDF_PROXY_RETRIES": "2",
+        "WKHTMLTOPDF_PROXY_RETRY_BACKOFF": "0",
+        "WKHTMLTOPDF_PROXY_DOWNLOAD_BUFFER_SIZE": "4096",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.drop_after = len(EXPECTED) // 3
+
+    def proxy(self, **env):
+        """Run the proxy, returning its exit code."""
+        body = os.path.join(self.tmpdir.name, "body.html")
+        header = os.path.join(self.tmpdir.name, "header.html")
+        with open(body, "wb") as file:
+            file.write(BODY)
+        with open(header, "w") as file:
+            file.write("<p>header</p>")
+
+        return self.run_proxy(["--header-html", header, body, self.output], **env)
+
+    def paths(self, path: str):
+        return [request for request in self.server.requests if request["path"] == path]
+
+    def leftovers(self):
+        return [name for name in os.listdir(self.tmpdir.name) if ".download" in name]
+
+    def test_expected_digest(self):
+        value = base64.b64encode(hashlib.sha256(b"pdf").digest()).decode()
+        expected = ("sha256", hashlib.sha256(b"pdf").digest())
+        self.assertEqual(
+            expected_digest({"Repr-Digest": f"sha-256=:{value}:"}), expected
+        )
+        self.assertEqual(
+            expected_digest({"Digest": f"MD5=x, SHA-256={value}"}), expected
+        )
+        self.assertIsNone(expected_digest({"Digest": "md5=x"}))
+
+    def test_resume_with_range(self):
+        self.server.drop_next = 2
+        self.assertFalse(self.proxy())
+
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), EXPECTED)
+
+        # One render, then the rest of the body in two Range requests
+        self.assertEqual(len(self.paths("/")), 1)
+        resumed = [
+            request for request in self.server.requests if request["path"] != "/"
+        ]
+        self.assertEqual(len(resumed), 2)
+        # Resumed after the last chunk written, some bytes read may be lost
+        offset = int(resumed[0]["headers"]["Range"][len("bytes=") : -1])
+        self.assertTrue(0 < offset <= self.server.drop_after)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_rerender_without_ranges(self):
+        self.server.ranges = False
+        self.server.drop_next = 1
+        self.assertFalse(self.proxy())
+
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), EXPECTED)
+        self.assertEqual(len(self.paths("/")), 2)
+
+    def test_truncated_output_never_written(self):
+        with open(self.output, "wb") as file:
+            file.write(b"previous")
+
+        self.server.drop_next = 100
+        code = self.proxy(
+            WKHTMLTOPDF_PROXY_RETRIES="0", WKHTMLTOPDF_PROXY_DOWNLOAD_RESUMES="1"
+        )
+        self.assertIn("Download interrupted", code)
+
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), b"previous")
+        self.assertEqual(self.leftovers(), [])
+
+    def test_digest_mismatch(self):
+        self.server.corrupt_digest = True
+        code = self.proxy(WKHTMLTOPDF_PROXY_RETRIES="0")
+        self.assertIn("does not match its digest", code)
+        self.assertFalse(os.path.exists(self.output))
+        self.assertEqual(self.leftovers(), [])
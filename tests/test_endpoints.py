@@ -0,0 +1,114 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import socket
+import threading
+import time
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.endpoints import Endpoint, EndpointPool, parse_endpoints
+from wkhtmltopdf_proxy.state import locked_json, read_json
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+
+def unused_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:%d" % sock.getsockname()[1]
+
+
+class TestWkhtmltopdfProxyEndpoints(ProxyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state_path = os.path.join(self.tmpdir.name, "endpoints.json")
+
+        self.servers = [StubRenderServer().start() for _ in range(3)]
+        for server in self.servers:
+            self.addCleanup(server.stop)
+
+    def pool(self, endpoints, eject_time: float = 30) -> EndpointPool:
+        return EndpointPool(endpoints, self.state_path, eject_time)
+
+    def proxy(self, url: str):
+        """Run the proxy against `url`, returning its exit code."""
+        body = os.path.join(self.tmpdir.name, "body.html")
+        header = os.path.join(self.tmpdir.name, "header.html")
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        for path in (body, header):
+            with open(path, "w") as file:
+                file.write("<p>report</p>")
+
+        return self.run_proxy(["--header-html", header, body, output], url)
+
+    def render(self, url: str) -> bytes:
+        self.assertFalse(self.proxy(url))
+        with open(os.path.join(self.tmpdir.name, "output.pdf"), "rb") as file:
+            return file.read()
+
+    def test_parse_endpoints(self):
+        self.assertEqual(
+            parse_endpoints("http://a:8000;weight=2, http://b:8000,"),
+            [Endpoint("http://a:8000", 2.0), Endpoint("http://b:8000", 1.0)],
+        )
+
+    def test_least_loaded(self):
+        pool = self.pool(
+            [Endpoint("http://a", 2), Endpoint("http://b"), Endpoint("http://c")]
+        )
+        chosen = [pool.acquire().url for _ in range(4)]
+        self.assertEqual(
+            sorted(chosen), ["http://a", "http://a", "http://b", "http://c"]
+        )
+
+        pool.release(Endpoint("http://b"))
+        self.assertEqual(pool.acquire().url, "http://b")
+
+    def test_dead_process_requests_dropped(self):
+        pool = self.pool([Endpoint("http://a"), Endpoint("http://b")])
+        with locked_json(self.state_path) as state:
+            # No process has this pid
+            state["http://a"] = {"outstanding": {"999999999": 5}, "ejected_until": 0}
+            state["http://b"] = {
+                "outstanding": {str(os.getpid()): 1},
+                "ejected_until": 0,
+            }
+
+        self.assertEqual(pool.acquire().url, "http://a")
+
+    def test_failover(self):
+        self.servers[0].fail_status = 503
+        url = ",".join([unused_url(), self.servers[0].url, self.servers[1].url])
+
+        self.assertEqual(self.render(url), PDF_HEADER + b"<p>report</p>")
+        self.assertEqual(len(self.servers[1].requests), 1)
+
+        state = read_json(self.state_path)
+        self.assertGreater(state[self.servers[0].url]["ejected_until"], time.time())
+        self.assertEqual(state[self.servers[1].url]["ejected_until"], 0)
+        self.assertFalse(any(entry["outstanding"] for entry in state.values()))
+
+        # Ejected endpoints are skipped
+        self.servers[0].requests.clear()
+        self.render(url)
+        self.assertEqual(self.servers[0].requests, [])
+        self.assertEqual(len(self.servers[1].requests), 2)
+
+    def test_every_endpoint_failing(self):
+        self.servers[0].fail_status = 502
+        url = ",".join([unused_url(), self.servers[0].url])
+        self.assertIn("502", self.proxy(url))
+
+    def test_probe_restores_endpoint(self):
+        endpoint = Endpoint(self.servers[2].url)
+        pool = self.pool([endpoint], eject_time=0.1)
+        with locked_json(self.state_path) as state:
+            state[endpoint.url] = {"outstanding": {}, "ejected_until": time.time() - 1}
+
+        pool.acquire()
+        for thread in threading.enumerate():
+            if thread.name != threading.current_thread().name and not thread.daemon:
+                thread.join(5)
+
+        self.assertEqual(read_json(self.state_path)[endpoint.url]["ejected_until"], 0)
@@ -0,0 +1,81 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.fanout import split
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+class TestWkhtmltopdfProxyFanout(ProxyTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.servers = [StubRenderServer(latency=0.2).start() for _ in range(2)]
+        for server in self.servers:
+            server.pdf_pages = True
+            self.addCleanup(server.stop)
+
+        self.header = self.write("header.html", "header")
+        self.bodies = [self.write(f"body.{i}.html", f"record {i}") for i in range(5)]
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def proxy(self, groups: int):
+        url = ",".join(server.url for server in self.servers)
+        args = ["--header-html", self.header, *self.bodies, self.output]
+        code = self.run_proxy(args, url, WKHTMLTOPDF_PROXY_FANOUT=str(groups))
+        self.assertFalse(code)
+
+    def requests(self):
+        return [request for server in self.servers for request in server.requests]
+
+    def test_split(self):
+        self.assertEqual(split([1, 2, 3, 4, 5], 2), [[1, 2, 3], [4, 5]])
+        self.assertEqual(split([1, 2], 4), [[1], [2]])
+        self.assertEqual(split([1, 2, 3], 1), [[1, 2, 3]])
+
+    @unittest.skipIf(pypdf is None, "pypdf is not installed")
+    def test_fan_out(self):
+        self.proxy(groups=2)
+
+        reader = pypdf.PdfReader(self.output)
+        texts = [page.extract_text() for page in reader.pages]
+        self.assertEqual(texts, [f"record {i}" for i in range(5)])
+
+        # One request per group, each on its own endpoint, with the header
+        self.assertEqual([len(server.requests) for server in self.servers], [1, 1])
+        for request in self.requests():
+            filenames = [item["filename"] for item in request["files"]]
+            self.assertIn("header.html", filenames)
+            self.assertEqual(request["fields"]["header"], "header.html")
+
+        keys = {request["headers"]["Idempotency-Key"] for request in self.requests()}
+        self.assertEqual(len(keys), 2)
+        parts = [
+            name for name in os.listdir(self.tmpdir.name) if name.endswith(".part")
+        ]
+        self.assertEqual(parts, [])
+
+    def test_without_pypdf(self):
+        # A None entry makes the import fail
+        with patch.dict(sys.modules, {"pypdf": None}):
+            self.proxy(groups=2)
+
+        self.assertEqual(len(self.requests()), 1)
+        self.assertEqual(len(self.requests()[0]["files"]), 6)
@@ -0,0 +1,121 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+
+import requests
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.endpoints import RenderError
+from wkhtmltopdf_proxy.jobs import JobClient
+from wkhtmltopdf_proxy.multipart import FilePart
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+
+class TestWkhtmltopdfProxyJobs(ProxyTestCase):
+    env = {
+        "WKHTMLTOPDF_PROXY_RETRIES": "0",
+        "WKHTMLTOPDF_PROXY_JOBS": "1",
+        "WKHTMLTOPDF_PROXY_JOB_POLL_INTERVAL": "0.05",
+        "WKHTMLTOPDF_PROXY_JOB_POLL_MAX": "1",
+    }
+
+    def setUp(self):
+        super().setUp()
+
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.job_time = 0.2
+
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        with open(self.body, "w") as file:
+            file.write("<p>report</p>")
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+
+    def proxy(self, **env):
+        return self.run_proxy([self.body, self.output], **env)
+
+    def paths(self):
+        return [request["path"].split("?")[0] for request in self.server.requests]
+
+    def test_long_poll(self):
+        with self.assertLogs(level="INFO") as logs:
+            self.assertFalse(self.proxy())
+
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), PDF_HEADER + b"<p>report</p>")
+        paths = self.paths()
+        self.assertEqual(paths[0], "/jobs")
+        self.assertTrue(paths[-1].startswith("/results/"))
+        # The long poll answers once the job is done
+        self.assertLessEqual(len(paths), 4)
+        self.assertTrue(any("Job done" in line for line in logs.output))
+
+    def test_short_poll_backoff(self):
+        self.server.long_poll = False
+        with self.assertLogs(level="INFO") as logs:
+            self.assertFalse(self.proxy())
+
+        polls = [path for path in self.paths() if path.startswith("/jobs/")]
+        # 0.05 + 0.1 + 0.2 seconds of backoff cover the job
+        self.assertLessEqual(len(polls), 4)
+        self.assertTrue(any("running, 50%" in line for line in logs.output))
+
+    def test_dropped_polls(self):
+        self.server.drop_polls = 2
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertFalse(self.proxy())
+
+        self.assertTrue(os.path.exists(self.output))
+        self.assertEqual(len(self.server.jobs), 1)
+        self.assertEqual(
+            len([line for line in logs.output if "poll failed" in line]), 2
+        )
+
+    def test_failed_job(self):
+        self.server.job_error = "Exit with code 1 due to network error"
+        self.assertIn("network error", self.proxy())
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_failed_job_raises(self):
+        self.server.job_error = "Exit with code 1 due to network error"
+        client = JobClient(requests.Session(), 0.05, 1, 5)
+        with self.assertRaisesRegex(RenderError, "network error"):
+            client.send(
+                self.server.url, [FilePart.from_path(self.body)], {}, self.output
+            )
+
+    def test_poll_rejected(self):
+        self.server.poll_status = 403
+        self.assertIn("403", self.proxy())
+        # A rejected poll is not retried
+        polls = [path for path in self.paths() if path.startswith("/jobs/")]
+        self.assertEqual(len(polls), 1)
+
+    def test_invalid_status(self):
+        for body, message in [
+            (b"<html>Bad gateway</html>", "Invalid status"),
+            (b'["done"]', "Invalid status"),
+            (b'{"status": "done"}', "done without a result"),
+        ]:
+            with self.subTest(body=body):
+                self.server.poll_body = body
+                self.assertIn(message, self.proxy())
+
+    def test_poll_server_error(self):
+        self.server.poll_status = 503
+        with self.assertLogs(level="WARNING") as logs:
+            code = self.proxy(WKHTMLTOPDF_PROXY_JOB_TIMEOUT="0.3")
+        self.assertIn("not done after 0.3s", code)
+        self.assertGreater(
+            len([line for line in logs.output if "poll failed" in line]), 1
+        )
+
+    def test_job_timeout(self):
+        self.server.job_time = 5
+        code = self.proxy(WKHTMLTOPDF_PROXY_JOB_TIMEOUT="0.2")
+        self.assertIn("not done after 0.2s", code)
+
+    def test_threshold(self):
+        self.assertFalse(self.proxy(WKHTMLTOPDF_PROXY_JOB_THRESHOLD="1000000"))
+        self.assertEqual(self.paths(), ["/"])
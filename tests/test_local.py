@@ -0,0 +1,128 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import stat
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.local import TIMEOUT_STATUS, LocalRenderer
+from wkhtmltopdf_proxy.state import FileSemaphore
+
+# Fake renderer: logs its start and end times, sleeps for FAKE_SLEEP seconds
+# then writes its arguments to the output file (the last argument)
+FAKE_WKHTMLTOPDF = """#!/bin/sh
+echo "start $(date +%s.%N)" >> "$FAKE_LOG"
+sleep "${FAKE_SLEEP:-0}"
+for last in "$@"; do :; done
+echo "$@" > "$last"
+echo "end $(date +%s.%N)" >> "$FAKE_LOG"
+exit "${FAKE_STATUS:-0}"
+"""
+
+
+class TestWkhtmltopdfProxyLocal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        bin_dir = os.path.join(self.tmpdir.name, "bin")
+        os.makedirs(bin_dir)
+        binary = os.path.join(bin_dir, "wkhtmltopdf")
+        with open(binary, "w") as file:
+            file.write(FAKE_WKHTMLTOPDF)
+        os.chmod(binary, stat.S_IRWXU)
+
+        self.log = os.path.join(self.tmpdir.name, "fake.log")
+        env = {
+            "PATH": bin_dir + os.pathsep + os.environ["PATH"],
+            "FAKE_LOG": self.log,
+            "WKHTMLTOPDF_PROXY_URL": "http://localhost",
+            "WKHTMLTOPDF_PROXY_MODE": "local",
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+        }
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def renderer(
+        self, workers: int = 1, timeout: float = 10, **kwargs
+    ) -> LocalRenderer:
+        return LocalRenderer(
+            os.path.join(self.tmpdir.name, "local"), workers, timeout, **kwargs
+        )
+
+    def intervals(self):
+        with open(self.log) as file:
+            times = [line.split() for line in file]
+        starts = sorted(float(value) for kind, value in times if kind == "start")
+        ends = sorted(float(value) for kind, value in times if kind == "end")
+        return list(zip(starts, ends))
+
+    def test_main_local_mode(self):
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        with self.assertRaises(SystemExit) as error:
+            wk.main(["--quiet", "body.html", output])
+
+        self.assertEqual(error.exception.code, 0)
+        with open(output) as file:
+            self.assertEqual(file.read(), f"--quiet body.html {output}\n")
+
+    def test_exit_status(self):
+        with patch.dict(os.environ, {"FAKE_STATUS": "3"}):
+            status = self.renderer().run([os.path.join(self.tmpdir.name, "out.pdf")])
+        self.assertEqual(status, 3)
+
+    def test_concurrency_limit(self):
+        renderer = self.renderer(workers=2)
+        outputs = [os.path.join(self.tmpdir.name, f"{i}.pdf") for i in range(4)]
+
+        with patch.dict(os.environ, {"FAKE_SLEEP": "0.3"}):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                statuses = list(
+                    executor.map(lambda path: renderer.run([path]), outputs)
+                )
+
+        self.assertEqual(statuses, [0, 0, 0, 0])
+        intervals = self.intervals()
+        running = max(
+            sum(start <= moment < end for start, end in intervals)
+            for moment, _end in intervals
+        )
+        self.assertEqual(running, 2)
+
+    def test_timeout_kills_renderer(self):
+        output = os.path.join(self.tmpdir.name, "out.pdf")
+        start = time.monotonic()
+        with patch.dict(os.environ, {"FAKE_SLEEP": "30"}):
+            status = self.renderer(timeout=0.3).run([output])
+
+        self.assertEqual(status, TIMEOUT_STATUS)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(os.path.exists(output))
+
+    def test_queue_timeout(self):
+        renderer = self.renderer(queue_timeout=0.1)
+        with renderer.semaphore.acquire():
+            with self.assertRaises(TimeoutError):
+                renderer.run([os.path.join(self.tmpdir.name, "out.pdf")])
+
+    def test_main_queue_timeout(self):
+        env = {
+            "WKHTMLTOPDF_PROXY_LOCAL_WORKERS": "1",
+            "WKHTMLTOPDF_PROXY_QUEUE_TIMEOUT": "0.1",
+            "WKHTMLTOPDF_PROXY_TIMEOUT": "5",
+        }
+        # Another process holds the only slot
+        slots = FileSemaphore(os.path.join(self.tmpdir.name, "local"), 1)
+        start = time.monotonic()
+        with patch.dict(os.environ, env), slots.acquire():
+            with self.assertRaises(SystemExit) as error:
+                wk.main(["body.html", os.path.join(self.tmpdir.name, "out.pdf")])
+
+        self.assertEqual(error.exception.code, "No local wkhtmltopdf worker available.")
+        self.assertLess(time.monotonic() - start, 2)
@@ -0,0 +1,149 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from test_startup import SRC_DIR
+
+from wkhtmltopdf_proxy.log import logs, setup_logging
+from wkhtmltopdf_proxy.main import ProxyConfig
+
+
+class TestWkhtmltopdfProxyLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "proxy.log")
+
+        self.logger = logging.getLogger(f"wkhtmltopdf_proxy.test.{self.id()}")
+        self.logger.propagate = False
+        self.addCleanup(self.close)
+
+    def close(self):
+        for handler in list(self.logger.handlers):
+            handler.close()
+            self.logger.removeHandler(handler)
+
+    def setup(self, **kwargs):
+        config = ProxyConfig(
+            timeout=600,
+            version="0.12.6",
+            threshold=0,
+            clean_html=False,
+            mode="remote",
+            url="",
+            **{"log_file": self.path, **kwargs},
+        )
+        setup_logging(config, self.logger)
+
+    def read(self) -> str:
+        self.close()
+        with open(self.path) as file:
+            return file.read()
+
+    def run_main(self, **env: str) -> subprocess.CompletedProcess:
+        # In a new interpreter: the handlers of the test runner would make
+        # setup_logging() keep them
+        env = {
+            **os.environ,
+            "PYTHONPATH": SRC_DIR,
+            "WKHTMLTOPDF_PROXY_URL": "",
+            "WKHTMLTOPDF_PROXY_LOG_FILE": self.path,
+            "WKHTMLTOPDF_PROXY_LOG_LEVEL": "info",
+            **env,
+        }
+        code = "from wkhtmltopdf_proxy.main import main; main(['in.html', 'out.pdf'])"
+        return subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True
+        )
+
+    def test_main_log_file(self):
+        result = self.run_main()
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stderr, "Proxy URL is not defined.\n")
+
+        content = self.read()
+        self.assertIn("'Proxy URL is not defined.'", content)
+        # Debug records are below the configured level
+        self.assertNotIn("Original command", content)
+
+    def test_configuration_warnings(self):
+        result = self.run_main(
+            WKHTMLTOPDF_PROXY_MODE="bogus", WKHTMLTOPDF_PROXY_COMPRESSION="brotli"
+        )
+        self.assertEqual(result.returncode, 1)
+        # Logged before the log file was set up, but not to stderr
+        self.assertEqual(result.stderr, "Proxy URL is not defined.\n")
+
+        content = self.read()
+        self.assertIn("Invalid mode 'bogus'", content)
+        self.assertIn("Invalid compression 'brotli'", content)
+        self.assertIn("'Proxy URL is not defined.'", content)
+
+    def test_fields(self):
+        self.setup()
+        self.logger.info(
+            "done", extra={"fields": {"function": "render", "duration": 0.5}}
+        )
+        self.assertIn("'done' function=render duration=0.5", self.read())
+
+    def test_logs_decorator(self):
+        @logs
+        def render():
+            return 42
+
+        with self.assertLogs(level="INFO") as captured:
+            self.assertEqual(render(), 42)
+
+        record = captured.records[0]
+        self.assertEqual(record.fields["function"], render.__qualname__)
+        self.assertGreaterEqual(record.fields["duration"], 0)
+
+    def test_sampling(self):
+        self.setup(log_sample=0)
+        for index in range(100):
+            self.logger.debug("debug %d", index)
+        self.logger.warning("kept")
+        content = self.read()
+        self.assertNotIn("debug", content)
+        self.assertIn("kept", content)
+
+    def test_rotation(self):
+        self.setup(log_max_size=1024, log_backups=2)
+        for index in range(200):
+            self.logger.info("record %d", index)
+        self.assertIn("record 199", self.read())
+
+        names = sorted(os.listdir(self.tmpdir.name))
+        self.assertEqual(names, ["proxy.log", "proxy.log.1", "proxy.log.2"])
+        for name in names:
+            self.assertLessEqual(
+                os.path.getsize(os.path.join(self.tmpdir.name, name)), 1024
+            )
+
+    def test_disabled(self):
+        self.setup(log_file="")
+        self.logger.info("nowhere")
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_forked_child(self):
+        self.setup()
+        pid = os.fork()
+        if not pid:
+            self.logger.info("from the child")
+            logging.shutdown()
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+        self.assertIn("from the child", self.read())
+
+    def test_existing_handlers_kept(self):
+        handler = logging.NullHandler()
+        self.logger.addHandler(handler)
+        self.setup()
+        self.assertEqual(self.logger.handlers, [handler])
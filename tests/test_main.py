@@ -1,6 +1,8 @@
 # Copyright 2025 apik (https://apik.cloud).
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
 
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
 
@@ -8,47 +10,54 @@ import wkhtmltopdf_proxy.main as wk
 
 
 class TestWkhtmltopdfMain(unittest.TestCase):
-
-    def test_local_mode_execvp_called(self):
-        args = ["--some-arg", "value", "output.pdf"]
-        with patch("os.execvp") as mock_execvp, \
-            patch("wkhtmltopdf_proxy.main.get_url", return_value="http://example.com"), \
-            patch("wkhtmltopdf_proxy.main.get_mode", return_value="local"):
-            wk.main(args)
-            mock_execvp.assert_called_once_with("wkhtmltopdf", ["wkhtmltopdf"] + args)
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        body = os.path.join(self.tmpdir.name, "body.html")
+        with open(body, "w") as file:
+            file.write("<p>report</p>")
+        self.args = ["--page-size", "A4", body, "output.pdf"]
+
+    def main(self, **config):
+        """Run main() with the given settings, returning its exit code."""
+        config = wk.ProxyConfig(
+            **{
+                "timeout": 600,
+                "version": "0.12.6",
+                "threshold": 2 * 1024 * 1024,
+                "clean_html": False,
+                "url": "http://example.com",
+                "state_dir": self.tmpdir.name,
+                "log_file": "",
+                **config,
+            }
+        )
+        with self.assertRaises(SystemExit) as error:
+            wk.main(self.args, config=config)
+        return error.exception.code
+
+    def test_local_mode_render_local_called(self):
+        with patch("wkhtmltopdf_proxy.main.render_local", return_value=0) as render:
+            self.assertEqual(self.main(mode="local"), 0)
+        render.assert_called_once()
+        self.assertEqual(render.call_args.args[0], self.args)
 
     def test_invalid_mode_exits(self):
-        args = ["--some-arg", "value", "output.pdf"]
-        with patch("wkhtmltopdf_proxy.main.get_url", return_value="http://example.com"), \
-            patch("wkhtmltopdf_proxy.main.get_mode", return_value="invalid_mode"), \
-            patch("sys.exit") as mock_exit:
-            wk.main(args)
-            mock_exit.assert_called_once()
-
-    def test_auto_mode_below_threshold_execvp_called(self):
-        args = ["--some-arg", "value", "output.pdf"]
-        with patch("os.execvp") as mock_execvp, \
-            patch("wkhtmltopdf_proxy.main.get_url", return_value="http://example.com"), \
-            patch("wkhtmltopdf_proxy.main.get_mode", return_value="auto"), \
-            patch("wkhtmltopdf_proxy.main.get_threshold", return_value=10485760), \
-            patch("wkhtmltopdf_proxy.main.sizeof", return_value=1024):
-            wk.main(args)
-            mock_execvp.assert_called_once_with("wkhtmltopdf", ["wkhtmltopdf"] + args)
+        self.assertIn("Invalid proxy mode", self.main(mode="invalid_mode"))
+
+    def test_auto_mode_below_threshold_render_local_called(self):
+        with patch("wkhtmltopdf_proxy.main.render_local", return_value=0) as render:
+            self.assertEqual(self.main(mode="auto", threshold=10485760), 0)
+        render.assert_called_once()
+        self.assertEqual(render.call_args.args[0], self.args)
 
     def test_auto_mode_above_threshold_send_request_called(self):
-        args = ["--some-arg", "value", "output.pdf"]
-        with patch("wkhtmltopdf_proxy.main.send_request") as mock_send_request, \
-            patch("wkhtmltopdf_proxy.main.get_url", return_value="http://example.com"), \
-            patch("wkhtmltopdf_proxy.main.get_mode", return_value="auto"), \
-            patch("wkhtmltopdf_proxy.main.get_threshold", return_value=1024), \
-            patch("wkhtmltopdf_proxy.main.sizeof", return_value=10485760):
-            wk.main(args)
-            mock_send_request.assert_called_once()
+        with patch("wkhtmltopdf_proxy.main.send_request") as send_request:
+            self.assertEqual(self.main(mode="auto", threshold=1), 0)
+        send_request.assert_called_once()
 
     def test_remote_mode_send_request_called(self):
-        args = ["--some-arg", "value", "output.pdf"]
-        with patch("wkhtmltopdf_proxy.main.send_request") as mock_send_request, \
-            patch("wkhtmltopdf_proxy.main.get_url", return_value="http://example.com"), \
-            patch("wkhtmltopdf_proxy.main.get_mode", return_value="remote"):
-            wk.main(args)
-            mock_send_request.assert_called_once()
+        with patch("wkhtmltopdf_proxy.main.send_request") as send_request:
+            self.assertEqual(self.main(mode="remote"), 0)
+        send_request.assert_called_once()
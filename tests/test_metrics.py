@@ -0,0 +1,99 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.metrics import Metrics, render
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+
+def parse(text: str) -> dict:
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+class TestWkhtmltopdfProxyMetrics(ProxyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+
+        self.textfile = os.path.join(self.tmpdir.name, "proxy.prom")
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        self.header = os.path.join(self.tmpdir.name, "header.html")
+        for path in (self.body, self.header):
+            with open(path, "w") as file:
+                file.write("<p>report</p>\n  <p>total</p>")
+
+    def proxy(self, **env) -> dict:
+        env = {"WKHTMLTOPDF_PROXY_METRICS_FILE": self.textfile, **env}
+        output = os.path.join(self.tmpdir.name, "output.pdf")
+        self.run_proxy(["--header-html", self.header, self.body, output], **env)
+
+        if not env["WKHTMLTOPDF_PROXY_METRICS_FILE"]:
+            return {}
+        with open(self.textfile) as file:
+            text = file.read()
+        self.assertTrue(text.endswith("# EOF\n"))
+        return parse(text)
+
+    def test_histogram_exposition(self):
+        metrics = Metrics()
+        metrics.observe("phase_duration_seconds", 0.2, phase="upload")
+        metrics.observe("phase_duration_seconds", 7, phase="upload")
+        text = render({"histograms": metrics.histograms})
+        self.assertIn("# TYPE wkhtmltopdf_proxy_phase_duration_seconds histogram", text)
+        samples = parse(text)
+        name = "wkhtmltopdf_proxy_phase_duration_seconds"
+        self.assertEqual(samples[f'{name}_bucket{{phase="upload",le="0.1"}}'], 0)
+        self.assertEqual(samples[f'{name}_bucket{{phase="upload",le="0.25"}}'], 1)
+        self.assertEqual(samples[f'{name}_bucket{{phase="upload",le="+Inf"}}'], 2)
+        self.assertEqual(samples[f'{name}_sum{{phase="upload"}}'], 7.2)
+        self.assertEqual(samples[f'{name}_count{{phase="upload"}}'], 2)
+
+    def test_remote_phases(self):
+        samples = self.proxy(WKHTMLTOPDF_PROXY_CLEAN_HTML="1")
+        prefix = "wkhtmltopdf_proxy_"
+
+        self.assertEqual(
+            samples[prefix + 'requests_total{route="remote",status="ok"}'], 1
+        )
+        self.assertGreater(samples[prefix + "upload_bytes_total"], 0)
+        downloaded = os.path.getsize(os.path.join(self.tmpdir.name, "output.pdf"))
+        self.assertEqual(samples[prefix + "download_bytes_total"], downloaded)
+        for phase in ("parse", "minify", "upload", "wait", "download"):
+            key = f'{prefix}phase_duration_seconds_count{{phase="{phase}"}}'
+            self.assertGreaterEqual(samples[key], 1, phase)
+
+        # Totals accumulate across invocations
+        samples = self.proxy()
+        self.assertEqual(
+            samples[prefix + 'requests_total{route="remote",status="ok"}'], 2
+        )
+        downloaded += os.path.getsize(os.path.join(self.tmpdir.name, "output.pdf"))
+        self.assertEqual(samples[prefix + "download_bytes_total"], downloaded)
+
+    def test_routes_and_errors(self):
+        self.proxy(WKHTMLTOPDF_PROXY_CACHE="1")
+        samples = self.proxy(WKHTMLTOPDF_PROXY_CACHE="1")
+        self.assertEqual(
+            samples['wkhtmltopdf_proxy_requests_total{route="cache",status="ok"}'], 1
+        )
+
+        self.server.fail_status = 400
+        samples = self.proxy()
+        self.assertEqual(
+            samples['wkhtmltopdf_proxy_requests_total{route="remote",status="error"}'],
+            1,
+        )
+
+    def test_disabled(self):
+        self.proxy(WKHTMLTOPDF_PROXY_METRICS_FILE="")
+        self.assertFalse(os.path.exists(self.textfile))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, "metrics.json")))
@@ -0,0 +1,87 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.minify import iter_minify, minify_bytes
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+HTML = b"""<!DOCTYPE html>
+<html>
+    <head>
+        <!-- report assets -->
+        <style>
+            .page  { margin: 0 }
+        </style>
+        <SCRIPT>var text = "a  <b>  c";</script>
+    </head>
+    <body>
+        <p class="note  big">Total:
+            100.00 \xe2\x82\xac</p>
+        <pre>  line 1
+  line 2</PRE>
+        <textarea>  keep   me  </textarea>
+        <span>a</span> <span>b</span> 1 < 2
+        <img alt="first line
+            second  line" src='logo.png'
+            title='x'/>
+    </body>
+</html>
+"""
+
+EXPECTED = (
+    b"<!DOCTYPE html> <html> <head> <style>\n            .page  { margin: 0 }\n"
+    b'        </style> <SCRIPT>var text = "a  <b>  c";</script> </head> <body> '
+    b'<p class="note  big">Total: 100.00 \xe2\x82\xac</p> <pre>  line 1\n'
+    b"  line 2</PRE> <textarea>  keep   me  </textarea> "
+    b"<span>a</span> <span>b</span> 1 < 2 "
+    b"<img alt=\"first line\n            second  line\" src='logo.png'\n"
+    b"            title='x'/> </body> </html> "
+)
+
+
+class TestWkhtmltopdfProxyMinify(unittest.TestCase):
+    def test_minify(self):
+        self.assertEqual(minify_bytes(HTML), EXPECTED)
+
+    def test_minify_chunk_boundaries(self):
+        for size in (1, 2, 3, 7, 64):
+            chunks = [HTML[index : index + size] for index in range(0, len(HTML), size)]
+            self.assertEqual(b"".join(iter_minify(chunks)), EXPECTED, size)
+
+    def test_minify_comment_across_chunks(self):
+        chunks = [b"<p>a</p><!-", b"- hidden -", b"-><p>b</p>"]
+        self.assertEqual(b"".join(iter_minify(chunks)), b"<p>a</p><p>b</p>")
+
+    def test_minify_html(self):
+        self.assertEqual(
+            wk.minify_html("<p>\n  café  </p>\n<!-- x -->"), "<p> café  </p> "
+        )
+
+    def test_main_minifies_upload(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            body = os.path.join(tmpdir, "body.html")
+            header = os.path.join(tmpdir, "header.html")
+            output = os.path.join(tmpdir, "output.pdf")
+            for path in (body, header):
+                with open(path, "wb") as file:
+                    file.write(HTML)
+
+            env = {
+                "WKHTMLTOPDF_PROXY_MODE": "remote",
+                "WKHTMLTOPDF_PROXY_CLEAN_HTML": "1",
+            }
+            with StubRenderServer() as server, patch.dict(os.environ, env):
+                os.environ["WKHTMLTOPDF_PROXY_URL"] = server.url
+                with self.assertRaises(SystemExit):
+                    wk.main(["--header-html", header, body, output])
+
+            with open(body, "rb") as file:
+                self.assertEqual(file.read(), HTML)
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PDF_HEADER + EXPECTED)
+            self.assertEqual(server.requests[0]["fields"]["clean"], "True")
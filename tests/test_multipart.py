@@ -0,0 +1,111 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from wkhtmltopdf_proxy.multipart import FilePart, MultipartEncoder
+from wkhtmltopdf_proxy.stub import StubRenderServer, parse_form
+
+MEMORY_SCRIPT = textwrap.dedent(
+    """
+    import resource
+    import sys
+
+    import wkhtmltopdf_proxy.main as wk
+
+    def vm_size():
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+
+    # Allow 64MB on top of the current address space, far below the input size
+    limit = vm_size() + 64 * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        wk.main(sys.argv[1:])
+    except SystemExit as error:
+        assert not error.code, error.code
+
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    """
+)
+
+
+class TestWkhtmltopdfProxyMultipart(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def test_encoder_sized(self):
+        path = self.write("body.html", b"<p>body</p>" * 1000)
+        encoder = MultipartEncoder(
+            {"args": "{}", "clean": False},
+            [FilePart.from_path(path), FilePart.from_bytes("footer.html", b"<p>f</p>")],
+        )
+
+        body = b"".join(encoder.body())
+        self.assertEqual(len(encoder.body()), len(body))
+        self.assertEqual(b"".join(encoder), body)
+
+        fields, files = parse_form(encoder.content_type, body)
+        self.assertEqual(fields, {"args": "{}", "clean": "False"})
+        self.assertEqual(
+            [(item["filename"], item["content"]) for item in files],
+            [("body.html", b"<p>body</p>" * 1000), ("footer.html", b"<p>f</p>")],
+        )
+
+    def test_encoder_compressed(self):
+        encoder = MultipartEncoder(
+            {}, [FilePart.from_bytes("body.html", b"<p>body</p>" * 1000, "gzip")]
+        )
+        self.assertIsNone(encoder.length)
+        self.assertFalse(hasattr(encoder.body(), "__len__"))
+
+        _fields, files = parse_form(encoder.content_type, b"".join(encoder.body()))
+        self.assertEqual(files[0]["content"], b"<p>body</p>" * 1000)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/status"), "Linux only")
+    def test_constant_memory_upload(self):
+        def run(size: int) -> int:
+            body = os.path.join(self.tmpdir.name, f"body.{size}.html")
+            with open(body, "wb") as file:
+                file.truncate(size)
+            header = self.write("header.html", b"<p>header</p>")
+            output = os.path.join(self.tmpdir.name, "output.pdf")
+
+            env = dict(
+                os.environ,
+                WKHTMLTOPDF_PROXY_URL=server.url,
+                WKHTMLTOPDF_PROXY_MODE="remote",
+                PYTHONPATH=os.pathsep.join(sys.path),
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", MEMORY_SCRIPT, "--header-html", header]
+                + [body, output],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(server.requests[-1]["size"] > size, True)
+            return int(result.stdout) * 1024
+
+        with StubRenderServer(discard_uploads=True) as server:
+            small = run(16 * 1024 * 1024)
+            large = run(160 * 1024 * 1024)
+
+        self.assertLess(large - small, 16 * 1024 * 1024)
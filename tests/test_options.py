@@ -0,0 +1,206 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.options import OptionError, parse_argv
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+ODOO_ARGS = [
+    "--disable-local-file-access",
+    "--cookie",
+    "session_id",
+    "b93c54121419ae98e81a6e038d93b503b706e04c",
+    "--quiet",
+    "--page-size",
+    "A4",
+    "--margin-top",
+    "40.0",
+    "--dpi",
+    "90",
+    "--zoom",
+    "1.0666666666666667",
+    "--header-spacing",
+    "35",
+    "--orientation",
+    "Portrait",
+    "--header-html",
+    "/tmp/report.header.tmp.9vjh34yx.html",
+    "--footer-html",
+    "/tmp/report.footer.tmp.0khx6434.html",
+    "/tmp/report.body.tmp.0.uwctzvc6.html",
+    "/tmp/report.body.tmp.1.uwctzvc6.html",
+    "/tmp/report.tmp.gzumzohi.pdf",
+]
+
+
+class TestWkhtmltopdfProxyOptions(unittest.TestCase):
+    def test_odoo_command(self):
+        parsed = parse_argv(ODOO_ARGS)
+        self.assertEqual(
+            parsed["options"],
+            {
+                "disable-local-file-access": None,
+                "cookie": [("session_id", "b93c54121419ae98e81a6e038d93b503b706e04c")],
+                "quiet": None,
+                "page-size": "A4",
+                "margin-top": "40.0",
+                "dpi": "90",
+                "zoom": "1.0666666666666667",
+                "header-spacing": "35",
+                "orientation": "Portrait",
+                "header-html": "/tmp/report.header.tmp.9vjh34yx.html",
+                "footer-html": "/tmp/report.footer.tmp.0khx6434.html",
+            },
+        )
+        self.assertEqual(
+            parsed["bodies"],
+            [
+                "/tmp/report.body.tmp.0.uwctzvc6.html",
+                "/tmp/report.body.tmp.1.uwctzvc6.html",
+            ],
+        )
+        self.assertEqual(parsed["output"], "/tmp/report.tmp.gzumzohi.pdf")
+        self.assertEqual((parsed["cover"], parsed["toc"]), ("", None))
+
+    def test_multi_value_options(self):
+        parsed = parse_argv(
+            [
+                "--cookie",
+                "a",
+                "1",
+                "--custom-header",
+                "X-Tenant",
+                "demo",
+                "--cookie",
+                "b",
+                "2",
+                "--run-script",
+                "init()",
+                "body.html",
+                "out.pdf",
+            ]
+        )
+        self.assertEqual(parsed["options"]["cookie"], [("a", "1"), ("b", "2")])
+        self.assertEqual(parsed["options"]["custom-header"], [("X-Tenant", "demo")])
+        self.assertEqual(parsed["options"]["run-script"], ["init()"])
+
+    def test_page_objects(self):
+        parsed = parse_argv(
+            [
+                "-q",
+                "-O",
+                "Landscape",
+                "cover",
+                "cover.html",
+                "toc",
+                "--toc-header-text",
+                "Contents",
+                "--disable-dotted-lines",
+                "page",
+                "body.html",
+                "--zoom",
+                "1.5",
+                "annex.html",
+                "out.pdf",
+            ]
+        )
+        self.assertEqual(
+            parsed["options"],
+            {"quiet": None, "orientation": "Landscape", "zoom": "1.5"},
+        )
+        self.assertEqual(parsed["cover"], "cover.html")
+        self.assertEqual(
+            parsed["toc"], {"toc-header-text": "Contents", "disable-dotted-lines": None}
+        )
+        self.assertEqual(parsed["bodies"], ["body.html", "annex.html"])
+
+    def test_invalid(self):
+        for argv, message in [
+            (["--no-such-option", "body.html", "out.pdf"], "unknown option"),
+            (["body.html", "--page-size"], "missing output"),
+            (["--cookie", "a", "out.pdf"], "missing value"),
+            (["--dpi", "high", "body.html", "out.pdf"], "invalid value 'high'"),
+            (["--dpi", "3_00", "body.html", "out.pdf"], "invalid value '3_00'"),
+            (["--zoom", "inf", "body.html", "out.pdf"], "invalid value 'inf'"),
+            (["-O", "portraits", "body.html", "out.pdf"], "expected one of"),
+            (
+                ["--toc-header-text", "T", "body.html", "out.pdf"],
+                "only valid after toc",
+            ),
+            (["--quiet", "out.pdf"], "no page"),
+        ]:
+            with self.subTest(argv=argv), self.assertRaisesRegex(OptionError, message):
+                parse_argv(argv)
+
+    def test_values_accepted_by_wkhtmltopdf(self):
+        for name, value in [
+            ("--orientation", "landscape"),
+            ("-O", "PORTRAIT"),
+            ("--log-level", "Info"),
+            ("--load-error-handling", "IGNORE"),
+            ("--dpi", " +300 "),
+            ("--zoom", "1.5e0"),
+            ("--zoom", ".5"),
+        ]:
+            with self.subTest(name=name, value=value):
+                parsed = parse_argv([name, value, "body.html", "out.pdf"])
+                self.assertIn(value, parsed["options"].values())
+
+    def test_main_rejects_locally(self):
+        with StubRenderServer() as server:
+            env = {
+                "WKHTMLTOPDF_PROXY_MODE": "remote",
+                "WKHTMLTOPDF_PROXY_URL": server.url,
+            }
+            with patch.dict(os.environ, env), self.assertRaises(SystemExit) as error:
+                wk.main(["--no-such-option", "body.html", "out.pdf"])
+
+            self.assertIn("unknown option --no-such-option", error.exception.code)
+            self.assertEqual(server.requests, [])
+
+    def test_main_sends_cover_and_toc(self):
+        with tempfile.TemporaryDirectory() as tmpdir, StubRenderServer() as server:
+            paths = {}
+            for name in ("cover", "header", "body"):
+                paths[name] = os.path.join(tmpdir, f"{name}.html")
+                with open(paths[name], "w") as file:
+                    file.write(f"<p>{name}</p>")
+            output = os.path.join(tmpdir, "output.pdf")
+
+            env = {
+                "WKHTMLTOPDF_PROXY_MODE": "remote",
+                "WKHTMLTOPDF_PROXY_URL": server.url,
+                "WKHTMLTOPDF_PROXY_STATE_DIR": tmpdir,
+            }
+            argv = [
+                "--header-html",
+                paths["header"],
+                "cover",
+                paths["cover"],
+                "toc",
+                "--toc-header-text",
+                "Contents",
+                paths["body"],
+                "--print-media-type",
+                output,
+            ]
+            with patch.dict(os.environ, env), self.assertRaises(SystemExit) as error:
+                wk.main(argv)
+            self.assertFalse(error.exception.code)
+
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PDF_HEADER + b"<p>cover</p><p>body</p>")
+
+            fields = server.requests[0]["fields"]
+            self.assertEqual(fields["cover"], "cover.html")
+            self.assertEqual(json.loads(fields["toc"]), {"toc-header-text": "Contents"})
+            self.assertEqual(
+                json.loads(fields["args"]),
+                {"header-html": "header.html", "print-media-type": None},
+            )
@@ -0,0 +1,124 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.cli import main as cli
+from wkhtmltopdf_proxy.replay import load_corpus, replay
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+
+class TestWkhtmltopdfProxyReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.capture_dir = os.path.join(self.tmpdir.name, "capture")
+
+        self.server = StubRenderServer().start()
+        self.addCleanup(self.server.stop)
+
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        self.header = os.path.join(self.tmpdir.name, "header.html")
+        self.cookie_jar = os.path.join(self.tmpdir.name, "cookies.txt")
+        for path, content in [
+            (self.body, "<p>report</p>"),
+            (self.header, "<p>header</p>"),
+            (self.cookie_jar, "session_id=jar-secret; HttpOnly; path=/;"),
+        ]:
+            with open(path, "w") as file:
+                file.write(content)
+
+        self.env = {
+            "WKHTMLTOPDF_PROXY_MODE": "remote",
+            "WKHTMLTOPDF_PROXY_URL": self.server.url,
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+            "WKHTMLTOPDF_PROXY_LOG_FILE": "",
+        }
+
+    def capture(self, count: int = 1) -> None:
+        argv = [
+            "--cookie",
+            "session_id",
+            "secret",
+            "--cookie-jar",
+            self.cookie_jar,
+            "--header-html",
+            self.header,
+            self.body,
+            os.path.join(self.tmpdir.name, "output.pdf"),
+        ]
+        env = {**self.env, "WKHTMLTOPDF_PROXY_CAPTURE_DIR": self.capture_dir}
+        for _ in range(count):
+            with patch.dict(os.environ, env), self.assertRaises(SystemExit) as error:
+                wk.main(argv)
+            self.assertFalse(error.exception.code)
+
+    def test_capture(self):
+        self.capture()
+        (name,) = os.listdir(self.capture_dir)
+        entry = os.path.join(self.capture_dir, name)
+        with open(os.path.join(entry, "request.json")) as file:
+            request = json.load(file)
+
+        self.assertEqual(
+            request["args"],
+            [
+                "--cookie",
+                "session_id",
+                "***",
+                "--header-html",
+                "{files}/1/header.html",
+                "{files}/0/body.html",
+                "{output}",
+            ],
+        )
+        for path in ("0/body.html", "1/header.html"):
+            self.assertTrue(os.path.isfile(os.path.join(entry, "files", path)))
+        self.assertNotIn("secret", json.dumps(request))
+
+    def test_replay(self):
+        self.capture(2)
+        corpus = load_corpus(self.capture_dir)
+        self.assertEqual(len(corpus), 2)
+        self.server.requests.clear()
+
+        report = replay(corpus, {**os.environ, **self.env}, 3, concurrency=2)
+        self.assertEqual(report["requests"], 3)
+        self.assertEqual(report["error_rate"], 0)
+        self.assertLessEqual(report["p50"], report["p99"])
+        self.assertGreater(report["rss"], 0)
+        self.assertEqual(len(self.server.requests), 3)
+        header = next(
+            item
+            for item in self.server.requests[0]["files"]
+            if item["filename"] == "header.html"
+        )
+        self.assertEqual(header["content"], b"<p>header</p>")
+
+    def test_replay_at_rate(self):
+        self.capture()
+        corpus = load_corpus(self.capture_dir)
+        self.server.fail_status = 500
+
+        report = replay(corpus, {**os.environ, **self.env}, 2, rate=20)
+        self.assertEqual(report["requests"], 2)
+        self.assertEqual(report["error_rate"], 1)
+
+    def test_cli_with_stub(self):
+        self.capture()
+        stdout = io.StringIO()
+        with patch.dict(os.environ, self.env), redirect_stdout(stdout):
+            cli(["replay", self.capture_dir, "--stub", "--json"])
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report["requests"], 1)
+        self.assertEqual(report["error_rate"], 0)
+        # The bundled stub took the request, not the configured server
+        self.assertEqual(len(self.server.requests), 1)
@@ -0,0 +1,114 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import time
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.retry import Hedger, percentile
+from wkhtmltopdf_proxy.state import atomic_write, read_json
+from wkhtmltopdf_proxy.stub import PDF_HEADER, StubRenderServer
+
+
+class TestWkhtmltopdfProxyRetry(ProxyTestCase):
+    env = {
+        "WKHTMLTOPDF_PROXY_RETRIES": "2",
+        "WKHTMLTOPDF_PROXY_RETRY_BACKOFF": "0.01",
+    }
+
+    def setUp(self):
+        super().setUp()
+
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        self.header = os.path.join(self.tmpdir.name, "header.html")
+        self.output = os.path.join(self.tmpdir.name, "output.pdf")
+        for path in (self.body, self.header):
+            with open(path, "w") as file:
+                file.write("<p>report</p>")
+
+    def server(self, **kwargs) -> StubRenderServer:
+        server = StubRenderServer(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def proxy(self, url: str, **env):
+        return self.run_proxy(
+            ["--header-html", self.header, self.body, self.output], url, **env
+        )
+
+    def keys(self, server: StubRenderServer):
+        return [request["headers"]["Idempotency-Key"] for request in server.requests]
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 51.0)
+        self.assertEqual(percentile(values, 95), 95.0)
+        self.assertEqual(percentile(values, 100), 100.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_retry_transient_errors(self):
+        server = self.server()
+        server.fail_next = 2
+
+        self.assertFalse(self.proxy(server.url))
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), PDF_HEADER + b"<p>report</p>")
+
+        keys = self.keys(server)
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(len(set(keys)), 1)
+
+    def test_retries_exhausted(self):
+        server = self.server()
+        server.fail_next = 3
+
+        code = self.proxy(server.url, WKHTMLTOPDF_PROXY_RETRIES="1")
+        self.assertIn("503", code)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_client_error_not_retried(self):
+        server = self.server()
+        server.fail_status = 400
+
+        # The attempt runs in a thread of the hedger
+        code = self.proxy(server.url, WKHTMLTOPDF_PROXY_HEDGE_PERCENTILE="95")
+        self.assertIn("Error during PDF generation: 400 Client Error", code)
+        self.assertEqual(len(server.requests), 1)
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_hedged_request(self):
+        slow, fast = self.server(latency=3), self.server()
+        stats_path = os.path.join(self.tmpdir.name, "latency.json")
+        atomic_write(
+            stats_path, b'{"latencies": [' + b", ".join([b"0.05"] * 20) + b"]}"
+        )
+
+        start = time.monotonic()
+        url = f"{slow.url},{fast.url}"
+        self.assertFalse(self.proxy(url, WKHTMLTOPDF_PROXY_HEDGE_PERCENTILE="95"))
+        self.assertLess(time.monotonic() - start, 2)
+
+        with open(self.output, "rb") as file:
+            self.assertEqual(file.read(), PDF_HEADER + b"<p>report</p>")
+        self.assertEqual(self.keys(slow), self.keys(fast))
+        parts = [
+            name for name in os.listdir(self.tmpdir.name) if name.endswith(".part")
+        ]
+        self.assertEqual(parts, [])
+
+        stats = read_json(stats_path)
+        counts = (stats["requests"], stats["hedged"], stats["hedge_wins"])
+        self.assertEqual(counts, (1, 1, 1))
+        self.assertIn(
+            "1/1 requests hedged (+100.0% load), 1 won by the hedge",
+            Hedger(stats_path, 95).describe(),
+        )
+
+    def test_no_hedge_while_warming_up(self):
+        slow, fast = self.server(latency=0.3), self.server()
+
+        url = f"{slow.url},{fast.url}"
+        self.assertFalse(self.proxy(url, WKHTMLTOPDF_PROXY_HEDGE_PERCENTILE="95"))
+        self.assertEqual(len(slow.requests), 1)
+        self.assertEqual(fast.requests, [])
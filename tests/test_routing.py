@@ -0,0 +1,113 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import wkhtmltopdf_proxy.main as wk
+from wkhtmltopdf_proxy.cli import main as cli_main
+from wkhtmltopdf_proxy.routing import Router, fit, predict
+from wkhtmltopdf_proxy.state import read_json
+from wkhtmltopdf_proxy.stub import StubRenderServer
+
+MB = 1024 * 1024
+
+
+class TestWkhtmltopdfProxyRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.stats_path = os.path.join(self.tmpdir.name, "routing.json")
+
+    def router(self, min_samples: int = 3) -> Router:
+        return Router(self.stats_path, threshold=MB, min_samples=min_samples)
+
+    def seed(self, router: Router, route: str, base: float, per_mb: float):
+        for size in (MB // 2, MB, 4 * MB, 8 * MB):
+            router.record(route, size, 1, base + per_mb * size / MB)
+
+    def test_fit(self):
+        samples = [
+            {"size": size * MB, "bodies": bodies, "duration": 0.5 + size + 2 * bodies}
+            for size in (1, 2, 5)
+            for bodies in (1, 3)
+        ]
+        coefficients = fit(samples)
+        self.assertAlmostEqual(predict(coefficients, 10 * MB, 2), 14.5, places=2)
+
+    def test_threshold_fallback(self):
+        router = self.router()
+        self.seed(router, "local", 0.1, 1.0)
+        # No remote samples yet
+        self.assertEqual(router.choose(MB // 2, 1), "local")
+        self.assertEqual(router.choose(2 * MB, 1), "remote")
+
+    def test_choose_fastest(self):
+        router = self.router()
+        # Local starts faster but slows down quickly with the size
+        self.seed(router, "local", 0.1, 1.0)
+        self.seed(router, "remote", 0.6, 0.2)
+
+        self.assertEqual(router.choose(MB // 4, 1), "local")
+        self.assertEqual(router.choose(2 * MB, 1), "remote")
+
+        # Below the static threshold, yet faster remotely
+        with patch.object(router, "local_load", return_value=1.0):
+            self.assertEqual(router.choose(MB // 2, 1), "remote")
+
+    def test_exploration(self):
+        router = Router(self.stats_path, threshold=MB, min_samples=3, explore=0.5)
+        self.seed(router, "local", 0.1, 1.0)
+        self.seed(router, "remote", 0.6, 0.2)
+
+        with patch("random.random", return_value=0.4):
+            self.assertEqual(router.choose(MB // 4, 1), "remote")
+        with patch("random.random", return_value=0.6):
+            self.assertEqual(router.choose(MB // 4, 1), "local")
+
+    def test_main_records_remote_samples(self):
+        body = os.path.join(self.tmpdir.name, "body.html")
+        header = os.path.join(self.tmpdir.name, "header.html")
+        for path in (body, header):
+            with open(path, "w") as file:
+                file.write("<p>report</p>")
+
+        with StubRenderServer() as server:
+            env = {
+                "WKHTMLTOPDF_PROXY_MODE": "auto",
+                "WKHTMLTOPDF_PROXY_THRESHOLD": "0",
+                "WKHTMLTOPDF_PROXY_URL": server.url,
+                "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+            }
+            with patch.dict(os.environ, env), self.assertRaises(SystemExit):
+                wk.main(["--header-html", header, body, body + ".pdf"])
+
+        samples = read_json(self.stats_path)["remote"]
+        self.assertEqual(len(samples), 1)
+        self.assertEqual(samples[0]["size"], 26)
+        self.assertEqual(samples[0]["bodies"], 1)
+
+    def test_stats_command(self):
+        self.seed(self.router(), "local", 0.1, 1.0)
+
+        stdout = io.StringIO()
+        env = {
+            "WKHTMLTOPDF_PROXY_STATE_DIR": self.tmpdir.name,
+            "WKHTMLTOPDF_PROXY_ROUTING_MIN_SAMPLES": "3",
+        }
+        with patch.dict(os.environ, env), redirect_stdout(stdout):
+            cli_main(["stats"])
+
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("local: 4 samples, duration = "))
+        self.assertTrue(lines[1].startswith("remote: 0/3 samples"))
+
+        # Another state directory, given on the command line
+        stdout = io.StringIO()
+        with patch.dict(os.environ, env), redirect_stdout(stdout):
+            cli_main(["stats", "--state-dir", os.path.join(self.tmpdir.name, "other")])
+        self.assertTrue(stdout.getvalue().startswith("local: 0/3 samples"))
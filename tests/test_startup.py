@@ -0,0 +1,76 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import wkhtmltopdf_proxy
+
+SRC_DIR = os.path.dirname(os.path.dirname(wkhtmltopdf_proxy.__file__))
+# Cumulative import time of wkhtmltopdf_proxy.main, in seconds; measured
+# around 0.05s, against 0.4s when requests was imported eagerly
+IMPORT_BUDGET = 0.15
+HEAVY_MODULES = ("requests", "urllib3", "pypdf", "logging.handlers")
+# Modules of the features disabled by default
+OPT_IN_MODULES = tuple(
+    f"wkhtmltopdf_proxy.{name}"
+    for name in ("assets", "capture", "fanout", "jobs", "local")
+)
+
+
+def python(
+    code: str, *options: str, home: str = "", check: bool = True
+) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": SRC_DIR}
+    if home:
+        env["HOME"] = home
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=check,
+    )
+
+
+class TestWkhtmltopdfProxyStartup(unittest.TestCase):
+    def test_no_heavy_imports(self):
+        modules = HEAVY_MODULES + OPT_IN_MODULES
+        result = python(
+            "import sys, wkhtmltopdf_proxy.main; "
+            f"print(' '.join(m for m in {modules!r} if m in sys.modules))"
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_import_budget(self):
+        # Best of a few runs, to ignore a cold disk cache
+        timings = []
+        for _ in range(3):
+            result = python("import wkhtmltopdf_proxy.main", "-X", "importtime")
+            for line in result.stderr.splitlines():
+                fields = line.split("|")
+                if fields[-1].strip() == "wkhtmltopdf_proxy.main":
+                    timings.append(int(fields[1]) / 1e6)
+
+        self.assertLess(min(timings), IMPORT_BUDGET)
+
+    def test_version_without_log_file(self):
+        with tempfile.TemporaryDirectory() as home:
+            result = python(
+                "from wkhtmltopdf_proxy.main import main; main(['--version'])",
+                home=home,
+            )
+            self.assertIn("wkhtmltopdf", result.stdout)
+            self.assertEqual(os.listdir(home), [])
+
+            # A render does set up the default log file
+            result = python(
+                "from wkhtmltopdf_proxy.main import main; main(['in.html', 'out.pdf'])",
+                home=home,
+                check=False,
+            )
+            self.assertEqual(result.returncode, 1)
+            self.assertEqual(os.listdir(home), ["wkhtmltopdf.log"])
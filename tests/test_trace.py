@@ -0,0 +1,88 @@
+# Copyright 2025 apik (https://apik.cloud).
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import json
+import os
+from unittest.mock import patch
+
+from proxy_case import ProxyTestCase
+
+from wkhtmltopdf_proxy.stub import StubRenderServer
+from wkhtmltopdf_proxy.trace import parse_server_timing, scrub
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+class TestWkhtmltopdfProxyTrace(ProxyTestCase):
+    env = {"WKHTMLTOPDF_PROXY_JOB_POLL_INTERVAL": "0.05"}
+
+    def setUp(self):
+        super().setUp()
+
+        self.server = StubRenderServer(latency=0.05).start()
+        self.addCleanup(self.server.stop)
+
+        self.body = os.path.join(self.tmpdir.name, "body.html")
+        with open(self.body, "w") as file:
+            file.write("<p>report</p>")
+        self.trace_file = os.path.join(self.tmpdir.name, "trace.jsonl")
+
+    def proxy(self, **env) -> dict:
+        """Render a report, returning its trace record."""
+        argv = [
+            "--cookie",
+            "session_id",
+            "secret",
+            self.body,
+            os.path.join(self.tmpdir.name, "output.pdf"),
+        ]
+        env = {"WKHTMLTOPDF_PROXY_TRACE_FILE": self.trace_file, **env}
+        self.assertFalse(self.run_proxy(argv, **env))
+
+        with open(self.trace_file) as file:
+            return json.loads(file.readlines()[-1])
+
+    def test_parse_server_timing(self):
+        header = 'queue;dur=120, render;desc="wkhtmltopdf";dur=3400.5, cache, db;dur=x'
+        self.assertEqual(parse_server_timing(header), {"queue": 0.12, "render": 3.4005})
+
+    def test_scrub(self):
+        args = ["--cookie", "session_id", "secret", "--password", "pw", "in.html"]
+        self.assertEqual(
+            scrub(args),
+            ["--cookie", "session_id", "***", "--password", "***", "in.html"],
+        )
+
+    def test_record(self):
+        with patch.dict(os.environ, {"TRACEPARENT": TRACEPARENT}):
+            record = self.proxy()
+
+        self.assertEqual(record["trace_id"], TRACE_ID)
+        self.assertEqual(record["parent_id"], "00f067aa0ba902b7")
+        self.assertIn("--cookie session_id ***", record["command"])
+        self.assertNotIn("secret", record["command"])
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual(set(record["server"]), {"parse", "render"})
+        self.assertGreaterEqual(record["server"]["render"], 0.05)
+        self.assertTrue(
+            {"parse", "upload", "wait", "download"} <= set(record["client"])
+        )
+        self.assertGreaterEqual(record["client"]["wait"], record["server"]["render"])
+
+        # The span of the request is the one received by the server
+        header = self.server.requests[0]["headers"]["traceparent"]
+        self.assertEqual(header, f"00-{TRACE_ID}-{record['requests'][0]['span_id']}-01")
+        self.assertNotIn("00f067aa0ba902b7", header)
+
+    def test_new_trace_per_invocation(self):
+        first, second = self.proxy(), self.proxy()
+        self.assertNotEqual(first["trace_id"], second["trace_id"])
+
+    def test_job_record(self):
+        self.server.job_time = 0.1
+        record = self.proxy(WKHTMLTOPDF_PROXY_JOBS="1")
+        self.assertEqual(set(record["server"]), {"queue", "render"})
+        spans = [span["span_id"] for span in record["requests"]]
+        self.assertGreaterEqual(len(spans), 2)
+        self.assertEqual(len(spans), len(set(spans)))